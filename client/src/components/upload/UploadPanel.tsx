@@ -15,6 +15,16 @@ interface UploadResult {
     message: string;
 }
 
+interface IngestJob {
+    status: "queued" | "running" | "succeeded" | "failed";
+    stage: string | null;
+    result: UploadResult | null;
+    error: string | null;
+}
+
+// Server pipeline stages shown as the "graphing" phase
+const GRAPH_STAGES = ["embed", "extract", "graph"];
+
 export default function UploadPanel({ onClose }: { onClose: () => void }) {
     const [phase, setPhase] = useState<UploadPhase>("idle");
     const [isDragging, setIsDragging] = useState(false);
@@ -48,22 +58,31 @@ export default function UploadPanel({ onClose }: { onClose: () => void }) {
             setPhase("uploading");
             await new Promise(r => setTimeout(r, 400)); // Visual pause for UX
 
-            setPhase("extracting");
             const response = await fetch(`${API_URL}/api/v1/ingest`, {
                 method: "POST",
                 body: formData,
             });
 
-            setPhase("graphing");
-            await new Promise(r => setTimeout(r, 500)); // Visual pause for UX
-
             if (!response.ok) {
                 const errData = await response.json();
                 throw new Error(errData.detail || `Server error: ${response.status}`);
             }
 
-            const data = await response.json();
-            setResult(data);
+            // Ingestion runs as a background job — poll until it finishes
+            const { job_id } = await response.json();
+            setPhase("extracting");
+            let job: IngestJob;
+            while (true) {
+                await new Promise(r => setTimeout(r, 1000));
+                const jobResponse = await fetch(`${API_URL}/api/v1/ingest/${job_id}`);
+                if (!jobResponse.ok) throw new Error(`Job status failed: ${jobResponse.status}`);
+                job = await jobResponse.json();
+                if (job.status === "failed") throw new Error(job.error || "Ingestion failed.");
+                if (job.status === "succeeded") break;
+                if (job.stage && GRAPH_STAGES.includes(job.stage)) setPhase("graphing");
+            }
+
+            setResult(job.result);
             setPhase("done");
 
             // Refresh the 3D graph data
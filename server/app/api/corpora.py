@@ -0,0 +1,66 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from app.db.document_registry import DocumentRegistry
+from app.services.corpus import Scope, validate_corpus
+from app.services.graph_service import GraphService
+from app.services.ingest_service import IngestService
+from app.services.vector_service import VectorService
+
+router = APIRouter()
+
+
+def _corpus_or_400(corpus: str) -> str:
+    try:
+        return validate_corpus(corpus)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/corpora")
+async def list_corpora():
+    """Every corpus with its document and chunk counts."""
+    return {"corpora": await asyncio.to_thread(DocumentRegistry().list_corpora)}
+
+
+@router.get("/corpora/{corpus}")
+async def get_corpus(corpus: str):
+    """Documents, stored chunks and graph size of one corpus."""
+    corpus = _corpus_or_400(corpus)
+    documents = await asyncio.to_thread(DocumentRegistry().corpus_documents, corpus)
+    if not documents:
+        raise HTTPException(status_code=404, detail=f"Unknown corpus: {corpus}")
+    vs = await asyncio.to_thread(VectorService)
+    chunks = await asyncio.to_thread(vs.count_chunks, Scope(corpus=corpus))
+    graph = await GraphService().get_corpus_stats(corpus)
+    return {"corpus": corpus, "documents": documents, "vector_chunks": chunks, "graph": graph}
+
+
+@router.delete("/corpora/{corpus}")
+async def delete_corpus(corpus: str):
+    """
+    Deletes a corpus: its documents, the chunks no other corpus uses (vectors and
+    keyword index) and its graph memberships. Entities and relationships that belong
+    to no other corpus are removed; shared ones stay.
+    """
+    corpus = _corpus_or_400(corpus)
+    registry = DocumentRegistry()
+    doc_ids = await asyncio.to_thread(registry.corpus_documents, corpus)
+    if not doc_ids:
+        raise HTTPException(status_code=404, detail=f"Unknown corpus: {corpus}")
+
+    await IngestService.collect_pending()
+    # The registry delete also records the store cleanup it owes (gc_pending)
+    orphaned = await asyncio.to_thread(registry.delete_corpus, corpus)
+    try:
+        await IngestService.collect_garbage(orphaned)
+        graph = await IngestService.detach_corpus(corpus, doc_ids)
+    except Exception as e:
+        print(f"⚠️ Cleanup of corpus '{corpus}' failed ({e}). Retried later from the pending-cleanup ledger.")
+        graph = {"cleanup": "pending"}
+    return {
+        "status": "deleted",
+        "corpus": corpus,
+        "documents_deleted": len(doc_ids),
+        "chunks_deleted": len(orphaned),
+        "graph": graph,
+    }
@@ -0,0 +1,29 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from app.db.document_registry import DocumentRegistry
+from app.services.ingest_service import IngestService
+
+router = APIRouter()
+
+
+@router.get("/documents/{doc_id:path}")
+async def get_document(doc_id: str):
+    """Registry entry of an ingested document (corpus, file hash, chunk count)."""
+    document = await asyncio.to_thread(DocumentRegistry().get_document, doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document: {doc_id}")
+    return document
+
+
+@router.delete("/documents/{doc_id:path}")
+async def delete_document(doc_id: str):
+    """
+    Deletes a document: chunks no other document shares are removed from the vector
+    store and keyword index, relationships lose that support (and are deleted when none
+    is left) and entities left without relationships are garbage-collected.
+    To replace a document, upload it again under the same filename and corpus.
+    """
+    result = await IngestService.delete_document(doc_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document: {doc_id}")
+    return result
@@ -1,14 +1,66 @@
-from fastapi import APIRouter
+import json
+import hashlib
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from app.services.graph_service import GraphService
+from app.services.graph_view import GraphCursorExpired, GraphView
 
 router = APIRouter()
 
+
 @router.get("/graph")
-async def get_entire_graph():
+async def get_graph_view(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, description="Nodes per page (default 1000)"),
+    rank: str = Query("degree", description="Node ranking: degree | pagerank"),
+    focus: Optional[str] = Query(None, description="Expand the neighbourhood around this entity"),
+    depth: int = Query(2, ge=1, le=4, description="Hops around the focus entity"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
     """
-    Returns the complete node/edge list for the 3D visualizer.
-    Limit: 1000 nodes for performance (or implemented LoD).
+    Level-of-detail graph data for the 3D visualizer.
+    Without parameters: the 1000 highest-degree nodes and the links between them.
+    Pages are cursor-paginated (`next_cursor`) and each carries the links to nodes on
+    the same or earlier pages. `format=ndjson` streams one JSON object per line.
+    Responses carry an ETag derived from the graph data version; a matching
+    If-None-Match returns 304 without touching the graph.
     """
-    gs = GraphService()
-    data = gs.get_whole_graph()
-    return data
+    version = await GraphService().get_data_version()
+    params = hashlib.sha1(json.dumps([limit, rank, focus, depth, cursor, format]).encode()).hexdigest()[:12]
+    etag = f'W/"g{version}-{params}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        view = await GraphView.page(version, limit=limit, rank=rank, focus=focus, depth=depth, cursor=cursor)
+    except GraphCursorExpired as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if view["version"] != version:
+        # Loaded a newer graph than the version the ETag was computed from
+        headers["ETag"] = f'W/"g{view["version"]}-{params}"'
+
+    if format == "ndjson":
+        return StreamingResponse(GraphView.iter_ndjson(view), media_type="application/x-ndjson", headers=headers)
+
+    return Response(
+        content=json.dumps({
+            "nodes": list(view["nodes"]),
+            "links": list(view["links"]),
+            "version": view["version"],
+            "rank": view["rank"],
+            "focus": view["focus"],
+            "total_nodes": view["total_nodes"],
+            "next_cursor": view["next_cursor"],
+        }),
+        media_type="application/json",
+        headers=headers,
+    )
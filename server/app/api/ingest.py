@@ -1,51 +1,94 @@
-from fastapi import APIRouter, UploadFile, File, Request
+import os
+import json
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from app.services.corpus import validate_corpus
+from app.services.ingest_service import IngestJob, IngestQueue, IngestQueueFull
 from app.services.pdf_engine import PDFEngine
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
 
+# Uploads larger than this are rejected before they are queued
+INGEST_MAX_UPLOAD_MB = int(os.getenv("INGEST_MAX_UPLOAD_MB", "50"))
 
-@router.post("/ingest")
+
+def _get_job_or_404(job_id: str) -> IngestJob:
+    job = IngestQueue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job: {job_id}")
+    return job
+
+
+@router.post("/ingest", status_code=202)
 @limiter.limit("5/minute")
-async def ingest_pdf(request: Request, file: UploadFile = File(...)):
+async def ingest_pdf(request: Request, file: UploadFile = File(...), corpus: Optional[str] = Form(None)):
     """
-    Full PDF Ingestion Pipeline:
+    Queues a PDF for the ingestion pipeline and returns a job id immediately:
     PDF → Extract Text → Chunk → Vector Store (ChromaDB) → Graph (Neo4j)
+    The document is stored in `corpus` (default: "default") and can be queried,
+    inspected and deleted per corpus.
+    Track progress with GET /ingest/{job_id} or the SSE stream at /ingest/{job_id}/events.
     """
-    # 1. Extract and clean text from PDF
-    raw_text = await PDFEngine.extract_text(file)
+    try:
+        corpus = validate_corpus(corpus)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not raw_text.strip():
-        return {"status": "error", "message": "No readable text found in PDF."}
+    # Stream the upload to disk; the job parses it from there page by page
+    pdf_path, file_hash = await PDFEngine.spool_upload(file, max_bytes=INGEST_MAX_UPLOAD_MB * 1024 * 1024)
 
-    # 2. Chunk into sliding windows (1000 chars, 200 overlap)
-    chunks = PDFEngine.chunk_text(raw_text)
+    job = IngestJob(filename=file.filename or "unknown.pdf", pdf_path=pdf_path, file_hash=file_hash, corpus=corpus)
+    try:
+        IngestQueue.submit(job)
+    except (IngestQueueFull, RuntimeError) as e:
+        # Queue full or not running (e.g. shutting down): the job never owns the spooled file
+        os.remove(pdf_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
 
-    # 3. Store chunks as semantic embeddings in ChromaDB (vector brain)
-    from app.services.vector_service import VectorService
-    vs = VectorService()
-    vs.upsert_chunks(chunks, file.filename or "unknown.pdf")
+    return {
+        "status": "queued",
+        "job_id": job.job_id,
+        "filename": job.filename,
+        "corpus": job.corpus,
+        "doc_id": job.doc_id,
+        "queue_depth": IngestQueue.depth(),
+        "status_url": f"{request.url.path}/{job.job_id}",
+        "events_url": f"{request.url.path}/{job.job_id}/events",
+    }
 
-    # 4. Extract Knowledge Graph triplets via LLM and populate Neo4j (symbolic brain)
-    # NOTE: LLMEngine methods are now async — must be awaited
-    from app.services.llm_engine import LLMEngine
-    from app.services.graph_service import GraphService
-    gs = GraphService()
 
-    total_triplets = 0
-    # Process up to 10 chunks (balance between depth and API speed for demo)
-    for chunk in chunks[:10]:
-        triplets = await LLMEngine.extract_triplets(chunk)  # FIXED: added await
-        gs.upsert_triplets(triplets)
-        total_triplets += len(triplets)
+@router.get("/ingest/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Returns per-stage progress, chunk counts, timings and (when done) the ingest result."""
+    return _get_job_or_404(job_id).to_dict()
 
-    return {
-        "status": "success",
-        "filename": file.filename,
-        "chunks_processed": len(chunks),
-        "triplets_extracted": total_triplets,
-        "mode": "Neuro-Symbolic Injection Complete 🧠",
-        "message": f"Knowledge graph enriched with {total_triplets} verified facts."
-    }
+
+@router.get("/ingest/{job_id}/events")
+async def stream_ingest_job(job_id: str):
+    """
+    Server-Sent Events stream of job snapshots. Emits a `progress` event on every
+    change and a final `done` event when the job succeeds or fails.
+    """
+    job = _get_job_or_404(job_id)
+
+    async def event_stream():
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                event = "done" if job.done else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.done:
+                    return
+            elif not await job.wait_for_update(version, timeout=15.0):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,15 +1,266 @@
-from fastapi import APIRouter
+import os
+import json
+import asyncio
+from typing import Any, Awaitable, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from app.services.corpus import GLOBAL_SCOPE, Scope, validate_corpus
 from app.services.vector_service import VectorService
 from app.services.path_service import PathFindingService
 from app.services.graph_service import GraphService
-from app.services.llm_engine import LLMEngine
+from app.services.graph_view import GraphView
+from app.services.llm_engine import LLMEngine, SYNTHESIS_ERROR
+from app.services.query_cache import QueryCache
+from app.services.entity_matcher import EntityMatcher
+from app.services.entity_resolver import normalize_name
 
 router = APIRouter()
 
+# Context chunks handed to answer synthesis
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+
 
 class QueryRequest(BaseModel):
     query: str
+    # Optional filters: answer from one corpus and/or one document only
+    corpus: Optional[str] = None
+    doc_id: Optional[str] = None
+
+
+def _scope(req: QueryRequest) -> Scope:
+    try:
+        corpus = validate_corpus(req.corpus) if req.corpus else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Scope(corpus=corpus, doc_id=req.doc_id or None)
+
+
+async def _first_success(*attempts: Awaitable[Optional[Dict]]) -> Optional[Dict]:
+    """
+    Runs path-finding attempts concurrently and returns the first non-empty result.
+    The remaining attempts are cancelled; failures count as "no result".
+    """
+    pending = [asyncio.ensure_future(a) for a in attempts]
+    try:
+        while pending:
+            done, rest = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending = list(rest)
+            for task in done:
+                if task.exception() is not None:
+                    print(f"⚠️ Path attempt failed: {task.exception()}")
+                elif task.result():
+                    return task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _vector_search(query: str, scope: Scope) -> List[Dict[str, Any]]:
+    """Hybrid retrieval (dense + BM25, fused, collapsed, optionally reranked) within scope."""
+    try:
+        vs = await asyncio.to_thread(VectorService)
+        return await vs.hybrid_search(query, n_results=RETRIEVAL_TOP_K, scope=scope)
+    except Exception as e:
+        print(f"⚠️ Vector search failed: {e}")
+        return []
+
+
+async def _extract_entities(query: str) -> List[str]:
+    """
+    Query entities for graph traversal. Known entity names are matched locally first
+    (EntityMatcher, no LLM round trip); the LLM is only asked when those cover too
+    little of the query, and its entities are then added after the local matches,
+    which are guaranteed to be graph nodes.
+    """
+    local = await EntityMatcher.extract(query) if EntityMatcher.ENABLED else None
+    if local and local["confident"]:
+        print(f"🔍 Entities Matched Locally: {local['entities']} (coverage {local['coverage']:.0%})")
+        return local["entities"]
+
+    known = local["entities"] if local else []
+    extracted = await LLMEngine.extract_entities(query)
+    print(f"🔍 Entities Extracted: {extracted}" + (f" + graph vocabulary {known}" if known else ""))
+    seen = {normalize_name(e) for e in known}
+    entities = (known + [e for e in extracted if normalize_name(e) not in seen])[:EntityMatcher.MAX_ENTITIES]
+
+    if not entities:
+        # Fallback: use the raw query words as entities
+        entities = [w.title() for w in query.split() if len(w) > 4][:2]
+        print(f"⚠️ No entities extracted, using fallback: {entities}")
+    return entities
+
+
+async def _reasoning_events(query: str, scope: Scope = GLOBAL_SCOPE) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    THE REAL NEURO-SYMBOLIC REASONING LOOP, as an event stream.
+
+    Yields ("step", text) as each stage completes, then ("path", payload) once the
+    reasoning path is known, ("token", text) for each answer token, and finally
+    ("done", response) with the complete /reason response body.
+
+    Independent stages overlap: vector retrieval starts alongside entity extraction,
+    and the path attempts race each other. Graph queries use the async Neo4j driver;
+    query embeddings are micro-batched and blocking Chroma calls run in a worker thread.
+    A scope (corpus / document) is pushed down into retrieval, entity resolution and
+    graph traversal.
+    """
+    steps = []
+    ps = PathFindingService()
+    gs = GraphService()
+
+    def step(text: str) -> Tuple[str, str]:
+        steps.append(text)
+        return "step", text
+
+    # Vector retrieval does not depend on the entities — start it right away
+    vector_task = asyncio.create_task(_vector_search(query, scope))
+    background = [vector_task]
+    try:
+        # ─────────────────────────────────────────────────────────
+        # STEP 1: Entity Extraction (Neural → Symbolic Bridge)
+        # ─────────────────────────────────────────────────────────
+        yield step("Parsing query intent and extracting named entities...")
+        entities = await _extract_entities(query)
+
+        yield step(f"Entities identified: {', '.join(entities)}")
+
+        # ─────────────────────────────────────────────────────────
+        # STEP 2: Vector Search (Neural Retrieval)
+        # ─────────────────────────────────────────────────────────
+        yield step("Retrieving semantic context from vector memory (ChromaDB)...")
+        vector_records = await vector_task
+        vector_context = [r["text"] for r in vector_records]
+
+        # ─────────────────────────────────────────────────────────
+        # STEP 3: Graph Pathfinding (Symbolic Reasoning)
+        # ─────────────────────────────────────────────────────────
+        yield step(f"Traversing Knowledge Graph for entities: [{', '.join(entities)}]...")
+
+        # Attempt 3 (fuzzy subgraph cluster search) starts now, alongside the direct attempts,
+        # but is only used if no direct path exists — a real path is the better answer
+        cluster_task = asyncio.ensure_future(_first_success(gs.find_subgraph_for_entities(entities, scope)))
+        background.append(cluster_task)
+        direct_attempts = []
+
+        # Attempt 1: Direct path between first two extracted entities
+        if len(entities) >= 2:
+            direct_attempts.append(ps.find_reasoning_path(entities[0], entities[1], scope))
+
+        # Attempt 2: Try other entity pair combinations
+        if len(entities) >= 3:
+            direct_attempts.append(ps.find_reasoning_path(entities[0], entities[2], scope))
+
+        # Direct attempts race each other; the first path found wins and cancels the rest
+        path_data = await _first_success(*direct_attempts)
+        if path_data:
+            cluster_task.cancel()
+        else:
+            yield step("Direct path not found. Using entity cluster search...")
+            path_data = await cluster_task
+
+        # Attempt 4: Final fallback — return the best-connected nodes of the graph
+        # (whole-graph ranking, so not for scoped queries)
+        if not path_data:
+            yield step("Cluster search complete. Using top knowledge nodes as context...")
+            top_nodes = await GraphView.top_nodes(await gs.get_data_version(), 6) if scope.is_global else []
+            if top_nodes:
+                path_data = {
+                    "nodes": top_nodes,
+                    "confidence": 0.5,
+                    "type": "Broad Search"
+                }
+            else:
+                path_data = {
+                    "nodes": entities,
+                    "confidence": 0.4,
+                    "type": "Entity-Only"
+                }
+
+        yield step(
+            f"Reasoning path identified ({path_data['type']}). "
+            f"Confidence: {int(path_data['confidence'] * 100)}%"
+        )
+
+        context_payload = {
+            "path": path_data,
+            "entities_found": entities,
+            "scope": {"corpus": scope.corpus, "doc_id": scope.doc_id},
+            "vector_chunks_used": len(vector_context),
+            "sources": [
+                {k: r[k] for k in ("source", "doc_id", "corpus", "page_start", "page_end", "char_start", "char_end") if k in r}
+                for r in vector_records
+            ],
+        }
+        yield "path", context_payload
+
+        # ─────────────────────────────────────────────────────────
+        # STEP 4: Answer Synthesis (Symbolic → Neural Output)
+        # ─────────────────────────────────────────────────────────
+        yield step("Synthesizing grounded answer from verified logic chain...")
+        answer_parts = []
+        async for token in LLMEngine.stream_answer(
+            query=query,
+            path_nodes=path_data["nodes"],
+            vector_context=vector_context,
+            path_relations=path_data.get("relations"),
+        ):
+            answer_parts.append(token)
+            yield "token", token
+
+        yield step("Verification complete. Answer grounded in knowledge graph.")
+
+        # ─────────────────────────────────────────────────────────
+        # RESPONSE: Answer + Visualization Coordinates
+        # ─────────────────────────────────────────────────────────
+        yield "done", {
+            "answer": "".join(answer_parts),
+            **context_payload,
+            "steps": steps,
+        }
+    finally:
+        # The stream can end early (client disconnect, a failed stage): don't leave
+        # background retrieval running unowned or its failure unretrieved
+        for task in background:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+
+async def _cached_reasoning_events(query: str, scope: Scope) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    _reasoning_events behind the semantic result cache (QueryCache): a hit replays
+    the cached path, answer and steps without any LLM call or graph traversal.
+    """
+    if not QueryCache.ENABLED:
+        async for event in _reasoning_events(query, scope):
+            yield event
+        return
+
+    cache = QueryCache()
+    scope_key = f"{scope.corpus or ''}|{scope.doc_id or ''}"
+    try:
+        version = await QueryCache.data_version()
+    except Exception as e:
+        print(f"⚠️ Query cache bypassed: {e}")
+        version = None
+
+    vector = None
+    if version is not None:
+        cached, vector = await cache.lookup(query, scope_key, version)
+        if cached is not None:
+            yield "path", {k: cached[k] for k in ("path", "entities_found", "scope", "vector_chunks_used", "sources")}
+            yield "token", cached["answer"]
+            yield "done", cached
+            return
+
+    async for event, data in _reasoning_events(query, scope):
+        # Failed syntheses are not worth repeating
+        if event == "done" and version is not None and SYNTHESIS_ERROR not in data["answer"]:
+            cache.put(query, scope_key, version, data, vector)
+        yield event, data
 
 
 @router.post("/reason")
@@ -23,97 +274,32 @@ async def reason_about_query(req: QueryRequest):
     3. Find weighted confidence path in Knowledge Graph (Symbolic reasoning)
     4. Synthesize grounded answer using path + context (Symbolic → Neural output)
     5. Return answer + path coordinates for 3D visualization
+    Repeated and near-duplicate queries are answered from the result cache until
+    the data changes.
     """
-    steps = []
-    vs = VectorService()
-    ps = PathFindingService()
-    gs = GraphService()
-
-    # ─────────────────────────────────────────────────────────
-    # STEP 1: Entity Extraction (Neural → Symbolic Bridge)
-    # ─────────────────────────────────────────────────────────
-    steps.append("Parsing query intent and extracting named entities...")
-    entities = await LLMEngine.extract_entities(req.query)
-    print(f"🔍 Entities Extracted: {entities}")
+    response: Dict[str, Any] = {}
+    async for event, data in _cached_reasoning_events(req.query, _scope(req)):
+        if event == "done":
+            response = data
+    return response
 
-    if not entities:
-        # Fallback: use the raw query words as entities
-        entities = [w.title() for w in req.query.split() if len(w) > 4][:2]
-        print(f"⚠️ No entities extracted, using fallback: {entities}")
 
-    steps.append(f"Entities identified: {', '.join(entities)}")
+@router.post("/reason/stream")
+async def stream_reasoning(req: QueryRequest):
+    """
+    Server-Sent Events variant of /reason for low time-to-first-token.
+    Emits `step` events as each stage completes, one `path` event with the reasoning
+    path and evidence, `token` events for the answer as it is generated, and a final
+    `done` event carrying the same body /reason returns.
+    """
+    scope = _scope(req)
 
-    # ─────────────────────────────────────────────────────────
-    # STEP 2: Vector Search (Neural Retrieval)
-    # ─────────────────────────────────────────────────────────
-    steps.append("Retrieving semantic context from vector memory (ChromaDB)...")
-    try:
-        vector_context = vs.query_similar(req.query, n_results=5)
-    except Exception as e:
-        print(f"⚠️ Vector search failed: {e}")
-        vector_context = []
-
-    # ─────────────────────────────────────────────────────────
-    # STEP 3: Graph Pathfinding (Symbolic Reasoning)
-    # ─────────────────────────────────────────────────────────
-    steps.append(f"Traversing Knowledge Graph for entities: [{', '.join(entities)}]...")
-    path_data = None
-
-    # Attempt 1: Direct path between first two extracted entities
-    if len(entities) >= 2:
-        path_data = ps.find_reasoning_path(entities[0], entities[1])
-
-    # Attempt 2: Try other entity pair combinations
-    if not path_data and len(entities) >= 3:
-        path_data = ps.find_reasoning_path(entities[0], entities[2])
-
-    # Attempt 3: Fuzzy subgraph cluster search
-    if not path_data:
-        steps.append("Direct path not found. Performing entity cluster search...")
-        path_data = gs.find_subgraph_for_entities(entities)
-
-    # Attempt 4: Final fallback — return top nodes from the full graph
-    if not path_data:
-        steps.append("Cluster search complete. Using top knowledge nodes as context...")
-        graph_data = gs.get_whole_graph()
-        top_nodes = [n["id"] for n in graph_data.get("nodes", [])[:6]]
-        if top_nodes:
-            path_data = {
-                "nodes": top_nodes,
-                "confidence": 0.5,
-                "type": "Broad Search"
-            }
-        else:
-            path_data = {
-                "nodes": entities,
-                "confidence": 0.4,
-                "type": "Entity-Only"
-            }
-
-    steps.append(
-        f"Reasoning path identified ({path_data['type']}). "
-        f"Confidence: {int(path_data['confidence'] * 100)}%"
-    )
+    async def event_stream():
+        async for event, data in _cached_reasoning_events(req.query, scope):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    # ─────────────────────────────────────────────────────────
-    # STEP 4: Answer Synthesis (Symbolic → Neural Output)
-    # ─────────────────────────────────────────────────────────
-    steps.append("Synthesizing grounded answer from verified logic chain...")
-    answer = await LLMEngine.synthesize_answer(
-        query=req.query,
-        path_nodes=path_data["nodes"],
-        vector_context=vector_context
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-
-    steps.append("Verification complete. Answer grounded in knowledge graph.")
-
-    # ─────────────────────────────────────────────────────────
-    # RESPONSE: Answer + Visualization Coordinates
-    # ─────────────────────────────────────────────────────────
-    return {
-        "answer": answer,
-        "path": path_data,
-        "entities_found": entities,
-        "vector_chunks_used": len(vector_context),
-        "steps": steps,
-    }
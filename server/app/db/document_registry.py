@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+from app.services.corpus import DEFAULT_CORPUS
+
+
+class DocumentRegistry:
+    """
+    Content-addressed ingestion ledger (SQLite, local to the API process).
+    Tracks which chunk hashes have already been embedded / triplet-extracted and
+    which chunk hashes make up each ingested document, so re-uploads only pay
+    for chunks that actually changed. Documents belong to a corpus; chunk keys
+    are namespaced per corpus (see app.services.corpus.chunk_key).
+    Removing a document records what the stores still have to forget (gc_pending)
+    in the same transaction; entries are cleared once the stores are cleaned, so a
+    failed cleanup is retried instead of leaving orphans nothing refers to.
+    """
+    _instance = None
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DocumentRegistry, cls).__new__(cls)
+            data_dir = os.getenv("AURELIUS_DATA_DIR", "data")
+            os.makedirs(data_dir, exist_ok=True)
+            path = os.path.join(data_dir, "registry.sqlite3")
+            cls._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            cls._conn.execute("PRAGMA journal_mode=WAL")
+            cls._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id      TEXT PRIMARY KEY,
+                    source      TEXT NOT NULL,
+                    file_hash   TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    updated_at  REAL NOT NULL,
+                    corpus      TEXT NOT NULL DEFAULT 'default'
+                );
+                CREATE INDEX IF NOT EXISTS documents_file_hash ON documents(file_hash);
+
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_hash  TEXT PRIMARY KEY,
+                    embedded    INTEGER NOT NULL DEFAULT 0,
+                    extracted   INTEGER NOT NULL DEFAULT 0,
+                    created_at  REAL NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS document_chunks (
+                    doc_id      TEXT NOT NULL,
+                    position    INTEGER NOT NULL,
+                    chunk_hash  TEXT NOT NULL,
+                    PRIMARY KEY (doc_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS document_chunks_hash ON document_chunks(chunk_hash);
+
+                CREATE TABLE IF NOT EXISTS gc_pending (
+                    kind        TEXT NOT NULL,  -- chunk | document | corpus
+                    name        TEXT NOT NULL,  -- chunk key, doc_id or corpus
+                    detail      TEXT,           -- corpus: JSON list of its doc_ids
+                    created_at  REAL NOT NULL,
+                    PRIMARY KEY (kind, name)
+                );
+
+                CREATE TABLE IF NOT EXISTS meta (
+                    key         TEXT PRIMARY KEY,
+                    value       TEXT NOT NULL
+                );
+                """
+            )
+            # Registries created before corpora existed: every document is in the default corpus
+            columns = {row[1] for row in cls._conn.execute("PRAGMA table_info(documents)")}
+            if "corpus" not in columns:
+                cls._conn.execute(
+                    f"ALTER TABLE documents ADD COLUMN corpus TEXT NOT NULL DEFAULT '{DEFAULT_CORPUS}'"
+                )
+            cls._conn.execute("CREATE INDEX IF NOT EXISTS documents_corpus ON documents(corpus)")
+            print(f"🗂️  Document registry ready at {path}")
+        return cls._instance
+
+    def find_document_by_hash(self, file_hash: str, corpus: str = DEFAULT_CORPUS) -> Optional[Dict]:
+        """Returns a document of `corpus` previously ingested with exactly these file bytes, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, source, file_hash, chunk_count, updated_at, corpus FROM documents "
+                "WHERE file_hash = ? AND corpus = ? ORDER BY updated_at DESC LIMIT 1",
+                (file_hash, corpus),
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("doc_id", "source", "file_hash", "chunk_count", "updated_at", "corpus"), row))
+
+    def get_document_chunks(self, doc_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash FROM document_chunks WHERE doc_id = ? ORDER BY position",
+                (doc_id,),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def known_chunks(self, chunk_hashes: Iterable[str], stage: str) -> Set[str]:
+        """Subset of `chunk_hashes` already processed for `stage` ("embedded" or "extracted")."""
+        if stage not in ("embedded", "extracted"):
+            raise ValueError(f"Unknown chunk stage: {stage}")
+        hashes = list(set(chunk_hashes))
+        known: Set[str] = set()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash FROM chunks WHERE {stage} = 1 AND chunk_hash IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                known.update(r[0] for r in rows)
+        return known
+
+    def mark_chunks(self, chunk_hashes: Iterable[str], stage: str):
+        """Records that `chunk_hashes` have been processed for `stage`."""
+        if stage not in ("embedded", "extracted"):
+            raise ValueError(f"Unknown chunk stage: {stage}")
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO chunks (chunk_hash, {stage}, created_at) VALUES (?, 1, ?) "
+                f"ON CONFLICT(chunk_hash) DO UPDATE SET {stage} = 1",
+                [(h, now) for h in set(chunk_hashes)],
+            )
+
+    def chunk_owners(self, chunk_keys: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """For each key a document still references, one such document ({"doc_id", "source"}), oldest first."""
+        keys = list(dict.fromkeys(chunk_keys))
+        owners: Dict[str, Dict[str, str]] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT dc.chunk_hash, d.doc_id, d.source FROM document_chunks dc "
+                    "JOIN documents d ON d.doc_id = dc.doc_id "
+                    f"WHERE dc.chunk_hash IN ({','.join('?' * len(batch))}) ORDER BY d.updated_at",
+                    batch,
+                ).fetchall()
+                for key, doc_id, source in rows:
+                    owners.setdefault(key, {"doc_id": doc_id, "source": source})
+        return owners
+
+    def _unreferenced(self, chunk_keys: Iterable[str]) -> List[str]:
+        """Keys no document references any more (call inside a transaction)."""
+        keys = list(dict.fromkeys(chunk_keys))
+        unreferenced = []
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            referenced = {r[0] for r in self._conn.execute(
+                f"SELECT DISTINCT chunk_hash FROM document_chunks WHERE chunk_hash IN ({','.join('?' * len(batch))})",
+                batch,
+            )}
+            unreferenced.extend(k for k in batch if k not in referenced)
+        # Forget their processing state too, so re-ingesting the text embeds / extracts it again
+        for i in range(0, len(unreferenced), 500):
+            batch = unreferenced[i:i + 500]
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_hash IN ({','.join('?' * len(batch))})", batch)
+        return unreferenced
+
+    def register_document(
+        self, doc_id: str, source: str, file_hash: str, chunk_hashes: List[str], corpus: str = DEFAULT_CORPUS
+    ) -> List[str]:
+        """
+        Creates or replaces the document's chunk list in one transaction.
+        Returns the chunk keys a replaced version used that no document references any
+        more (the caller removes them from the vector / keyword stores and the graph).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                previous = [r[0] for r in self._conn.execute(
+                    "SELECT chunk_hash FROM document_chunks WHERE doc_id = ?", (doc_id,)
+                )]
+                self._conn.execute(
+                    "INSERT INTO documents (doc_id, source, file_hash, chunk_count, updated_at, corpus) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(doc_id) DO UPDATE SET "
+                    "source = excluded.source, file_hash = excluded.file_hash, "
+                    "chunk_count = excluded.chunk_count, updated_at = excluded.updated_at, "
+                    "corpus = excluded.corpus",
+                    (doc_id, source, file_hash, len(chunk_hashes), time.time(), corpus),
+                )
+                self._conn.execute("DELETE FROM document_chunks WHERE doc_id = ?", (doc_id,))
+                self._conn.executemany(
+                    "INSERT INTO document_chunks (doc_id, position, chunk_hash) VALUES (?, ?, ?)",
+                    [(doc_id, i, h) for i, h in enumerate(chunk_hashes)],
+                )
+                stale = self._unreferenced(set(previous) - set(chunk_hashes))
+                # Chunks referenced again must not be collected by a pending cleanup
+                self._unmark_pending("chunk", chunk_hashes)
+                self._unmark_pending("document", [doc_id])
+                self._mark_pending("chunk", stale)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return stale
+
+    def get_document(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, source, file_hash, chunk_count, updated_at, corpus FROM documents WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("doc_id", "source", "file_hash", "chunk_count", "updated_at", "corpus"), row))
+
+    def list_corpora(self) -> List[Dict]:
+        """Per-corpus document and chunk counts."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT corpus, count(*), coalesce(sum(chunk_count), 0), max(updated_at) "
+                "FROM documents GROUP BY corpus ORDER BY corpus"
+            ).fetchall()
+        return [
+            {"corpus": c, "documents": d, "chunks": n, "updated_at": u}
+            for c, d, n, u in rows
+        ]
+
+    def corpus_documents(self, corpus: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM documents WHERE corpus = ? ORDER BY doc_id", (corpus,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def _forget_documents(self, doc_ids: List[str], corpus: Optional[str] = None) -> List[str]:
+        """
+        Deletes documents in one transaction. Returns the chunk keys no remaining
+        document references (the caller deletes them from the vector / keyword stores).
+        The cleanup still owed — those chunks, plus each document's (or the whole
+        corpus') graph membership — is recorded in gc_pending.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                keys: List[str] = []
+                for i in range(0, len(doc_ids), 500):
+                    batch = doc_ids[i:i + 500]
+                    marks = ",".join("?" * len(batch))
+                    keys.extend(r[0] for r in self._conn.execute(
+                        f"SELECT chunk_hash FROM document_chunks WHERE doc_id IN ({marks})", batch
+                    ))
+                    self._conn.execute(f"DELETE FROM document_chunks WHERE doc_id IN ({marks})", batch)
+                    self._conn.execute(f"DELETE FROM documents WHERE doc_id IN ({marks})", batch)
+                orphaned = self._unreferenced(keys)
+                self._mark_pending("chunk", orphaned)
+                if corpus is None:
+                    self._mark_pending("document", doc_ids)
+                else:
+                    self._mark_pending("corpus", [corpus], json.dumps(doc_ids))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return orphaned
+
+    def delete_document(self, doc_id: str) -> List[str]:
+        """Forgets one document. Returns its chunk keys no other document references."""
+        return self._forget_documents([doc_id])
+
+    def delete_corpus(self, corpus: str) -> List[str]:
+        """Forgets every document of `corpus`. Returns the chunk keys no remaining document references."""
+        return self._forget_documents(self.corpus_documents(corpus), corpus)
+
+    def _mark_pending(self, kind: str, names: Iterable[str], detail: Optional[str] = None):
+        """Records owed store cleanup (call inside a transaction)."""
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO gc_pending (kind, name, detail, created_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(kind, name) DO UPDATE SET detail = excluded.detail",
+            [(kind, name, detail, now) for name in set(names)],
+        )
+
+    def _unmark_pending(self, kind: str, names: Iterable[str]):
+        names = list(set(names))
+        for i in range(0, len(names), 500):
+            batch = names[i:i + 500]
+            self._conn.execute(
+                f"DELETE FROM gc_pending WHERE kind = ? AND name IN ({','.join('?' * len(batch))})",
+                [kind, *batch],
+            )
+
+    def pending_gc(self) -> Dict[str, List]:
+        """Cleanup not yet confirmed: {"chunks": [keys], "documents": [doc_ids], "corpora": [(corpus, doc_ids)]}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, name, detail FROM gc_pending ORDER BY created_at").fetchall()
+        return {
+            "chunks": [name for kind, name, _ in rows if kind == "chunk"],
+            "documents": [name for kind, name, _ in rows if kind == "document"],
+            "corpora": [(name, json.loads(detail or "[]")) for kind, name, detail in rows if kind == "corpus"],
+        }
+
+    def clear_pending_gc(self, kind: str, names: Iterable[str]):
+        """Confirms that the stores no longer hold `names` (chunk keys, doc_ids or corpora)."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._unmark_pending(kind, names)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def increment_meta(self, key: str) -> int:
+        """Atomically increments an integer meta counter (missing = 0). Returns the new value."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key,),
+            )
+            return int(self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0])
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
@@ -0,0 +1,92 @@
+import os
+import importlib.util
+from typing import Dict, Optional
+import httpx
+from groq import AsyncGroq
+
+
+class LLMClients:
+    """
+    App-lifetime HTTP client registry for the LLM backends.
+    Created in the FastAPI lifespan and closed on shutdown, so every Groq/Ollama call
+    reuses pooled keep-alive connections instead of paying TCP/TLS setup per request.
+    Accessors lazily create clients when used outside the app (scripts, workers).
+    """
+
+    MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+    KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+    CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+    GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+    OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+    OPENAI_TIMEOUT = float(os.getenv("LLM_OPENAI_TIMEOUT", "60"))
+    # HTTP/2 multiplexing for TLS backends (Groq) when the `h2` package is installed
+    HTTP2 = importlib.util.find_spec("h2") is not None
+
+    _ollama: Optional[httpx.AsyncClient] = None
+    _groq_http: Optional[httpx.AsyncClient] = None
+    # One SDK client per API key (several Groq accounts), all on the pooled _groq_http
+    _groq: Dict[str, AsyncGroq] = {}
+    _openai: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def _limits(cls) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=cls.MAX_CONNECTIONS,
+            max_keepalive_connections=cls.MAX_KEEPALIVE,
+            keepalive_expiry=cls.KEEPALIVE_EXPIRY,
+        )
+
+    @classmethod
+    def ollama(cls) -> httpx.AsyncClient:
+        if cls._ollama is None:
+            # Ollama is plain HTTP on localhost — HTTP/1.1 keep-alive is all it supports
+            cls._ollama = httpx.AsyncClient(
+                limits=cls._limits(),
+                timeout=httpx.Timeout(cls.OLLAMA_TIMEOUT, connect=cls.CONNECT_TIMEOUT),
+            )
+        return cls._ollama
+
+    @classmethod
+    def groq(cls, api_key: Optional[str] = None) -> AsyncGroq:
+        """Groq SDK client for `api_key` (GROQ_API_KEY when not given)."""
+        api_key = api_key or os.getenv("GROQ_API_KEY") or ""
+        if api_key not in cls._groq:
+            timeout = httpx.Timeout(cls.GROQ_TIMEOUT, connect=cls.CONNECT_TIMEOUT)
+            if cls._groq_http is None:
+                cls._groq_http = httpx.AsyncClient(limits=cls._limits(), timeout=timeout, http2=cls.HTTP2)
+            # Retries are handled by LLMEngine._call_llm so they respect the shared backend throttle
+            cls._groq[api_key] = AsyncGroq(
+                api_key=api_key or None,
+                http_client=cls._groq_http,
+                timeout=timeout,
+                max_retries=0,
+            )
+        return cls._groq[api_key]
+
+    @classmethod
+    def openai(cls) -> httpx.AsyncClient:
+        """Shared client for OpenAI-compatible servers (vLLM, llama.cpp, LM Studio, …), any host."""
+        if cls._openai is None:
+            cls._openai = httpx.AsyncClient(
+                limits=cls._limits(),
+                timeout=httpx.Timeout(cls.OPENAI_TIMEOUT, connect=cls.CONNECT_TIMEOUT),
+                http2=cls.HTTP2,
+            )
+        return cls._openai
+
+    @classmethod
+    async def startup(cls):
+        cls.ollama()
+        if os.getenv("GROQ_API_KEY"):
+            cls.groq()
+        print(f"   LLM HTTP pool: {cls.MAX_CONNECTIONS} connections, HTTP/2 {'on' if cls.HTTP2 else 'off'}")
+
+    @classmethod
+    async def shutdown(cls):
+        # The Groq SDK clients own nothing but the shared _groq_http
+        for client in (cls._groq_http, cls._ollama, cls._openai):
+            if client is not None and not client.is_closed:
+                await client.aclose()
+        cls._ollama = cls._groq_http = cls._openai = None
+        cls._groq = {}
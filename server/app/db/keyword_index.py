@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+from app.services.corpus import DEFAULT_CORPUS, Scope
+
+# Query terms: words of 2+ characters; each is quoted, so FTS5 syntax never leaks in
+QUERY_TERM_PATTERN = re.compile(r'\w{2,}')
+
+
+class KeywordIndex:
+    """
+    Local BM25 keyword index over the same chunks stored in ChromaDB (SQLite FTS5).
+    Rows are keyed by chunk content hash, like the Chroma ids, so re-indexing the
+    same text is a no-op and results from both retrievers can be fused by id.
+    """
+    _instance = None
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(KeywordIndex, cls).__new__(cls)
+            data_dir = os.getenv("AURELIUS_DATA_DIR", "data")
+            os.makedirs(data_dir, exist_ok=True)
+            path = os.path.join(data_dir, "keyword_index.sqlite3")
+            cls._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            cls._conn.execute("PRAGMA journal_mode=WAL")
+            cls._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS keyword_chunks (
+                    id        INTEGER PRIMARY KEY,
+                    hash      TEXT NOT NULL UNIQUE,
+                    text      TEXT NOT NULL,
+                    metadata  TEXT NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS keyword_fts USING fts5(
+                    text, content='keyword_chunks', content_rowid='id', tokenize='porter unicode61'
+                );
+                """
+            )
+        return cls._instance
+
+    def add(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Indexes chunk records ({"hash", "text", **metadata}). Already-indexed hashes are
+        skipped. Returns the number of new rows.
+        """
+        added = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for record in records:
+                    metadata = {k: v for k, v in record.items() if k not in ("hash", "text")}
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO keyword_chunks (hash, text, metadata) VALUES (?, ?, ?)",
+                        (record["hash"], record["text"], json.dumps(metadata)),
+                    )
+                    if cursor.rowcount:
+                        self._conn.execute(
+                            "INSERT INTO keyword_fts (rowid, text) VALUES (?, ?)",
+                            (cursor.lastrowid, record["text"]),
+                        )
+                        added += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def search(
+        self, query: str, limit: int = 20, scope: Optional[Scope] = None, keys: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25-ranked chunk records ({"id", "text", **metadata}), best first, within `scope`
+        and, when given, among the chunk `keys` only.
+        """
+        terms = dict.fromkeys(t.lower() for t in QUERY_TERM_PATTERN.findall(query))
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        corpus = scope.corpus if scope else None
+        doc_id = scope.doc_id if scope else None
+        key_list = json.dumps(keys) if keys is not None else None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.hash, c.text, c.metadata FROM keyword_fts "
+                "JOIN keyword_chunks c ON c.id = keyword_fts.rowid "
+                "WHERE keyword_fts MATCH ? "
+                "AND (? IS NULL OR coalesce(json_extract(c.metadata, '$.corpus'), ?) = ?) "
+                "AND (? IS NULL OR coalesce(json_extract(c.metadata, '$.doc_id'), "
+                "json_extract(c.metadata, '$.source')) = ?) "
+                "AND (? IS NULL OR c.hash IN (SELECT value FROM json_each(?))) "
+                "ORDER BY bm25(keyword_fts) LIMIT ?",
+                (match, corpus, DEFAULT_CORPUS, corpus, doc_id, doc_id, key_list, key_list, limit),
+            ).fetchall()
+        return [{"id": h, "text": text, **json.loads(metadata)} for h, text, metadata in rows]
+
+    def delete(self, hashes: List[str]) -> int:
+        """Removes chunks by key (and their full-text postings). Returns the number removed."""
+        removed = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for i in range(0, len(hashes), 500):
+                    batch = hashes[i:i + 500]
+                    rows = self._conn.execute(
+                        f"SELECT id, text FROM keyword_chunks WHERE hash IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    # External-content FTS5: postings are removed with the special 'delete' command
+                    self._conn.executemany(
+                        "INSERT INTO keyword_fts (keyword_fts, rowid, text) VALUES ('delete', ?, ?)", rows
+                    )
+                    self._conn.executemany("DELETE FROM keyword_chunks WHERE id = ?", [(r[0],) for r in rows])
+                    removed += len(rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def relabel(self, owners: Dict[str, Dict[str, str]], previous_doc_id: str) -> int:
+        """Sets doc_id / source of the given chunks still attributed to `previous_doc_id`."""
+        with self._lock:
+            cursor = self._conn.executemany(
+                "UPDATE keyword_chunks SET metadata = json_set(metadata, '$.doc_id', ?, '$.source', ?) "
+                "WHERE hash = ? AND json_extract(metadata, '$.doc_id') = ?",
+                [(o["doc_id"], o["source"], key, previous_doc_id) for key, o in owners.items()],
+            )
+            return cursor.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM keyword_chunks").fetchone()[0]
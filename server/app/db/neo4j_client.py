@@ -1,30 +1,64 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS
 import os
 
 class Neo4jClient:
+    """
+    Singleton holder for the Neo4j drivers.
+    Services use the async driver (non-blocking inside FastAPI handlers); with a
+    `neo4j://` URI, read sessions are routed to read replicas / followers.
+    """
     _instance = None
     _driver = None
+    _async_driver = None
+
+    MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "100"))
+    ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+    DATABASE = os.getenv("NEO4J_DATABASE") or None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Neo4jClient, cls).__new__(cls)
-            uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-            user = os.getenv("NEO4J_USER", "neo4j")
-            password = os.getenv("NEO4J_PASSWORD", "password")
-            cls._driver = GraphDatabase.driver(uri, auth=(user, password))
+            cls._uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+            cls._auth = (os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password"))
+            cls._async_driver = AsyncGraphDatabase.driver(
+                cls._uri,
+                auth=cls._auth,
+                max_connection_pool_size=cls.MAX_POOL_SIZE,
+                connection_acquisition_timeout=cls.ACQUISITION_TIMEOUT,
+            )
         return cls._instance
 
     def get_driver(self):
+        """Synchronous driver for scripts and tooling (created on first use)."""
+        if self._driver is None:
+            Neo4jClient._driver = GraphDatabase.driver(
+                self._uri,
+                auth=self._auth,
+                max_connection_pool_size=self.MAX_POOL_SIZE,
+                connection_acquisition_timeout=self.ACQUISITION_TIMEOUT,
+            )
         return self._driver
 
-    def close(self):
+    def get_async_driver(self):
+        return self._async_driver
+
+    def session(self, read: bool = False):
+        """Async session; read sessions may be routed to replicas in a cluster."""
+        return self._async_driver.session(
+            database=self.DATABASE,
+            default_access_mode=READ_ACCESS if read else WRITE_ACCESS,
+        )
+
+    async def close(self):
+        if self._async_driver:
+            await self._async_driver.close()
         if self._driver:
             self._driver.close()
-            print("🛑 Neo4j Connection Closed.")
+        print("🛑 Neo4j Connection Closed.")
 
-    def verify_connection(self):
+    async def verify_connection(self):
         try:
-            self._driver.verify_connectivity()
+            await self._async_driver.verify_connectivity()
             print("✅ Neo4j Connection Verified.")
             return True
         except Exception as e:
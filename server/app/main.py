@@ -5,7 +5,7 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import os
-import httpx
+import asyncio
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,13 +14,66 @@ load_dotenv()
 limiter = Limiter(key_func=get_remote_address)
 
 
+async def _migrate_retrieval_indexes():
+    try:
+        from app.services.vector_service import VectorService
+        vs = await asyncio.to_thread(VectorService)
+        await asyncio.to_thread(vs.migrate_corpus_metadata)
+        await asyncio.to_thread(vs.backfill_keyword_index)
+    except Exception as e:
+        print(f"⚠️ Retrieval index migration skipped: {e}")
+    # Store cleanup left over from deletes that failed half-way
+    from app.services.ingest_service import IngestService
+    await IngestService.collect_pending()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Aurelius Neuro-Symbolic Engine Starting...")
     print(f"   Neo4j: {os.getenv('NEO4J_URI', 'bolt://localhost:7687')}")
     print(f"   ChromaDB: localhost:{os.getenv('CHROMA_PORT', '8001')}")
-    print(f"   LLM Backend: {'Groq Cloud ⚡' if os.getenv('GROQ_API_KEY') else 'Local Ollama 🖥️'}")
+    from app.services.llm_router import LLMRouter
+    print(f"   LLM Backends: {LLMRouter.describe()}")
+
+    # Index :Entity(name) so graph MERGEs are index lookups, not label scans
+    try:
+        from app.services.graph_service import GraphService
+        await GraphService().ensure_schema()
+        print("   Graph schema: :Entity(name) constraint + resolution indexes ready")
+        from app.services.entity_resolver import EntityResolver
+        await EntityResolver.load_indexes()
+    except Exception as e:
+        print(f"⚠️ Graph schema setup skipped: {e}")
+
+    # Optional in-process CSR replica of the graph for path + cluster search
+    from app.services.graph_snapshot import GraphSnapshot
+    await GraphSnapshot.start()
+
+    # Load the embedding model once, before the first request needs it
+    from app.services.embedding_service import EmbeddingService
+    await EmbeddingService.startup()
+    from app.services.reranker import Reranker
+    await Reranker.startup()
+    # Tag pre-corpus chunks, index chunks stored before the keyword index existed and
+    # retry pending store cleanup (background, best effort)
+    asyncio.create_task(_migrate_retrieval_indexes())
+
+    # Long-lived, pooled HTTP clients for the LLM backends
+    from app.db.http_clients import LLMClients
+    await LLMClients.startup()
+
+    # Background ingestion workers (POST /ingest only enqueues)
+    from app.services.ingest_service import IngestQueue
+    await IngestQueue.start()
     yield
+    await IngestQueue.stop()
+    await GraphSnapshot.stop()
+    await EmbeddingService.shutdown()
+    await LLMClients.shutdown()
+    from app.db.neo4j_client import Neo4jClient
+    await Neo4jClient().close()
+    from app.services.pdf_engine import PDFEngine
+    PDFEngine.shutdown_pool()
     print("🛑 Aurelius Engine Shutting Down.")
 
 
@@ -51,10 +104,14 @@ app.add_middleware(
 from app.api.ingest import router as ingest_router
 from app.api.graph import router as graph_router
 from app.api.reason import router as reason_router
+from app.api.corpora import router as corpora_router
+from app.api.documents import router as documents_router
 
 app.include_router(ingest_router, prefix="/api/v1", tags=["Ingestion"])
 app.include_router(graph_router, prefix="/api/v1", tags=["Visualization"])
 app.include_router(reason_router, prefix="/api/v1", tags=["Reasoning"])
+app.include_router(corpora_router, prefix="/api/v1", tags=["Corpora"])
+app.include_router(documents_router, prefix="/api/v1", tags=["Documents"])
 
 
 @app.get("/")
@@ -79,8 +136,7 @@ async def health_check():
     try:
         from app.db.neo4j_client import Neo4jClient
         client = Neo4jClient()
-        client.verify_connection()
-        services["neo4j"] = "connected"
+        services["neo4j"] = "connected" if await client.verify_connection() else "offline: unreachable"
     except Exception as e:
         services["neo4j"] = f"offline: {str(e)[:50]}"
 
@@ -93,24 +149,31 @@ async def health_check():
     except Exception as e:
         services["chromadb"] = f"offline: {str(e)[:50]}"
 
-    # Check LLM backend
-    groq_key = os.getenv("GROQ_API_KEY")
-    if groq_key:
-        services["llm"] = "groq:configured"
-    else:
-        # Try pinging local Ollama
-        try:
-            async with httpx.AsyncClient(timeout=2.0) as client:
-                resp = await client.get("http://localhost:11434/api/tags")
-                services["llm"] = "ollama:online" if resp.status_code == 200 else "ollama:not-responding"
-        except Exception:
-            services["llm"] = "ollama:offline"
+    # Check LLM backends (Ollama hosts are pinged; degraded only if none can answer)
+    from app.services.llm_router import LLMRouter
+    backends = await LLMRouter.probe()
+    usable = [name for name, state in backends.items() if state in ("online", "configured")]
+    services["llm"] = (
+        f"{len(usable)}/{len(backends)} backends up ({', '.join(usable)})"
+        if usable else "offline: " + ", ".join(f"{n}:{s}" for n, s in backends.items())
+    )
 
     # Overall status: degraded if any critical service is offline
     all_online = all("offline" not in v for v in services.values())
 
+    from app.services.llm_cache import LLMCache
+    from app.services.graph_snapshot import GraphSnapshot
+    from app.services.embedding_service import EmbeddingService
+    from app.services.query_cache import QueryCache
+    from app.services.entity_matcher import EntityMatcher
     return {
         "status": "healthy" if all_online else "degraded",
         "version": "1.0.0",
         "services": services,
+        "llm_cache": LLMCache().stats() if LLMCache.ENABLED else "disabled",
+        "graph_snapshot": GraphSnapshot.stats() if GraphSnapshot.ENABLED else "disabled",
+        "embeddings": EmbeddingService.stats(),
+        "query_cache": QueryCache().stats() if QueryCache.ENABLED else "disabled",
+        "llm_backends": LLMRouter.stats(),
+        "entity_matcher": EntityMatcher.stats() if EntityMatcher.ENABLED else "disabled",
     }
@@ -0,0 +1,140 @@
+import os
+import re
+import asyncio
+import hashlib
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+
+# Sentence ends: terminal punctuation (plus closing quotes/brackets) followed by whitespace
+# and an uppercase letter, digit or opening quote. Blank lines always end a paragraph.
+SENTENCE_BOUNDARY_PATTERN = re.compile(
+    r'(?:(?<=[.!?])|(?<=[.!?]["\')\]]))\s+(?=["\'(\[]?[A-Z0-9])|\n\s*\n'
+)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# (text, tokens, page, char_start, char_end) — offsets are into the cleaned page text
+Sentence = Tuple[str, int, int, int, int]
+
+
+class TextChunker:
+    """
+    Streaming, boundary-aware chunker.
+    Consumes the cleaned page stream from PDFEngine and packs whole sentences into
+    chunks under a token budget measured with the embedding model's tokenizer, so
+    nothing is cut mid-word and nothing is silently truncated by the embedder.
+    Each chunk record carries its page span, page-local character offsets and a
+    content hash used as its storage id (identical text → identical chunk).
+    """
+
+    # all-MiniLM-L6-v2 truncates input at 256 word pieces, [CLS] and [SEP] included
+    MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+    # Sentences repeated at the start of the next chunk for context continuity
+    OVERLAP_SENTENCES = int(os.getenv("CHUNK_OVERLAP_SENTENCES", "1"))
+    TOKENIZER_NAME = os.getenv("CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+
+    _token_counter: Optional[Callable[[str], int]] = None
+    # Special tokens the embedder adds around the text ([CLS] + [SEP]); read from the tokenizer once loaded
+    _special_tokens = 2
+
+    def __init__(self, max_tokens: Optional[int] = None, overlap_sentences: Optional[int] = None):
+        self.max_tokens = max(max_tokens or self.MAX_TOKENS, 16)
+        self.overlap_sentences = max(self.OVERLAP_SENTENCES if overlap_sentences is None else overlap_sentences, 0)
+
+    @classmethod
+    def count_tokens(cls, text: str) -> int:
+        """Token count under the embedding model's tokenizer (word-based estimate if unavailable)."""
+        if cls._token_counter is None:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(cls.TOKENIZER_NAME)
+                cls._token_counter = lambda t: len(tokenizer.encode(t, add_special_tokens=False))
+                cls._special_tokens = tokenizer.num_special_tokens_to_add()
+            except Exception as e:
+                print(f"⚠️ Chunker: tokenizer '{cls.TOKENIZER_NAME}' unavailable ({e}). Estimating tokens.")
+                cls._token_counter = lambda t: int(len(t.split()) * 1.3) + 1
+        return cls._token_counter(text)
+
+    @property
+    def content_tokens(self) -> int:
+        """Token budget for the chunk text: the embedder's input limit minus its special tokens."""
+        return max(self.max_tokens - self._special_tokens, 1)
+
+    def _split_page(self, page_number: int, text: str) -> List[Sentence]:
+        """Splits one page into sentences with token counts (blocking — runs in a worker thread)."""
+        sentences: List[Sentence] = []
+        start = 0
+        for match in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+            sentences.extend(self._make_sentences(page_number, text, start, match.start()))
+            start = match.end()
+        sentences.extend(self._make_sentences(page_number, text, start, len(text)))
+        return sentences
+
+    def _make_sentences(self, page_number: int, text: str, start: int, end: int) -> List[Sentence]:
+        raw = text[start:end]
+        stripped = raw.strip()
+        if not stripped:
+            return []
+        start += len(raw) - len(raw.lstrip())
+        end = start + len(stripped)
+        normalized = WHITESPACE_PATTERN.sub(' ', stripped)
+        tokens = self.count_tokens(normalized)
+        if tokens <= self.content_tokens:
+            return [(normalized, tokens, page_number, start, end)]
+
+        # Oversized sentence (tables, run-on extraction artifacts): fall back to word windows
+        pieces: List[Sentence] = []
+        words = list(re.finditer(r'\S+', stripped))
+        words_per_piece = max(int(len(words) * self.content_tokens / tokens), 1)
+        for i in range(0, len(words), words_per_piece):
+            group = words[i:i + words_per_piece]
+            piece = " ".join(w.group() for w in group)
+            pieces.append((
+                piece, self.count_tokens(piece), page_number,
+                start + group[0].start(), start + group[-1].end(),
+            ))
+        return pieces
+
+    def _make_chunk(self, index: int, sentences: List[Sentence]) -> Dict[str, Any]:
+        text = " ".join(s[0] for s in sentences)
+        return {
+            "index": index,
+            "hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "text": text,
+            "tokens": sum(s[1] for s in sentences),
+            "page_start": sentences[0][2],
+            "char_start": sentences[0][3],
+            "page_end": sentences[-1][2],
+            "char_end": sentences[-1][4],
+        }
+
+    async def chunk_pages(self, pages: AsyncIterable[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields chunk records as soon as they fill up. Pages are numbered from 1 in
+        stream order; only the sentences of the chunk being built are buffered.
+        """
+        current: List[Sentence] = []
+        current_tokens = 0
+        fresh = 0  # Sentences in `current` not already emitted as overlap
+        index = 0
+        page_number = 0
+
+        async for page in pages:
+            page_number += 1
+            if not page.strip():
+                continue
+            for sentence in await asyncio.to_thread(self._split_page, page_number, page):
+                if current and fresh and current_tokens + sentence[1] > self.content_tokens:
+                    yield self._make_chunk(index, current)
+                    index += 1
+                    current = current[-self.overlap_sentences:] if self.overlap_sentences else []
+                    current_tokens = sum(s[1] for s in current)
+                    fresh = 0
+                # Drop overlap sentences that would push a fresh chunk over budget
+                while current and not fresh and current_tokens + sentence[1] > self.content_tokens:
+                    current_tokens -= current.pop(0)[1]
+                current.append(sentence)
+                current_tokens += sentence[1]
+                fresh += 1
+
+        if current and fresh:
+            yield self._make_chunk(index, current)
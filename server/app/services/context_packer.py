@@ -0,0 +1,157 @@
+import os
+import re
+from typing import Callable, List, Optional, Sequence, Set
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+# Words that say nothing about which sentences of a passage matter
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how in is it its of on or "
+    "that the their this to was were what when where which who why with".split()
+)
+# Separator between evidence passages in the prompt
+EVIDENCE_SEPARATOR = "\n\n---\n\n"
+
+
+class ContextPacker:
+    """
+    Token-budgeted prompt assembly.
+    Counts tokens (the model tokenizer when LLM_TOKENIZER is set, a conservative
+    character estimate otherwise) and fits variable prompt parts — the graph path and
+    the evidence passages — into what is left of the prompt budget after the fixed
+    text. Passages are taken in retrieval order (fused and reranked, best first); a
+    passage that no longer fits whole is cut down to its sentences sharing the most
+    terms with the question and path. When not everything fits, the budget is split
+    fairly, so one long passage cannot crowd out shorter ones ranked below it.
+    """
+
+    # Model context window (llama3-8b-8192 on Groq, llama3 on Ollama)
+    CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "8192"))
+    # Completion tokens reserved for free-text answers
+    MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "512"))
+    # Input tokens per synthesis prompt (system + question + path + evidence)
+    PROMPT_BUDGET = int(os.getenv("LLM_PROMPT_BUDGET_TOKENS", "3072"))
+    # Share of the budget the graph path may take before it is abbreviated
+    PATH_SHARE = 0.25
+    # Passages trimmed below this many tokens are not worth including
+    MIN_PASSAGE_TOKENS = 32
+    TOKENIZER_NAME = os.getenv("LLM_TOKENIZER", "")
+
+    _token_counter: Optional[Callable[[str], int]] = None
+
+    @classmethod
+    def count_tokens(cls, text: str) -> int:
+        """Prompt token count (~3.5 characters per token for Llama-family models if no tokenizer)."""
+        if cls._token_counter is None:
+            cls._token_counter = lambda t: int(len(t) / 3.5) + 1
+            if cls.TOKENIZER_NAME:
+                try:
+                    from transformers import AutoTokenizer
+                    tokenizer = AutoTokenizer.from_pretrained(cls.TOKENIZER_NAME)
+                    cls._token_counter = lambda t: len(tokenizer.encode(t, add_special_tokens=False))
+                except Exception as e:
+                    print(f"⚠️ Context packer: tokenizer '{cls.TOKENIZER_NAME}' unavailable ({e}). Estimating tokens.")
+        return cls._token_counter(text)
+
+    @classmethod
+    def input_budget(cls, budget: Optional[int] = None) -> int:
+        """Prompt budget, never more than the context window minus the reserved output."""
+        return max(min(budget or cls.PROMPT_BUDGET, cls.CONTEXT_TOKENS - cls.MAX_OUTPUT_TOKENS), 1)
+
+    @classmethod
+    def truncate(cls, text: str, max_tokens: int) -> str:
+        """Cuts `text` at a word boundary so it fits `max_tokens`."""
+        tokens = cls.count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        words = text.split()
+        keep = int(len(words) * max_tokens / tokens)
+        while keep > 0 and cls.count_tokens(" ".join(words[:keep]) + " …") > max_tokens:
+            keep = int(keep * 0.9)
+        return " ".join(words[:keep]) + " …" if keep > 0 else ""
+
+    @staticmethod
+    def format_path(nodes: Sequence[str], relations: Optional[Sequence[str]] = None) -> str:
+        """Compact path text: `A -[IMPROVED]- B -[MEASURED_BY]- C` (plain arrows without labels)."""
+        if not relations or len(relations) != len(nodes) - 1:
+            return " → ".join(nodes)
+        parts = [nodes[0]]
+        for relation, node in zip(relations, nodes[1:]):
+            parts.append(f"-[{relation}]- {node}")
+        return " ".join(parts)
+
+    @classmethod
+    def fit_path(cls, nodes: Sequence[str], relations: Optional[Sequence[str]], max_tokens: int) -> str:
+        """Formatted path, dropping trailing nodes (noted as `+N more`) while it exceeds `max_tokens`."""
+        text = cls.format_path(nodes, relations)
+        keep = len(nodes)
+        while keep > 1 and cls.count_tokens(text) > max_tokens:
+            keep -= 1
+            text = f"{cls.format_path(nodes[:keep], relations[:keep - 1] if relations else None)} (+{len(nodes) - keep} more)"
+        return text
+
+    @staticmethod
+    def _terms(text: str) -> Set[str]:
+        return {w for w in WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS}
+
+    @classmethod
+    def _trim_passage(cls, passage: str, terms: Set[str], max_tokens: int) -> str:
+        """The passage's most on-topic sentences that fit `max_tokens`, in their original order."""
+        sentences = [s for s in SENTENCE_PATTERN.split(passage.strip()) if s]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(cls._terms(sentences[i]) & terms), i),
+        )
+        chosen: List[int] = []
+        used = 0
+        for i in ranked:
+            cost = cls.count_tokens(sentences[i]) + 1
+            if used + cost <= max_tokens:
+                chosen.append(i)
+                used += cost
+        if not chosen:
+            return cls.truncate(sentences[ranked[0]], max_tokens) if sentences else ""
+        chosen.sort()
+        text = sentences[chosen[0]]
+        for previous, i in zip(chosen, chosen[1:]):
+            # Elided sentences are marked, adjacent ones read on normally
+            text += (" " if i == previous + 1 else " … ") + sentences[i]
+        return text
+
+    @staticmethod
+    def _fair_shares(costs: List[int], budget: int) -> List[int]:
+        """
+        Water-filling split of `budget`: passages that fit under the common level keep
+        their full size, the rest are capped at that level.
+        """
+        shares = list(costs)
+        remaining, pending = budget, sorted(range(len(costs)), key=lambda i: costs[i])
+        while pending:
+            level = remaining // len(pending)
+            if costs[pending[0]] > level:
+                for i in pending:
+                    shares[i] = level
+                break
+            remaining -= costs[pending.pop(0)]
+        return shares
+
+    @classmethod
+    def pack_evidence(cls, passages: Sequence[str], focus: str, max_tokens: int) -> List[str]:
+        """
+        Evidence passages (best first) fitted into `max_tokens`, separators included.
+        `focus` (question + path text) decides which sentences survive trimming.
+        """
+        terms = cls._terms(focus)
+        separator = cls.count_tokens(EVIDENCE_SEPARATOR)
+        # Keep the passages that can get a useful share, best first
+        passages = list(passages)[:max(max_tokens // (cls.MIN_PASSAGE_TOKENS + separator), 0)]
+        costs = [cls.count_tokens(p) for p in passages]
+        shares = cls._fair_shares(costs, max_tokens - separator * len(passages))
+        packed: List[str] = []
+        for passage, cost, share in zip(passages, costs, shares):
+            if cost > share:
+                passage = cls._trim_passage(passage, terms, share)
+                if cls.count_tokens(passage) < cls.MIN_PASSAGE_TOKENS:
+                    continue
+            packed.append(passage)
+        return packed
@@ -0,0 +1,69 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Data ingested before corpora existed (no corpus metadata) belongs to this corpus
+DEFAULT_CORPUS = "default"
+CORPUS_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+def validate_corpus(name: Optional[str]) -> str:
+    """Returns the corpus name (DEFAULT_CORPUS when empty). Raises ValueError if invalid."""
+    name = (name or "").strip() or DEFAULT_CORPUS
+    if not CORPUS_NAME_PATTERN.match(name):
+        raise ValueError(
+            f"Invalid corpus name '{name}': use 1-64 letters, digits, '_', '-' or '.', starting with a letter or digit."
+        )
+    return name
+
+
+def document_id(corpus: str, filename: str) -> str:
+    """Document ids are the filename, namespaced by corpus outside the default corpus."""
+    return filename if corpus == DEFAULT_CORPUS else f"{corpus}/{filename}"
+
+
+def chunk_key(corpus: str, content_hash: str) -> str:
+    """
+    Storage id of a chunk (Chroma id, keyword index and registry key). Identical text
+    is still stored once per corpus, so deleting one corpus never touches another.
+    """
+    return content_hash if corpus == DEFAULT_CORPUS else f"{corpus}:{content_hash}"
+
+
+@dataclass(frozen=True)
+class Scope:
+    """
+    Optional corpus / document filter for retrieval and graph reasoning.
+    Pushed down as a Chroma `where` filter, a keyword-index predicate and a Cypher
+    predicate on the `corpora` / `doc_ids` lists carried by entities and relationships.
+    """
+    corpus: Optional[str] = None
+    doc_id: Optional[str] = None
+
+    @property
+    def is_global(self) -> bool:
+        return self.corpus is None and self.doc_id is None
+
+    def chroma_where(self) -> Optional[Dict[str, Any]]:
+        clauses = []
+        if self.corpus is not None:
+            clauses.append({"corpus": self.corpus})
+        if self.doc_id is not None:
+            clauses.append({"doc_id": self.doc_id})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def cypher_params(self) -> Dict[str, Any]:
+        return {"scope_corpus": self.corpus, "scope_doc": self.doc_id, "default_corpus": DEFAULT_CORPUS}
+
+    @staticmethod
+    def cypher_filter(var: str) -> str:
+        """Cypher predicate for a node or relationship variable (needs cypher_params())."""
+        return (
+            f"($scope_corpus IS NULL OR $scope_corpus IN coalesce({var}.corpora, [$default_corpus])) "
+            f"AND ($scope_doc IS NULL OR $scope_doc IN coalesce({var}.doc_ids, []))"
+        )
+
+
+GLOBAL_SCOPE = Scope()
@@ -0,0 +1,51 @@
+import os
+import time
+from typing import Dict, List, Optional
+
+# Confidence of a relationship backed by a single chunk; every further supporting
+# chunk or document closes part of the remaining gap to 1.0 (noisy-OR)
+BASE_CONFIDENCE = float(os.getenv("EDGE_BASE_CONFIDENCE", "0.7"))
+# Confidence multiplier for a predicate that all extractions between the pair disagree with;
+# a predicate every extraction agrees on keeps the full corroboration score
+AGREEMENT_FLOOR = float(os.getenv("EDGE_AGREEMENT_FLOOR", "0.5"))
+# Support half-life when weighing competing predicates between the same pair (0 = no decay)
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("EDGE_RECENCY_HALF_LIFE_DAYS", "180"))
+
+DAY_MS = 86_400_000
+
+
+def recency_weight(last_seen_ms: Optional[float], now_ms: float) -> float:
+    """1.0 for evidence seen now, halving every RECENCY_HALF_LIFE_DAYS."""
+    if not RECENCY_HALF_LIFE_DAYS or last_seen_ms is None:
+        return 1.0
+    age_days = max(now_ms - last_seen_ms, 0) / DAY_MS
+    return 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def corroboration(support: int, documents: int) -> float:
+    """Noisy-OR over independent evidence: each chunk, and each extra document, counts once."""
+    evidence = max(support, 1) + max(documents - 1, 0)
+    return 1.0 - (1.0 - BASE_CONFIDENCE) ** evidence
+
+
+def score_pair(edges: List[Dict], now_ms: Optional[float] = None) -> List[float]:
+    """
+    Confidence of every relationship between one (subject, object) pair.
+
+    edges: [{"support", "documents", "last_seen"}]. A relationship's agreement is
+    its share of the recency-weighted support of all predicates asserted between
+    the pair, so a contradicted or superseded predicate loses confidence as the
+    competing one gains evidence.
+    confidence = corroboration(support, documents) * (floor + (1 - floor) * agreement)
+    """
+    now_ms = time.time() * 1000 if now_ms is None else now_ms
+    weights = [max(e["support"] or 1, 1) * recency_weight(e["last_seen"], now_ms) for e in edges]
+    total = sum(weights) or 1.0
+    return [
+        round(
+            corroboration(e["support"] or 1, e["documents"] or 1)
+            * (AGREEMENT_FLOOR + (1.0 - AGREEMENT_FLOOR) * w / total),
+            4,
+        )
+        for e, w in zip(edges, weights)
+    ]
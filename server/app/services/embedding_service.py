@@ -0,0 +1,130 @@
+import os
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+
+class EmbeddingService:
+    """
+    Process-wide sentence-transformers model, loaded once (at startup).
+
+    Query embeddings go through a micro-batcher: calls to embed_query() that arrive
+    within BATCH_WINDOW_MS of each other are encoded together in one forward pass
+    in a worker thread, so concurrent /reason requests share the model instead of
+    queueing on it one by one. Recent query vectors are kept in an LRU.
+    Document embeddings (ingestion) use the same model via embedding_function().
+    """
+
+    MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+    MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+    CACHE_ENTRIES = int(os.getenv("EMBEDDING_CACHE_ENTRIES", "2048"))
+
+    _model = None
+    _model_lock = threading.Lock()
+    _queue: Optional[asyncio.Queue] = None
+    _batcher: Optional[asyncio.Task] = None
+    _cache: "OrderedDict[str, List[float]]" = OrderedDict()
+    counters = {"cache_hits": 0, "encoded": 0, "batches": 0}
+
+    @classmethod
+    def model(cls):
+        """The shared SentenceTransformer (loaded on first use; blocking)."""
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    cls._model = SentenceTransformer(cls.MODEL_NAME)
+                    print(f"🧬 Embedding model loaded: {cls.MODEL_NAME}")
+        return cls._model
+
+    @classmethod
+    def encode(cls, texts: List[str]) -> List[List[float]]:
+        """Blocking batch encode — call from a worker thread."""
+        return cls.model().encode(list(texts), convert_to_numpy=True).tolist()
+
+    @classmethod
+    def embedding_function(cls) -> "SharedEmbeddingFunction":
+        return SharedEmbeddingFunction()
+
+    @classmethod
+    async def startup(cls):
+        try:
+            await asyncio.to_thread(cls.model)
+        except Exception as e:
+            print(f"⚠️ Embedding model preload failed ({e}). It will load on first use.")
+
+    @classmethod
+    async def shutdown(cls):
+        if cls._batcher is not None:
+            cls._batcher.cancel()
+            await asyncio.gather(cls._batcher, return_exceptions=True)
+        cls._batcher = None
+        cls._queue = None
+
+    @classmethod
+    async def embed_query(cls, text: str) -> List[float]:
+        cached = cls._cache.get(text)
+        if cached is not None:
+            cls._cache.move_to_end(text)
+            cls.counters["cache_hits"] += 1
+            return cached
+
+        if cls._queue is None:
+            cls._queue = asyncio.Queue()
+            cls._batcher = asyncio.create_task(cls._batch_loop(), name="embedding-batcher")
+        future = asyncio.get_running_loop().create_future()
+        await cls._queue.put((text, future))
+        return await future
+
+    @classmethod
+    async def _batch_loop(cls):
+        loop = asyncio.get_running_loop()
+        queue = cls._queue
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await queue.get()]
+            deadline = loop.time() + cls.BATCH_WINDOW_MS / 1000
+            while len(batch) < cls.MAX_BATCH:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Texts encoded by an earlier batch while these requests were queued are reused
+            vectors = {text: cls._cache[text] for text, _ in batch if text in cls._cache}
+            texts = [text for text in dict.fromkeys(text for text, _ in batch) if text not in vectors]
+            try:
+                if texts:
+                    vectors.update(zip(texts, await asyncio.to_thread(cls.encode, texts)))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            cls.counters["batches"] += 1
+            cls.counters["encoded"] += len(texts)
+            for text in vectors:
+                cls._cache[text] = vectors[text]
+                cls._cache.move_to_end(text)
+            while len(cls._cache) > cls.CACHE_ENTRIES:
+                cls._cache.popitem(last=False)
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(vectors[text])
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {"model_loaded": cls._model is not None, "cached_queries": len(cls._cache), **cls.counters}
+
+
+class SharedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Chroma embedding function backed by the process-wide model (no per-instance load)."""
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return EmbeddingService.encode(input)
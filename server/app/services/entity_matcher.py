@@ -0,0 +1,255 @@
+import os
+import re
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.services.embedding_service import EmbeddingService
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# Query words that never make an entity on their own and do not count toward coverage
+QUERY_STOPWORDS = frozenset(
+    "a about after an and are as at be been between by can could did do does for from "
+    "had has have how i in into is it its me of on or tell than that the their them then "
+    "there these this those through to was were what when where which who whom why will "
+    "with would you your explain describe relate related relationship".split()
+)
+# Trie key holding the names that end at a node (tokens are never empty)
+END = ""
+
+# (start, end) token span and the entity names spelled by it
+Match = Tuple[int, int, Set[str]]
+
+
+def _stem(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def match_tokens(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens, plural 's' dropped (`Mechanisms` matches `Mechanism`)."""
+    return [_stem(t) for t in TOKEN_PATTERN.findall(text.lower())]
+
+
+class EntityTrie:
+    """
+    Token trie over entity names. One left-to-right walk from every query position
+    finds every n-gram that spells a known name — O(tokens × longest name), however
+    large the vocabulary. Updated incrementally as entities are written and deleted.
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, names: Iterable[str]):
+        for name in names:
+            tokens = match_tokens(name)
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            ending = node.setdefault(END, set())
+            if name not in ending:
+                ending.add(name)
+                self._size += 1
+
+    def remove(self, names: Iterable[str]):
+        for name in names:
+            node = self._root
+            for token in match_tokens(name):
+                node = node.get(token)
+                if node is None:
+                    break
+            if node is not None and name in node.get(END, ()):
+                node[END].discard(name)
+                self._size -= 1
+
+    def matches(self, tokens: List[str]) -> List[Match]:
+        found: List[Match] = []
+        for start in range(len(tokens)):
+            node = self._root
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if node.get(END):
+                    found.append((start, end + 1, node[END]))
+        return found
+
+
+class EntityMatcher:
+    """
+    Local fast path for query entity extraction.
+    Query n-grams are matched against the :Entity vocabulary (EntityTrie); the longest
+    non-overlapping matches win. Optionally, query spans left unmatched are compared
+    with embeddings of the entity names (nearest neighbour). The result is confident
+    when the matches cover at least MIN_COVERAGE of the query's content words; only
+    then does /reason skip the LLM. Matches are real node names, so they resolve exactly.
+    """
+
+    ENABLED = os.getenv("ENTITY_LOCAL_EXTRACTION", "true").lower() in ("1", "true", "yes")
+    MIN_COVERAGE = float(os.getenv("ENTITY_LOCAL_MIN_COVERAGE", "0.5"))
+    EMBEDDINGS_ENABLED = os.getenv("ENTITY_LOCAL_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+    EMBEDDING_MIN_SIMILARITY = float(os.getenv("ENTITY_LOCAL_EMBEDDING_MIN_SIMILARITY", "0.8"))
+    MAX_ENTITIES = 3
+    EMBED_BATCH = 256
+
+    _trie: Optional[EntityTrie] = None
+    # Name embeddings: stacked unit vectors, plus names still waiting to be embedded
+    _vectors: Optional[np.ndarray] = None
+    _vector_names: List[str] = []
+    _pending: List[str] = []
+    _removed: Set[str] = set()
+    _embedder: Optional[asyncio.Task] = None
+    counters = {"local": 0, "low_confidence": 0, "embedding_matches": 0}
+
+    # -------------------------------------------------------------------------
+    # Vocabulary lifecycle (fed by EntityResolver)
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def start_loading(cls):
+        """Starts a fresh vocabulary; names arrive through observe() (startup scan)."""
+        cls._trie = EntityTrie()
+        cls._vectors, cls._vector_names, cls._pending, cls._removed = None, [], [], set()
+
+    @classmethod
+    def observe(cls, names: Iterable[str]):
+        if cls._trie is None:
+            return
+        names = list(names)
+        cls._trie.add(names)
+        if cls.EMBEDDINGS_ENABLED:
+            cls._removed.difference_update(names)
+            cls._pending.extend(names)
+            cls._schedule_embedding()
+
+    @classmethod
+    def forget(cls, names: Iterable[str]):
+        if cls._trie is None:
+            return
+        names = list(names)
+        cls._trie.remove(names)
+        if cls.EMBEDDINGS_ENABLED:
+            cls._removed.update(names)
+
+    @classmethod
+    def _schedule_embedding(cls):
+        if cls._embedder is not None and not cls._embedder.done():
+            return
+        try:
+            cls._embedder = asyncio.get_running_loop().create_task(cls._embed_pending(), name="entity-embedder")
+        except RuntimeError:
+            pass  # No event loop (scripts): embedded on the next schedule from the app
+
+    @classmethod
+    async def _embed_pending(cls):
+        """Embeds newly observed names in the background, a batch per worker-thread call."""
+        while cls._pending:
+            batch, cls._pending = cls._pending[:cls.EMBED_BATCH], cls._pending[cls.EMBED_BATCH:]
+            try:
+                vectors = np.asarray(await asyncio.to_thread(EmbeddingService.encode, batch), dtype=np.float32)
+            except Exception as e:
+                print(f"⚠️ Entity matcher: name embedding failed ({e}). Exact vocabulary matches only.")
+                cls._pending = []
+                return
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+            cls._vectors = vectors if cls._vectors is None else np.vstack([cls._vectors, vectors])
+            cls._vector_names.extend(batch)
+
+    # -------------------------------------------------------------------------
+    # Extraction
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _select(matches: List[Match]) -> List[Match]:
+        """Longest non-overlapping matches, in query order."""
+        taken: List[Match] = []
+        for match in sorted(matches, key=lambda m: (-(m[1] - m[0]), m[0])):
+            if all(match[1] <= t[0] or match[0] >= t[1] for t in taken):
+                taken.append(match)
+        return sorted(taken)
+
+    @classmethod
+    async def _nearest_name(cls, text: str) -> Optional[str]:
+        """The entity name nearest to `text`, if it is similar enough."""
+        query = np.asarray(await EmbeddingService.embed_query(text), dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-9)
+        similarities = cls._vectors @ query
+        for i in np.argsort(-similarities)[:5]:
+            if similarities[i] < cls.EMBEDDING_MIN_SIMILARITY:
+                return None
+            if cls._vector_names[i] not in cls._removed:
+                return cls._vector_names[i]
+        return None
+
+    @classmethod
+    async def _embedding_matches(cls, words: List[str], uncovered: List[int], limit: int) -> List[Tuple[str, Set[int]]]:
+        """
+        (entity name, covered positions) for runs of unmatched content words (typos,
+        paraphrases of a known name): each run as a whole, then its single words.
+        """
+        runs: List[List[int]] = []
+        for i in uncovered:
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        spans = runs + [[i] for run in runs if len(run) > 1 for i in run]
+        found: List[Tuple[str, Set[int]]] = []
+        covered: Set[int] = set()
+        for span in spans[:2 * cls.MAX_ENTITIES]:
+            if len(found) >= limit or covered.intersection(span):
+                continue
+            name = await cls._nearest_name(" ".join(words[i] for i in span))
+            if name is not None and name not in (n for n, _ in found):
+                found.append((name, set(span)))
+                covered.update(span)
+        return found
+
+    @classmethod
+    async def extract(cls, query: str) -> Optional[Dict[str, Any]]:
+        """
+        {"entities", "coverage", "confident"} for a query, or None when the vocabulary
+        is not loaded. Entities are existing node names, most specific first.
+        """
+        if cls._trie is None or not len(cls._trie):
+            return None
+        words = TOKEN_PATTERN.findall(query.lower())
+        tokens = [_stem(w) for w in words]
+        content = {i for i, w in enumerate(words) if w not in QUERY_STOPWORDS}
+        if not content:
+            return {"entities": [], "coverage": 0.0, "confident": False}
+
+        selected = [
+            m for m in cls._select(cls._trie.matches(tokens))
+            if any(i in content for i in range(m[0], m[1]))
+        ]
+        covered = {i for start, end, _ in selected for i in range(start, end)} & content
+        # Longer spans are more specific; ties keep query order
+        ranked = sorted(selected, key=lambda m: -(m[1] - m[0]))
+        entities = [min(names) for _, _, names in ranked]
+
+        if cls.EMBEDDINGS_ENABLED and cls._vectors is not None and len(entities) < cls.MAX_ENTITIES:
+            uncovered = sorted(content - covered)
+            for name, span in await cls._embedding_matches(words, uncovered, cls.MAX_ENTITIES - len(entities)):
+                if name not in entities:
+                    entities.append(name)
+                    covered.update(span)
+                    cls.counters["embedding_matches"] += 1
+
+        coverage = len(covered) / len(content)
+        confident = bool(entities) and coverage >= cls.MIN_COVERAGE
+        cls.counters["local" if confident else "low_confidence"] += 1
+        return {"entities": entities[:cls.MAX_ENTITIES], "coverage": round(coverage, 3), "confident": confident}
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            **cls.counters,
+            "vocabulary": len(cls._trie) if cls._trie is not None else 0,
+            "embedded_names": len(cls._vector_names),
+        }
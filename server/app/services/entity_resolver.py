@@ -0,0 +1,230 @@
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from app.db.neo4j_client import Neo4jClient
+from app.services.corpus import GLOBAL_SCOPE, Scope
+from app.services.entity_matcher import EntityMatcher
+
+
+# Alphanumeric tokens only, so nothing needs Lucene escaping
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize_name(name: str) -> str:
+    """Canonical lookup key for an entity name: lowercase, single-spaced, trimmed."""
+    return " ".join(name.lower().split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """Dice coefficient over character trigrams of the normalized names (0..1)."""
+    ta, tb = _trigrams(normalize_name(a)), _trigrams(normalize_name(b))
+    if not ta or not tb:
+        return 0.0
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+class TrigramIndex:
+    """
+    In-process inverted trigram index over entity names.
+    Used for typo-tolerant lookups without a database round trip; updated
+    incrementally as entities are written and deleted.
+    """
+
+    def __init__(self):
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._grams: Dict[int, int] = {}  # name id -> trigram count
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._removed: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, names: Iterable[str]):
+        for name in names:
+            if name in self._ids:
+                continue
+            name_id = len(self._names)
+            self._names.append(name)
+            self._ids[name] = name_id
+            grams = _trigrams(normalize_name(name))
+            self._grams[name_id] = len(grams)
+            for gram in grams:
+                self._postings[gram].append(name_id)
+
+    def remove(self, names: Iterable[str]):
+        """Tombstones deleted names; they are skipped by search and can be re-added."""
+        for name in names:
+            name_id = self._ids.pop(name, None)
+            if name_id is not None:
+                self._removed.add(name_id)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        grams = _trigrams(normalize_name(query))
+        if not grams:
+            return []
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        scored = [
+            (2 * count / (len(grams) + self._grams[name_id]), name_id)
+            for name_id, count in shared.items()
+            if name_id not in self._removed
+        ]
+        scored.sort(reverse=True)
+        return [
+            {"name": self._names[name_id], "score": round(score, 4), "method": "trigram"}
+            for score, name_id in scored[:limit]
+        ]
+
+
+class EntityResolver:
+    """
+    Maps free-text entity mentions to :Entity nodes with ranked, scored candidates.
+    1. Exact match on the indexed `name_norm` property (score 1.0)
+    2. In-process trigram index, when enabled (ENTITY_RESOLVER_TRIGRAMS)
+    3. Neo4j full-text index with per-token fuzzy matching
+    Non-exact candidates are re-scored by trigram similarity to the mention, so
+    scores are comparable across methods. Lookups never scan the whole label.
+    """
+
+    FULLTEXT_INDEX = "entity_name_fulltext"
+    MIN_SCORE = float(os.getenv("ENTITY_MATCH_MIN_SCORE", "0.35"))
+    TRIGRAMS_ENABLED = os.getenv("ENTITY_RESOLVER_TRIGRAMS", "false").lower() in ("1", "true", "yes")
+
+    _trigram_index: Optional[TrigramIndex] = None
+
+    def __init__(self):
+        self.client = Neo4jClient()
+
+    # -------------------------------------------------------------------------
+    # In-process index lifecycle
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    async def load_indexes(cls, batch_size: int = 10000):
+        """
+        Builds the in-process name indexes from every :Entity name in one scan (startup):
+        the trigram index (ENTITY_RESOLVER_TRIGRAMS) and the query entity vocabulary
+        (EntityMatcher, ENTITY_LOCAL_EXTRACTION).
+        """
+        if not cls.TRIGRAMS_ENABLED and not EntityMatcher.ENABLED:
+            return
+        index = TrigramIndex() if cls.TRIGRAMS_ENABLED else None
+        if EntityMatcher.ENABLED:
+            EntityMatcher.start_loading()
+        client = Neo4jClient()
+        last = ""
+        total = 0
+        while True:
+            async with client.session(read=True) as session:
+                result = await session.run(
+                    "MATCH (e:Entity) WHERE e.name > $last "
+                    "RETURN e.name AS name ORDER BY e.name LIMIT $limit",
+                    last=last, limit=batch_size,
+                )
+                names = [r["name"] async for r in result]
+            if not names:
+                break
+            if index is not None:
+                index.add(names)
+            EntityMatcher.observe(names)
+            total += len(names)
+            last = names[-1]
+        cls._trigram_index = index
+        loaded = [n for n, on in (("trigram index", index is not None), ("query vocabulary", EntityMatcher.ENABLED)) if on]
+        print(f"🔤 Entity resolver: {' + '.join(loaded)} loaded ({total} entities)")
+
+    @classmethod
+    def observe(cls, names: Iterable[str]):
+        """Incremental refresh hook — called with entity names after each graph write."""
+        names = list(names)
+        if cls._trigram_index is not None:
+            cls._trigram_index.add(names)
+        EntityMatcher.observe(names)
+
+    @classmethod
+    def forget(cls, names: Iterable[str]):
+        """Incremental refresh hook — called with entity names after they were deleted."""
+        names = list(names)
+        if cls._trigram_index is not None:
+            cls._trigram_index.remove(names)
+        EntityMatcher.forget(names)
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _fulltext_query(mention: str) -> str:
+        tokens = TOKEN_PATTERN.findall(normalize_name(mention))
+        # Fuzzy-match longer tokens only; short tokens fuzz into noise
+        return " ".join(f"{t}~" if len(t) > 3 else t for t in tokens)
+
+    @staticmethod
+    async def _lookup(tx, mention_norm: str, fulltext_query: str, index_name: str, limit: int, scope: Scope) -> Dict:
+        exact_result = await tx.run(
+            "MATCH (e:Entity {name_norm: $norm}) WHERE " + Scope.cypher_filter("e") + " "
+            "RETURN e.name AS name LIMIT $limit",
+            norm=mention_norm, limit=limit, **scope.cypher_params(),
+        )
+        exact = [r["name"] async for r in exact_result]
+        fuzzy = []
+        if fulltext_query:
+            fuzzy_result = await tx.run(
+                "CALL db.index.fulltext.queryNodes($index, $query) "
+                "YIELD node, score WHERE " + Scope.cypher_filter("node") + " "
+                "RETURN node.name AS name, score LIMIT $limit",
+                index=index_name, query=fulltext_query, limit=limit, **scope.cypher_params(),
+            )
+            fuzzy = [(r["name"], r["score"]) async for r in fuzzy_result]
+        return {"exact": exact, "fuzzy": fuzzy}
+
+    async def resolve(self, mention: str, limit: int = 5, scope: Scope = GLOBAL_SCOPE) -> List[Dict]:
+        """
+        Returns up to `limit` candidates [{"name", "score", "method"}], best first,
+        with scores in 0..1. Candidates below MIN_SCORE are dropped.
+        A scope restricts candidates to entities seen in that corpus / document.
+        """
+        mention_norm = normalize_name(mention)
+        if not mention_norm:
+            return []
+
+        candidates: Dict[str, Dict] = {}
+
+        def offer(name: str, score: float, method: str):
+            if name and (name not in candidates or candidates[name]["score"] < score):
+                candidates[name] = {"name": name, "score": round(score, 4), "method": method}
+
+        # The trigram index holds names only, so it cannot honour a scope
+        if self._trigram_index is not None and scope.is_global:
+            for hit in self._trigram_index.search(mention, limit):
+                offer(hit["name"], hit["score"], "trigram")
+
+        async with self.client.session(read=True) as session:
+            found = await session.execute_read(
+                self._lookup, mention_norm, self._fulltext_query(mention), self.FULLTEXT_INDEX, limit, scope
+            )
+
+        for name in found["exact"]:
+            offer(name, 1.0, "exact")
+        if found["fuzzy"]:
+            top = max(score for _, score in found["fuzzy"]) or 1.0
+            for name, score in found["fuzzy"]:
+                # Blend Lucene relevance with surface similarity; exact matches stay on top
+                blended = 0.5 * (score / top) * 0.95 + 0.5 * trigram_similarity(mention, name)
+                offer(name, blended, "fulltext")
+
+        ranked = sorted(candidates.values(), key=lambda c: c["score"], reverse=True)
+        return [c for c in ranked if c["score"] >= self.MIN_SCORE][:limit]
+
+    async def resolve_best(self, mention: str, scope: Scope = GLOBAL_SCOPE) -> Optional[str]:
+        """Name of the single best-matching entity, or None."""
+        candidates = await self.resolve(mention, limit=1, scope=scope)
+        return candidates[0]["name"] if candidates else None
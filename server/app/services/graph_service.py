@@ -1,130 +1,636 @@
 from app.db.neo4j_client import Neo4jClient
-from typing import List, Dict, Optional
+from app.services.corpus import DEFAULT_CORPUS, GLOBAL_SCOPE, Scope
+from app.services.edge_confidence import score_pair
+from app.services.entity_resolver import EntityResolver, normalize_name
+from app.services.graph_snapshot import GraphSnapshot
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+import asyncio
+import os
 import re
+import time
 
 
 class GraphService:
+    # Max rows per UNWIND statement in bulk writes
+    WRITE_BATCH_SIZE = int(os.getenv("GRAPH_WRITE_BATCH_SIZE", "500"))
+
     def __init__(self):
-        self.driver = Neo4jClient().get_driver()
+        self.client = Neo4jClient()
 
-    def sanitize_token(self, text: str) -> str:
-        """Normalizes entity names for consistent graph keys (Title Case)."""
-        return text.strip().title()
+    def sanitize_token(self, text) -> str:
+        """Normalizes entity names for consistent graph keys (Title Case). Numbers (years) become text."""
+        if text is None or isinstance(text, (dict, list)):
+            return ""
+        return str(text).strip().title()
 
-    def upsert_triplets(self, triplets: List[Dict[str, str]]):
+    async def ensure_schema(self):
         """
-        Writes a batch of triplets to the knowledge graph.
-        Uses MERGE for idempotency (no duplicates ever created).
-        STEP 6: Stores confidence=1.0 on every new relationship for true weighted Dijkstra.
-        """
-        if not triplets:
-            return
-
-        with self.driver.session() as session:
-            for triplet in triplets:
-                subj = self.sanitize_token(triplet.get("subject", ""))
-                obj = self.sanitize_token(triplet.get("object", ""))
-                pred = triplet.get("predicate", "RELATED_TO").upper().replace(" ", "_")
-
-                # Security: strip non-alphanumeric characters from predicate (prevents Cypher injection)
-                pred = re.sub(r'[^A-Z0-9_]', '', pred)
-                if not pred:
-                    pred = "RELATED_TO"
-
-                if not subj or not obj:
-                    continue
-
-                # STEP 6: Set confidence=1.0 on new edges (coalesce prevents overwriting existing scores)
-                query = (
-                    f"MERGE (s:Entity {{name: $subj}}) "
-                    f"MERGE (o:Entity {{name: $obj}}) "
-                    f"MERGE (s)-[r:{pred}]->(o) "
-                    f"ON CREATE SET r.confidence = 1.0, r.created_at = timestamp() "
+        Creates the :Entity(name) uniqueness constraint so MERGE uses an index lookup
+        instead of a label scan. Falls back to a plain index if existing duplicate
+        names prevent the constraint from being created.
+        Also creates the entity-resolution indexes (normalized name + full-text)
+        and backfills `name_norm` on nodes (and evidence-based confidence on
+        relationships) written before they existed.
+        """
+        async with self.client.session() as session:
+            try:
+                result = await session.run(
+                    "CREATE CONSTRAINT entity_name_unique IF NOT EXISTS "
+                    "FOR (e:Entity) REQUIRE e.name IS UNIQUE"
+                )
+                await result.consume()
+            except Exception as e:
+                print(f"⚠️ Entity uniqueness constraint unavailable ({e}). Using a plain index.")
+                result = await session.run(
+                    "CREATE INDEX entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)"
                 )
+                await result.consume()
+
+            for statement in (
+                "CREATE INDEX entity_name_norm IF NOT EXISTS FOR (e:Entity) ON (e.name_norm)",
+                f"CREATE FULLTEXT INDEX {EntityResolver.FULLTEXT_INDEX} IF NOT EXISTS "
+                "FOR (e:Entity) ON EACH [e.name]",
+            ):
+                result = await session.run(statement)
+                await result.consume()
+
+        await self._backfill_name_norm()
+        await self._backfill_confidence()
+
+    @staticmethod
+    async def _set_name_norm(tx, batch_size: int) -> int:
+        """Transaction function: normalizes one batch of legacy nodes. Returns the batch size."""
+        result = await tx.run(
+            "MATCH (e:Entity) WHERE e.name_norm IS NULL AND e.name IS NOT NULL "
+            "RETURN e.name AS name LIMIT $limit",
+            limit=batch_size,
+        )
+        names = [r["name"] async for r in result]
+        if names:
+            result = await tx.run(
+                "UNWIND $rows AS row MATCH (e:Entity {name: row.name}) SET e.name_norm = row.norm",
+                rows=[{"name": n, "norm": normalize_name(n)} for n in names],
+            )
+            await result.consume()
+        return len(names)
+
+    async def _backfill_name_norm(self, batch_size: int = 5000):
+        total = 0
+        while True:
+            async with self.client.session() as session:
+                updated = await session.execute_write(self._set_name_norm, batch_size)
+            total += updated
+            if updated < batch_size:
+                break
+        if total:
+            print(f"🔤 Backfilled name_norm on {total} entities")
 
-                session.run(query, subj=subj, obj=obj)
-                print(f"✅ Graph Write: ({subj}) -[{pred}]-> ({obj})")
+    @staticmethod
+    async def _score_legacy_edges(tx, batch_size: int) -> int:
+        """
+        Transaction function: gives one batch of relationships written with a constant
+        confidence their evidence fields and a rescored confidence. Returns the batch size.
+        """
+        result = await tx.run(
+            "MATCH (s:Entity)-[r]->(o:Entity) WHERE r.last_seen IS NULL "
+            "WITH s, o, r LIMIT $limit "
+            "SET r.last_seen = coalesce(r.created_at, timestamp()), "
+            "r.support = coalesce(r.support, size(r.chunks), 1) "
+            "RETURN count(r) AS processed, collect(DISTINCT [s.name, o.name]) AS pairs",
+            limit=batch_size,
+        )
+        record = await result.single()
+        if record["processed"]:
+            await GraphService._rescore_pairs(tx, [tuple(p) for p in record["pairs"]])
+            await GraphService._bump_data_version(tx)
+        return record["processed"]
+
+    async def _backfill_confidence(self, batch_size: int = 5000):
+        total = 0
+        while True:
+            async with self.client.session() as session:
+                updated = await session.execute_write(self._score_legacy_edges, batch_size)
+            total += updated
+            if updated < batch_size:
+                break
+        if total:
+            print(f"📐 Backfilled evidence-based confidence on {total} relationships")
+
+    def _normalize_triplet(self, triplet: Dict[str, str]) -> Optional[Tuple[str, str, str]]:
+        """Returns (subject, PREDICATE, object) ready for Cypher, or None if unusable."""
+        subj = self.sanitize_token(triplet.get("subject", ""))
+        obj = self.sanitize_token(triplet.get("object", ""))
+        pred = str(triplet.get("predicate") or "RELATED_TO").upper().replace(" ", "_")
+
+        # Security: strip non-alphanumeric characters from predicate (prevents Cypher injection)
+        pred = re.sub(r'[^A-Z0-9_]', '', pred)
+        if not pred:
+            pred = "RELATED_TO"
+        # Relationship types are interpolated unquoted: they must not start with a digit (`2X_FASTER`)
+        if pred[0].isdigit():
+            pred = f"REL_{pred}"
 
-    def get_whole_graph(self) -> Dict:
+        if not subj or not obj:
+            return None
+        return subj, pred, obj
+
+    @staticmethod
+    async def _read_data_version(tx) -> int:
+        """Transaction function: current graph data version (0 before the first write)."""
+        result = await tx.run("MATCH (m:AureliusMeta {key: 'graph'}) RETURN m.version AS version")
+        record = await result.single()
+        return record["version"] if record and record["version"] is not None else 0
+
+    @staticmethod
+    async def _bump_data_version(tx) -> int:
+        """Transaction function: increments the data version as part of a write."""
+        result = await tx.run(
+            "MERGE (m:AureliusMeta {key: 'graph'}) "
+            "SET m.version = coalesce(m.version, 0) + 1 "
+            "RETURN m.version AS version"
+        )
+        record = await result.single()
+        return record["version"]
+
+    async def get_data_version(self) -> int:
+        """
+        Monotonic counter bumped by every graph write that changes data.
+        Readers (snapshots, caches) compare it to decide whether they are current.
         """
-        Fetches the entire knowledge graph for the 3D visualizer.
-        Returns nodes and links with relationship types.
-        Limit 1000 nodes for rendering performance.
+        async with self.client.session(read=True) as session:
+            return await session.execute_read(self._read_data_version)
+
+    @staticmethod
+    def _add_membership(var: str) -> str:
+        """
+        Cypher fragment adding $corpus / $doc_id to the `corpora` / `doc_ids` lists of
+        an existing node or relationship — only when missing, so repeated writes set
+        nothing. A missing `corpora` list means the default corpus (pre-corpus data).
+        """
+        corpora = f"coalesce({var}.corpora, [$default_corpus])"
+        doc_ids = f"coalesce({var}.doc_ids, [])"
+        return (
+            f"FOREACH (_ IN CASE WHEN $corpus IN {corpora} THEN [] ELSE [1] END | "
+            f"SET {var}.corpora = {corpora} + $corpus) "
+            f"FOREACH (_ IN CASE WHEN $doc_id IN {doc_ids} THEN [] ELSE [1] END | "
+            f"SET {var}.doc_ids = {doc_ids} + $doc_id) "
+        )
+
+    @staticmethod
+    async def _rescore_pairs(tx, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str, str, float]]:
+        """
+        Transaction function: recomputes the evidence-based confidence of every
+        relationship between the given (subject, object) pairs (see edge_confidence)
+        and writes back only the values that changed.
+        Returns the changed edges as (subject, PREDICATE, object, confidence).
+        """
+        result = await tx.run(
+            """
+            UNWIND $pairs AS pair
+            MATCH (s:Entity {name: pair[0]})-[x]->(o:Entity {name: pair[1]})
+            RETURN pair[0] AS subj, pair[1] AS obj, type(x) AS rel, elementId(x) AS id,
+                   x.confidence AS confidence, coalesce(x.support, 1) AS support,
+                   size(coalesce(x.doc_ids, [])) AS documents,
+                   coalesce(x.last_seen, x.created_at) AS last_seen
+            """,
+            pairs=[list(p) for p in pairs],
+        )
+        by_pair: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        for record in await result.data():
+            by_pair[(record["subj"], record["obj"])].append(record)
+
+        now_ms = time.time() * 1000
+        updates = [
+            {"id": edge["id"], "subj": edge["subj"], "rel": edge["rel"], "obj": edge["obj"], "confidence": confidence}
+            for edges in by_pair.values()
+            for edge, confidence in zip(edges, score_pair(edges, now_ms))
+            if edge["confidence"] is None or abs(edge["confidence"] - confidence) > 1e-4
+        ]
+        if updates:
+            result = await tx.run(
+                "UNWIND $updates AS u MATCH ()-[x]->() WHERE elementId(x) = u.id SET x.confidence = u.confidence",
+                updates=updates,
+            )
+            await result.consume()
+        return [(u["subj"], u["rel"], u["obj"], u["confidence"]) for u in updates]
+
+    @staticmethod
+    async def _write_predicate_groups(
+        tx, groups: Dict[str, List[Dict[str, str]]], batch_size: int, corpus: str, doc_id: str
+    ) -> Tuple[int, int, Optional[int], List[Tuple[str, str, str, float]]]:
+        """
+        Transaction function: one UNWIND MERGE per (predicate, batch), then a confidence
+        rescore of every touched (subject, object) pair.
+        Returns (nodes_created, edges_created, data_version, rescored edges) — the version
+        is only bumped (in the same transaction) when something changed, otherwise None.
+        Relationships accumulate the chunk keys that produced them (`chunks`), their
+        count (`support`) and when support last arrived (`last_seen`), so confidence
+        reflects the evidence and deleting a document can retract exactly its part.
+        """
+        nodes_created = 0
+        edges_created = 0
+        changed = False
+        for pred, rows in groups.items():
+            # STEP 6: Confidence is derived from the evidence below (_rescore_pairs), never constant
+            query = (
+                "UNWIND $rows AS row "
+                "MERGE (s:Entity {name: row.subj}) "
+                "ON CREATE SET s.name_norm = row.subj_norm, s.corpora = [$corpus], s.doc_ids = [$doc_id] "
+                "MERGE (o:Entity {name: row.obj}) "
+                "ON CREATE SET o.name_norm = row.obj_norm, o.corpora = [$corpus], o.doc_ids = [$doc_id] "
+                f"MERGE (s)-[r:{pred}]->(o) "
+                "ON CREATE SET r.created_at = timestamp(), r.last_seen = timestamp(), "
+                "r.corpora = [$corpus], r.doc_ids = [$doc_id], "
+                "r.chunks = CASE WHEN size(row.chunks) > 0 THEN row.chunks END, "
+                "r.support = CASE WHEN size(row.chunks) > 0 THEN size(row.chunks) END "
+                + GraphService._add_membership("s")
+                + GraphService._add_membership("o")
+                + GraphService._add_membership("r")
+                + "WITH r, row, coalesce(r.chunks, []) AS known "
+                "WITH r, known + [c IN row.chunks WHERE NOT c IN known] AS merged, size(known) AS before "
+                "FOREACH (_ IN CASE WHEN size(merged) > before THEN [1] ELSE [] END | "
+                "SET r.chunks = merged, r.support = size(merged), r.last_seen = timestamp()) "
+            )
+            for i in range(0, len(rows), batch_size):
+                result = await tx.run(
+                    query, rows=rows[i:i + batch_size],
+                    corpus=corpus, doc_id=doc_id, default_corpus=DEFAULT_CORPUS,
+                )
+                counters = (await result.consume()).counters
+                nodes_created += counters.nodes_created
+                edges_created += counters.relationships_created
+                changed = changed or counters.contains_updates
+
+        pairs = list(dict.fromkeys((row["subj"], row["obj"]) for rows in groups.values() for row in rows))
+        rescored = []
+        for i in range(0, len(pairs), batch_size):
+            rescored.extend(await GraphService._rescore_pairs(tx, pairs[i:i + batch_size]))
+        changed = changed or bool(rescored)
+
+        version = await GraphService._bump_data_version(tx) if changed else None
+        return nodes_created, edges_created, version, rescored
+
+    async def upsert_triplets(
+        self,
+        triplets: List[Dict[str, str]],
+        batch_size: Optional[int] = None,
+        corpus: str = DEFAULT_CORPUS,
+        doc_id: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Writes a batch of triplets to the knowledge graph.
+        Uses MERGE for idempotency (no duplicates ever created).
+        Triplets are grouped by sanitized predicate and written with one parameterized
+        UNWIND query per group (chunked by batch_size) inside a single write transaction.
+        Entities and relationships record the corpora and documents they were seen in
+        (`corpora` / `doc_ids`), which scoped queries filter on. A triplet's optional
+        "chunk" key is recorded as provenance on its relationship.
+        Returns counts of created and matched nodes and edges.
         """
-        with self.driver.session() as session:
-            result = session.run(
-                "MATCH (n)-[r]->(m) RETURN n.name AS src, type(r) AS rel, m.name AS tgt LIMIT 1000"
+        stats = {"nodes_created": 0, "nodes_matched": 0, "edges_created": 0, "edges_matched": 0}
+        batch_size = max(batch_size or self.WRITE_BATCH_SIZE, 1)
+
+        groups: Dict[str, List[Dict]] = defaultdict(list)
+        rows: Dict[Tuple[str, str, str], Dict] = {}
+        entities: set = set()
+        for triplet in triplets or []:
+            normalized = self._normalize_triplet(triplet)
+            if not normalized:
+                continue
+            row = rows.get(normalized)
+            if row is None:
+                subj, pred, obj = normalized
+                row = rows[normalized] = {
+                    "subj": subj, "obj": obj,
+                    "subj_norm": normalize_name(subj), "obj_norm": normalize_name(obj),
+                    "chunks": [],
+                }
+                groups[pred].append(row)
+                entities.update((subj, obj))
+            chunk = triplet.get("chunk")
+            if chunk and chunk not in row["chunks"]:
+                row["chunks"].append(chunk)
+        seen = set(rows)
+
+        if not groups:
+            return stats
+
+        async with self.client.session() as session:
+            nodes_created, edges_created, version, rescored = await session.execute_write(
+                self._write_predicate_groups, groups, batch_size, corpus, doc_id or "unknown"
             )
-            nodes: set = set()
-            links = []
 
-            for record in result:
-                source = record["src"]
-                target = record["tgt"]
-                rel_type = record["rel"]
+        EntityResolver.observe(entities)
+        if version is not None:
+            GraphSnapshot.apply_triplets(seen, version, {(s, p, o): c for s, p, o, c in rescored})
 
-                if source and target:
-                    nodes.add(source)
-                    nodes.add(target)
-                    links.append({"source": source, "target": target, "type": rel_type})
+        stats.update(
+            nodes_created=nodes_created,
+            nodes_matched=len(entities) - nodes_created,
+            edges_created=edges_created,
+            edges_matched=len(seen) - edges_created,
+        )
+        print(
+            f"✅ Graph Write: {len(seen)} triplets across {len(groups)} predicates "
+            f"(+{nodes_created} nodes, +{edges_created} edges)"
+        )
+        return stats
 
-            return {
-                "nodes": [{"id": name} for name in nodes],
-                "links": links
-            }
+    @staticmethod
+    async def _read_all(tx, query: str, **params) -> List[Dict]:
+        """Transaction function: runs a read query and returns all records as dicts."""
+        result = await tx.run(query, **params)
+        return await result.data()
 
-    def find_subgraph_for_entities(self, entities: List[str]) -> Optional[Dict]:
+    async def find_subgraph_for_entities(self, entities: List[str], scope: Scope = GLOBAL_SCOPE) -> Optional[Dict]:
         """
-        STEP 7: Fuzzy entity search — finds graph nodes that partially match entity names.
+        STEP 7: Fuzzy entity search — resolves each entity name to its best-scoring
+        graph nodes (EntityResolver: indexed exact + full-text fuzzy matching).
         Used as fallback when direct path between two entities is not found.
-        Returns a subgraph cluster around the matched entities.
+        Returns a subgraph cluster around the matched entities, within `scope`.
         """
         if not entities:
             return None
 
-        entity_titles = [e.strip().title() for e in entities]
-        # Also try lowercase for broader matching
-        entity_lower = [e.strip().lower() for e in entities]
+        resolver = EntityResolver()
+        resolved = await asyncio.gather(*(resolver.resolve(e, limit=3, scope=scope) for e in entities))
+        matched = [c["name"] for candidates in resolved for c in candidates]
+        if not matched:
+            return None
+        names = list(dict.fromkeys(matched))
 
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Entity)
-                WHERE any(e IN $entities WHERE
-                    toLower(n.name) CONTAINS e OR
-                    e CONTAINS toLower(n.name)
+        if GraphSnapshot.ready() and scope.is_global:
+            # In-process read replica: same rows as the Cypher below, no network hop
+            records = [
+                {"node_name": name, "connected_name": target}
+                for name in names
+                for target in (GraphSnapshot.out_neighbors(name) or [None])
+            ][:30]
+        else:
+            async with self.client.session(read=True) as session:
+                records = await session.execute_read(
+                    self._read_all,
+                    """
+                    MATCH (n:Entity) WHERE n.name IN $names
+                    OPTIONAL MATCH (n)-[r]->(m) WHERE """ + Scope.cypher_filter("r") + """
+                    RETURN DISTINCT n.name AS node_name, m.name AS connected_name
+                    LIMIT 30
+                    """,
+                    names=names, **scope.cypher_params()
                 )
-                OPTIONAL MATCH (n)-[r]->(m)
-                RETURN DISTINCT n.name AS node_name, m.name AS connected_name
-                LIMIT 30
+
+        nodes: set = set()
+        for record in records:
+            if record["node_name"]:
+                nodes.add(record["node_name"])
+            if record["connected_name"]:
+                nodes.add(record["connected_name"])
+
+        if not nodes:
+            return None
+
+        node_list = list(nodes)[:8]
+        return {
+            "nodes": node_list,
+            "confidence": 0.65,
+            "type": "Entity Cluster"
+        }
+
+    async def get_graph_stats(self) -> Dict:
+        """Returns graph complexity metrics for the UI stats panel."""
+        async with self.client.session(read=True) as session:
+            node_rows = await session.execute_read(self._read_all, "MATCH (n:Entity) RETURN count(n) AS cnt")
+            edge_rows = await session.execute_read(self._read_all, "MATCH ()-[r]->() RETURN count(r) AS cnt")
+        node_count = node_rows[0]["cnt"]
+        edge_count = edge_rows[0]["cnt"]
+        return {
+            "node_count": node_count,
+            "edge_count": edge_count,
+            "density": round(edge_count / max(node_count * (node_count - 1), 1), 4)
+        }
+
+    async def get_corpus_stats(self, corpus: str) -> Dict:
+        """Entity and relationship counts within one corpus."""
+        scope = Scope(corpus=corpus)
+        async with self.client.session(read=True) as session:
+            node_rows = await session.execute_read(
+                self._read_all,
+                "MATCH (n:Entity) WHERE " + Scope.cypher_filter("n") + " RETURN count(n) AS cnt",
+                **scope.cypher_params(),
+            )
+            edge_rows = await session.execute_read(
+                self._read_all,
+                "MATCH (:Entity)-[r]->(:Entity) WHERE " + Scope.cypher_filter("r") + " RETURN count(r) AS cnt",
+                **scope.cypher_params(),
+            )
+        return {"node_count": node_rows[0]["cnt"], "edge_count": edge_rows[0]["cnt"]}
+
+    @staticmethod
+    async def _detach_batch(tx, label: str, corpus: str, doc_ids: List[str], batch_size: int) -> Tuple[int, List[str]]:
+        """
+        Transaction function: removes a corpus (and its documents) from one batch of
+        relationships (label "rel") or entities (label "node"). Those left in no corpus
+        are deleted — entities only once nothing links to them.
+        Returns (batch size, names of deleted entities).
+        """
+        if label == "rel":
+            match = "MATCH (:Entity)-[x]->(:Entity)"
+            orphan = "size(x.corpora) = 0"
+        else:
+            match = "MATCH (x:Entity)"
+            orphan = "size(x.corpora) = 0 AND NOT (x)--()"
+        result = await tx.run(
+            match + " WHERE $corpus IN coalesce(x.corpora, [$default_corpus]) "
+            "WITH x LIMIT $limit "
+            "SET x.corpora = [c IN coalesce(x.corpora, [$default_corpus]) WHERE c <> $corpus], "
+            "x.doc_ids = [d IN coalesce(x.doc_ids, []) WHERE NOT d IN $doc_ids] "
+            f"WITH x, {orphan} AS orphan, x.name AS name "
+            "FOREACH (_ IN CASE WHEN orphan THEN [1] ELSE [] END | DELETE x) "
+            "RETURN count(*) AS processed, collect(CASE WHEN orphan THEN name END) AS deleted",
+            corpus=corpus, doc_ids=doc_ids, default_corpus=DEFAULT_CORPUS, limit=batch_size,
+        )
+        record = await result.single()
+        if record["processed"]:
+            await GraphService._bump_data_version(tx)
+        return record["processed"], record["deleted"]
+
+    async def delete_corpus(self, corpus: str, doc_ids: List[str], batch_size: int = 5000) -> Dict[str, int]:
+        """
+        Removes a corpus from the graph in batched write transactions: relationships
+        first, then entities. Knowledge shared with other corpora stays, minus this
+        corpus' membership. The snapshot picks the change up through the data version.
+        """
+        stats = {"relationships_processed": 0, "entities_processed": 0}
+        for label, key in (("rel", "relationships_processed"), ("node", "entities_processed")):
+            while True:
+                async with self.client.session() as session:
+                    processed, deleted = await session.execute_write(
+                        self._detach_batch, label, corpus, doc_ids, batch_size
+                    )
+                EntityResolver.forget(deleted)
+                stats[key] += processed
+                if processed < batch_size:
+                    break
+        print(
+            f"🗑️ Graph: corpus '{corpus}' detached from {stats['relationships_processed']} relationships "
+            f"and {stats['entities_processed']} entities"
+        )
+        return stats
+
+    @staticmethod
+    async def _share_batch(tx, chunk_keys: List[str], corpus: str, doc_id: str, batch_size: int) -> int:
+        """
+        Transaction function: adds `doc_id` to one batch of relationships supported by
+        `chunk_keys` that do not list it yet (and to their endpoints), then rescores
+        them — another document now backs them. Returns the batch size.
+        """
+        result = await tx.run(
+            "MATCH (s:Entity)-[r]->(o:Entity) "
+            "WHERE any(c IN coalesce(r.chunks, []) WHERE c IN $keys) "
+            "AND NOT $doc_id IN coalesce(r.doc_ids, []) "
+            "WITH s, r, o LIMIT $limit "
+            + GraphService._add_membership("s")
+            + GraphService._add_membership("o")
+            + GraphService._add_membership("r")
+            + "RETURN count(*) AS processed, collect(DISTINCT [s.name, o.name]) AS pairs",
+            keys=chunk_keys, corpus=corpus, doc_id=doc_id, default_corpus=DEFAULT_CORPUS, limit=batch_size,
+        )
+        record = await result.single()
+        if record["processed"]:
+            await GraphService._rescore_pairs(tx, [tuple(p) for p in record["pairs"]])
+            await GraphService._bump_data_version(tx)
+        return record["processed"]
+
+    async def share_chunks(
+        self, chunk_keys: List[str], corpus: str, doc_id: str, batch_size: int = 5000
+    ) -> Dict[str, int]:
+        """
+        Records that `doc_id` also contains already-extracted chunks (content shared with
+        another document is extracted once): the relationships those chunks support, and
+        their entities, join the document, so document-scoped reasoning sees them and
+        deleting the other document keeps them.
+        """
+        stats = {"relationships_shared": 0}
+        if not chunk_keys:
+            return stats
+        while True:
+            async with self.client.session() as session:
+                processed = await session.execute_write(
+                    self._share_batch, chunk_keys, corpus, doc_id, batch_size
+                )
+            stats["relationships_shared"] += processed
+            if processed < batch_size:
+                break
+        if stats["relationships_shared"]:
+            print(f"🔗 Graph: {stats['relationships_shared']} relationships now also back '{doc_id}'")
+        return stats
+
+    @staticmethod
+    async def _retract_batch(tx, chunk_keys: List[str], doc_id: Optional[str], batch_size: int) -> Tuple[int, int, List[str]]:
+        """
+        Transaction function: removes `chunk_keys` (and `doc_id`) from one batch of
+        relationships, recomputing their support and confidence; relationships left
+        without any supporting chunk are deleted. Relationships written before
+        provenance was tracked (no `chunks`) are never deleted here.
+        Returns (relationships processed, relationships deleted, endpoint names).
+        """
+        result = await tx.run(
+            """
+            MATCH (:Entity)-[r]->(:Entity)
+            WHERE any(c IN coalesce(r.chunks, []) WHERE c IN $keys)
+               OR ($doc_id IS NOT NULL AND $doc_id IN coalesce(r.doc_ids, []))
+            WITH r LIMIT $limit
+            WITH r, startNode(r).name AS subj, endNode(r).name AS obj
+            SET r.chunks = CASE WHEN r.chunks IS NULL THEN NULL ELSE [c IN r.chunks WHERE NOT c IN $keys] END,
+                r.doc_ids = [d IN coalesce(r.doc_ids, []) WHERE $doc_id IS NULL OR d <> $doc_id]
+            SET r.support = size(r.chunks)
+            WITH r, subj, obj, r.chunks IS NOT NULL AND size(r.chunks) = 0 AS orphan
+            FOREACH (_ IN CASE WHEN orphan THEN [1] ELSE [] END | DELETE r)
+            RETURN count(*) AS processed,
+                   count(CASE WHEN orphan THEN 1 END) AS deleted,
+                   collect(DISTINCT [subj, obj]) AS pairs
+            """,
+            keys=chunk_keys, doc_id=doc_id, limit=batch_size,
+        )
+        record = await result.single()
+        pairs = [tuple(p) for p in record["pairs"]]
+        if record["processed"]:
+            # Surviving relationships between the same pairs lost evidence or competition
+            await GraphService._rescore_pairs(tx, pairs)
+            await GraphService._bump_data_version(tx)
+        return record["processed"], record["deleted"], [name for pair in pairs for name in pair]
+
+    @staticmethod
+    async def _collect_entities(tx, names: List[str], doc_id: Optional[str]) -> List[str]:
+        """
+        Transaction function: deletes the given entities that no relationship links to
+        any more and drops `doc_id` from the survivors no remaining relationship of that
+        document touches. Returns the deleted names.
+        """
+        if doc_id is not None:
+            result = await tx.run(
+                """
+                UNWIND $names AS name
+                MATCH (e:Entity {name: name})
+                WHERE $doc_id IN coalesce(e.doc_ids, [])
+                  AND NOT EXISTS { (e)-[r]-() WHERE $doc_id IN coalesce(r.doc_ids, []) }
+                SET e.doc_ids = [d IN e.doc_ids WHERE d <> $doc_id]
                 """,
-                entities=entity_lower
+                names=names, doc_id=doc_id,
             )
+            await result.consume()
+        result = await tx.run(
+            """
+            UNWIND $names AS name
+            MATCH (e:Entity {name: name})
+            WHERE NOT (e)--()
+            DELETE e
+            RETURN collect(name) AS deleted
+            """,
+            names=names,
+        )
+        deleted = (await result.single())["deleted"]
+        if deleted:
+            await GraphService._bump_data_version(tx)
+        return deleted
 
-            nodes: set = set()
-            for record in result:
-                if record["node_name"]:
-                    nodes.add(record["node_name"])
-                if record["connected_name"]:
-                    nodes.add(record["connected_name"])
+    async def retract_chunks(
+        self, chunk_keys: List[str], doc_id: Optional[str] = None, batch_size: int = 5000
+    ) -> Dict[str, int]:
+        """
+        Garbage-collects the graph knowledge of removed chunks (a deleted or replaced
+        document): decrements relationship support, deletes unsupported relationships,
+        then deletes entities left without relationships — all in batched write
+        transactions, so a large document never holds one huge transaction.
+        """
+        stats = {"relationships_updated": 0, "relationships_deleted": 0, "entities_deleted": 0}
+        if not chunk_keys and not doc_id:
+            return stats
 
-            if not nodes:
-                return None
+        endpoints: set = set()
+        while True:
+            async with self.client.session() as session:
+                processed, deleted, names = await session.execute_write(
+                    self._retract_batch, chunk_keys, doc_id, batch_size
+                )
+            stats["relationships_updated"] += processed - deleted
+            stats["relationships_deleted"] += deleted
+            endpoints.update(n for n in names if n)
+            if processed < batch_size:
+                break
 
-            node_list = list(nodes)[:8]
-            return {
-                "nodes": node_list,
-                "confidence": 0.65,
-                "type": "Entity Cluster"
-            }
+        names = sorted(endpoints)
+        for i in range(0, len(names), batch_size):
+            async with self.client.session() as session:
+                deleted_names = await session.execute_write(
+                    self._collect_entities, names[i:i + batch_size], doc_id
+                )
+            EntityResolver.forget(deleted_names)
+            stats["entities_deleted"] += len(deleted_names)
 
-    def get_graph_stats(self) -> Dict:
-        """Returns graph complexity metrics for the UI stats panel."""
-        with self.driver.session() as session:
-            node_count = session.run("MATCH (n:Entity) RETURN count(n) AS cnt").single()["cnt"]
-            edge_count = session.run("MATCH ()-[r]->() RETURN count(r) AS cnt").single()["cnt"]
-            return {
-                "node_count": node_count,
-                "edge_count": edge_count,
-                "density": round(edge_count / max(node_count * (node_count - 1), 1), 4)
-            }
+        print(
+            f"🧹 Graph GC: -{stats['relationships_deleted']} edges, -{stats['entities_deleted']} entities, "
+            f"{stats['relationships_updated']} edges lost support"
+        )
+        return stats
@@ -0,0 +1,346 @@
+import os
+import time
+import asyncio
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.db.neo4j_client import Neo4jClient
+from app.services.path_search import Neighbor
+
+
+class CSRGraph:
+    """
+    Immutable compressed-sparse-row adjacency over interned entity ids.
+    Every directed edge is stored twice (once per endpoint) with an `outgoing` flag,
+    so undirected traversal and outgoing-only queries share one layout. Each row is
+    sorted strongest-confidence first, so fan-out caps are a slice.
+    Memory: ~13 bytes per stored edge (int32 target, int32 predicate, float32
+    confidence, bool direction) plus 8 bytes per node for the offsets.
+    """
+
+    def __init__(self, node_count: int, src: np.ndarray, dst: np.ndarray, pred: np.ndarray, conf: np.ndarray):
+        u = np.concatenate([src, dst])
+        v = np.concatenate([dst, src])
+        order = np.lexsort((-np.concatenate([conf, conf]), u))
+
+        self.node_count = node_count
+        self.edge_count = len(src)
+        self.targets = v[order].astype(np.int32)
+        self.predicates = np.concatenate([pred, pred])[order].astype(np.int32)
+        self.confidences = np.concatenate([conf, conf])[order].astype(np.float32)
+        self.outgoing = np.concatenate([
+            np.ones(len(src), dtype=bool), np.zeros(len(src), dtype=bool)
+        ])[order]
+        self.offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=node_count), out=self.offsets[1:])
+
+    def row(self, node_id: int) -> Tuple[int, int]:
+        if node_id >= self.node_count:
+            return 0, 0
+        return int(self.offsets[node_id]), int(self.offsets[node_id + 1])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.targets, self.predicates, self.confidences, self.outgoing, self.offsets))
+
+
+class GraphSnapshot:
+    """
+    Optional in-process read replica of the :Entity graph (GRAPH_SNAPSHOT_ENABLED).
+    Path search and cluster search read from it instead of querying Neo4j over Bolt.
+
+    Consistency / refresh policy:
+    - Every graph write bumps a data version stored on the (:AureliusMeta {key: 'graph'})
+      node in the same transaction. A snapshot records the version it was built at.
+    - Writes made by this process are applied immediately as a delta overlay
+      (read-your-writes); rescored confidences of existing edges are patched in place. If the version they report is not exactly the next one,
+      another process wrote in between and the snapshot is marked stale.
+    - A background loop checks the stored version every REFRESH_SECONDS and rebuilds
+      when it moved, when the snapshot is stale, or when the delta overlay has grown
+      past COMPACT_EDGES. Staleness from other writers is bounded by REFRESH_SECONDS.
+    - Rebuilds are swapped in atomically; readers keep using the old snapshot until then,
+      and deltas that land during a rebuild are replayed on top of it.
+    """
+
+    ENABLED = os.getenv("GRAPH_SNAPSHOT_ENABLED", "false").lower() in ("1", "true", "yes")
+    REFRESH_SECONDS = float(os.getenv("GRAPH_SNAPSHOT_REFRESH_SECONDS", "30"))
+    COMPACT_EDGES = int(os.getenv("GRAPH_SNAPSHOT_COMPACT_EDGES", "50000"))
+
+    _graph: Optional[CSRGraph] = None
+    _names: List[str] = []
+    _ids: Dict[str, int] = {}
+    _predicates: List[str] = []
+    _predicate_ids: Dict[str, int] = {}
+    # Delta overlay: node id -> [(target id, predicate id, confidence, outgoing)]
+    _extra: Dict[int, List[Tuple[int, int, float, bool]]] = {}
+    _extra_edges = 0
+    _version: Optional[int] = None
+    _stale = False
+    _building = False
+    _pending: List[Tuple[int, List[Tuple[str, str, str]], Dict[Tuple[str, str, str], float]]] = []
+    # Edges whose confidence was patched in place (rows may be slightly out of order until the next rebuild)
+    _patched_edges = 0
+    _built_at: Optional[float] = None
+    _build_ms: Optional[int] = None
+    _task: Optional[asyncio.Task] = None
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    async def start(cls):
+        if not cls.ENABLED or cls._task is not None:
+            return
+        try:
+            await cls.rebuild()
+        except Exception as e:
+            print(f"⚠️ Graph snapshot build failed ({e}). Serving reads from Neo4j until the next refresh.")
+        cls._task = asyncio.create_task(cls._refresh_loop(), name="graph-snapshot-refresh")
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+
+    @classmethod
+    def ready(cls) -> bool:
+        return cls._graph is not None
+
+    @classmethod
+    async def _refresh_loop(cls):
+        from app.services.graph_service import GraphService
+        while True:
+            await asyncio.sleep(cls.REFRESH_SECONDS)
+            try:
+                if (
+                    cls._stale
+                    or cls._extra_edges + cls._patched_edges > cls.COMPACT_EDGES
+                    or await GraphService().get_data_version() != cls._version
+                ):
+                    await cls.rebuild()
+            except Exception as e:
+                print(f"⚠️ Graph snapshot refresh failed: {e}")
+
+    # -------------------------------------------------------------------------
+    # Build
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    async def _read_graph(tx) -> Dict:
+        """Transaction function: data version plus every edge, interned on the fly."""
+        from app.services.graph_service import GraphService
+        version = await GraphService._read_data_version(tx)
+        names: List[str] = []
+        ids: Dict[str, int] = {}
+        predicates: List[str] = []
+        predicate_ids: Dict[str, int] = {}
+        src, dst, pred, conf = array("i"), array("i"), array("i"), array("f")
+
+        def intern(table: Dict[str, int], values: List[str], value: str) -> int:
+            if value not in table:
+                table[value] = len(values)
+                values.append(value)
+            return table[value]
+
+        result = await tx.run(
+            "MATCH (s:Entity)-[r]->(o:Entity) "
+            "RETURN s.name AS s, type(r) AS p, o.name AS o, coalesce(r.confidence, 1.0) AS c"
+        )
+        async for record in result:
+            if record["s"] is None or record["o"] is None:
+                continue
+            src.append(intern(ids, names, record["s"]))
+            dst.append(intern(ids, names, record["o"]))
+            pred.append(intern(predicate_ids, predicates, record["p"]))
+            conf.append(record["c"])
+        return {
+            "version": version, "names": names, "ids": ids,
+            "predicates": predicates, "predicate_ids": predicate_ids,
+            "src": src, "dst": dst, "pred": pred, "conf": conf,
+        }
+
+    @classmethod
+    async def rebuild(cls):
+        """Loads the whole graph from Neo4j and swaps in a fresh CSR snapshot."""
+        started = time.time()
+        cls._building = True
+        cls._pending = []
+        try:
+            async with Neo4jClient().session(read=True) as session:
+                data = await session.execute_read(cls._read_graph)
+            graph = await asyncio.to_thread(
+                CSRGraph,
+                len(data["names"]),
+                np.asarray(data["src"], dtype=np.int32),
+                np.asarray(data["dst"], dtype=np.int32),
+                np.asarray(data["pred"], dtype=np.int32),
+                np.asarray(data["conf"], dtype=np.float32),
+            )
+        finally:
+            cls._building = False
+
+        cls._graph = graph
+        cls._names, cls._ids = data["names"], data["ids"]
+        cls._predicates, cls._predicate_ids = data["predicates"], data["predicate_ids"]
+        cls._extra, cls._extra_edges, cls._patched_edges = {}, 0, 0
+        cls._version = data["version"]
+        cls._stale = False
+        cls._built_at = time.time()
+        cls._build_ms = round((cls._built_at - started) * 1000)
+
+        # Replay writes that committed after the snapshot was read
+        pending, cls._pending = cls._pending, []
+        for version, triplets, confidences in sorted(pending, key=lambda p: p[0]):
+            if version > cls._version:
+                cls.apply_triplets(triplets, version, confidences)
+
+        print(
+            f"🗺️ Graph snapshot v{cls._version}: {graph.node_count} nodes, {graph.edge_count} edges "
+            f"({graph.nbytes / 1e6:.1f} MB arrays, {cls._build_ms} ms)"
+        )
+
+    # -------------------------------------------------------------------------
+    # Incremental updates
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def _intern(cls, name: str) -> int:
+        if name not in cls._ids:
+            cls._ids[name] = len(cls._names)
+            cls._names.append(name)
+        return cls._ids[name]
+
+    @classmethod
+    def _has_edge(cls, src: int, dst: int, pred: int) -> bool:
+        start, end = cls._graph.row(src)
+        if end > start:
+            hits = (cls._graph.targets[start:end] == dst) & (cls._graph.predicates[start:end] == pred)
+            if (hits & cls._graph.outgoing[start:end]).any():
+                return True
+        return any(t == dst and p == pred and out for t, p, _, out in cls._extra.get(src, ()))
+
+    @classmethod
+    def _set_confidence(cls, src: int, dst: int, pred: int, confidence: float):
+        """Patches both stored copies of an existing edge (CSR rows and delta overlay)."""
+        graph = cls._graph
+        for node, other, outgoing in ((src, dst, True), (dst, src, False)):
+            start, end = graph.row(node)
+            if end > start:
+                hits = (
+                    (graph.targets[start:end] == other)
+                    & (graph.predicates[start:end] == pred)
+                    & (graph.outgoing[start:end] == outgoing)
+                )
+                graph.confidences[start:end][hits] = confidence
+            extra = cls._extra.get(node)
+            if extra:
+                cls._extra[node] = [
+                    (t, p, confidence if (t, p, out) == (other, pred, outgoing) else c, out)
+                    for t, p, c, out in extra
+                ]
+        cls._patched_edges += 1
+
+    @classmethod
+    def apply_triplets(
+        cls,
+        triplets: Iterable[Tuple[str, str, str]],
+        version: Optional[int],
+        confidences: Optional[Dict[Tuple[str, str, str], float]] = None,
+    ):
+        """
+        Delta hook — called by GraphService.upsert_triplets with the normalized
+        (subject, PREDICATE, object) triplets it just committed, the data version
+        that write produced and the edge confidences it rescored (which may include
+        existing edges between the same pairs).
+        """
+        if not cls.ENABLED:
+            return
+        triplets = list(triplets)
+        confidences = confidences or {}
+        if cls._building and version is not None:
+            cls._pending.append((version, triplets, confidences))
+        if cls._graph is None:
+            return
+
+        def predicate_id(pred: str) -> int:
+            if pred not in cls._predicate_ids:
+                cls._predicate_ids[pred] = len(cls._predicates)
+                cls._predicates.append(pred)
+            return cls._predicate_ids[pred]
+
+        added = set()
+        for subj, pred, obj in triplets:
+            s, o, p = cls._intern(subj), cls._intern(obj), predicate_id(pred)
+            if cls._has_edge(s, o, p):
+                continue
+            added.add((subj, pred, obj))
+            confidence = confidences.get((subj, pred, obj), 1.0)
+            cls._extra.setdefault(s, []).append((o, p, confidence, True))
+            cls._extra.setdefault(o, []).append((s, p, confidence, False))
+            cls._extra_edges += 1
+
+        for (subj, pred, obj), confidence in confidences.items():
+            if (subj, pred, obj) not in added and subj in cls._ids and obj in cls._ids:
+                cls._set_confidence(cls._ids[subj], cls._ids[obj], predicate_id(pred), confidence)
+
+        if version is not None:
+            if cls._version is not None and version == cls._version + 1:
+                cls._version = version
+            elif cls._version is None or version > cls._version:
+                cls._stale = True
+
+    # -------------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def _edges(cls, name: str, limit: Optional[int] = None) -> List[Tuple[int, int, float, bool]]:
+        node_id = cls._ids.get(name)
+        if node_id is None or cls._graph is None:
+            return []
+        graph = cls._graph
+        start, end = graph.row(node_id)
+        if limit is not None:
+            end = min(end, start + limit)
+        edges = list(zip(
+            graph.targets[start:end].tolist(),
+            graph.predicates[start:end].tolist(),
+            graph.confidences[start:end].tolist(),
+            graph.outgoing[start:end].tolist(),
+        ))
+        extra = cls._extra.get(node_id)
+        if extra:
+            edges = sorted(edges + extra, key=lambda e: e[2], reverse=True)[:limit]
+        return edges
+
+    @classmethod
+    def neighbors(cls, name: str, limit: Optional[int] = None) -> List[Neighbor]:
+        """Undirected neighbors as (name, relationship type, confidence), strongest first."""
+        return [
+            (cls._names[t], cls._predicates[p], c)
+            for t, p, c, _ in cls._edges(name, limit)
+        ]
+
+    @classmethod
+    def out_neighbors(cls, name: str) -> List[str]:
+        """Targets of outgoing edges (the `(n)-[r]->(m)` direction)."""
+        return [cls._names[t] for t, _, _, out in cls._edges(name) if out]
+
+    @classmethod
+    def stats(cls) -> Dict:
+        graph = cls._graph
+        return {
+            "ready": graph is not None,
+            "version": cls._version,
+            "stale": cls._stale,
+            "nodes": len(cls._names),
+            "edges": (graph.edge_count if graph else 0) + cls._extra_edges,
+            "delta_edges": cls._extra_edges,
+            "patched_edges": cls._patched_edges,
+            "array_mb": round(graph.nbytes / 1e6, 2) if graph else 0,
+            "built_at": cls._built_at,
+            "build_ms": cls._build_ms,
+        }
@@ -0,0 +1,266 @@
+import os
+import json
+import base64
+import asyncio
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from app.db.neo4j_client import Neo4jClient
+from app.services.entity_resolver import EntityResolver
+from app.services.graph_snapshot import CSRGraph, GraphSnapshot
+
+
+class GraphCursorExpired(Exception):
+    """Raised when a pagination cursor was issued for an older graph version."""
+
+
+class GraphView:
+    """
+    Level-of-detail views of the knowledge graph for the 3D visualizer.
+
+    The graph is loaded once per data version (or borrowed from GraphSnapshot when it
+    is current) into CSR arrays, and node rankings are computed once per version:
+    - "degree": undirected degree
+    - "pagerank": PageRank over the directed edges (power iteration)
+    A view is an ordering of nodes — by rank, or breadth-first around a focus node
+    with each layer ranked — served in cursor-paginated pages. Each page carries its
+    nodes plus every link from them to nodes on the same or an earlier page, so a
+    client that appends pages always holds a consistent subgraph.
+    """
+
+    DEFAULT_NODES = int(os.getenv("GRAPH_VIEW_DEFAULT_NODES", "1000"))
+    MAX_NODES = int(os.getenv("GRAPH_VIEW_MAX_NODES", "20000"))
+    RANKS = ("degree", "pagerank")
+    PAGERANK_DAMPING = 0.85
+    PAGERANK_ITERATIONS = 30
+
+    _state: Optional[Dict[str, Any]] = None
+    _lock: Optional[asyncio.Lock] = None
+
+    # -------------------------------------------------------------------------
+    # Per-version state
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    async def _load(cls, version: int) -> Dict[str, Any]:
+        if cls._state is not None and cls._state["version"] == version:
+            return cls._state
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        async with cls._lock:
+            if cls._state is not None and cls._state["version"] == version:
+                return cls._state
+
+            if GraphSnapshot.ready() and GraphSnapshot._version == version and not GraphSnapshot._extra_edges:
+                graph = GraphSnapshot._graph
+                names, predicates = list(GraphSnapshot._names), list(GraphSnapshot._predicates)
+            else:
+                async with Neo4jClient().session(read=True) as session:
+                    data = await session.execute_read(GraphSnapshot._read_graph)
+                version = data["version"]
+                names, predicates = data["names"], data["predicates"]
+                graph = await asyncio.to_thread(
+                    CSRGraph,
+                    len(names),
+                    np.asarray(data["src"], dtype=np.int32),
+                    np.asarray(data["dst"], dtype=np.int32),
+                    np.asarray(data["pred"], dtype=np.int32),
+                    np.asarray(data["conf"], dtype=np.float32),
+                )
+
+            cls._state = {
+                "version": version,
+                "graph": graph,
+                "names": names,
+                "ids": {name: i for i, name in enumerate(names)},
+                "predicates": predicates,
+                "scores": {},
+                "orders": {},
+            }
+            return cls._state
+
+    @classmethod
+    def _pagerank(cls, graph: CSRGraph) -> np.ndarray:
+        n = graph.node_count
+        if n == 0:
+            return np.zeros(0)
+        owners = np.repeat(np.arange(n), np.diff(graph.offsets))
+        src = owners[graph.outgoing]
+        dst = graph.targets[graph.outgoing]
+        out_degree = np.bincount(src, minlength=n).astype(np.float64)
+        dangling = out_degree == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(cls.PAGERANK_ITERATIONS):
+            spread = np.bincount(dst, weights=rank[src] / out_degree[src], minlength=n)
+            rank = (1 - cls.PAGERANK_DAMPING) / n + cls.PAGERANK_DAMPING * (spread + rank[dangling].sum() / n)
+        return rank
+
+    @classmethod
+    def _scores(cls, state: Dict[str, Any], rank: str) -> np.ndarray:
+        if rank not in state["scores"]:
+            graph = state["graph"]
+            state["scores"][rank] = (
+                cls._pagerank(graph) if rank == "pagerank" else np.diff(graph.offsets).astype(np.float64)
+            )
+        return state["scores"][rank]
+
+    @classmethod
+    def _ranked_order(cls, state: Dict[str, Any], rank: str) -> np.ndarray:
+        if rank not in state["orders"]:
+            state["orders"][rank] = np.argsort(-cls._scores(state, rank), kind="stable")
+        return state["orders"][rank]
+
+    @classmethod
+    def _focus_order(cls, state: Dict[str, Any], focus_id: int, depth: int, rank: str) -> np.ndarray:
+        """Breadth-first ordering around the focus node; each layer is ranked."""
+        graph = state["graph"]
+        scores = cls._scores(state, rank)
+        order = [focus_id]
+        seen = {focus_id}
+        frontier = [focus_id]
+        for _ in range(depth):
+            layer = []
+            for node in frontier:
+                start, end = graph.row(node)
+                for target in graph.targets[start:end].tolist():
+                    if target not in seen:
+                        seen.add(target)
+                        layer.append(target)
+            layer.sort(key=lambda t: -scores[t])
+            order.extend(layer[:cls.MAX_NODES - len(order)])
+            frontier = layer
+            if len(order) >= cls.MAX_NODES or not frontier:
+                break
+        return np.asarray(order, dtype=np.int64)
+
+    # -------------------------------------------------------------------------
+    # Cursors
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def encode_cursor(version: int, offset: int, rank: str, focus: Optional[str], depth: int) -> str:
+        payload = json.dumps({"v": version, "o": offset, "r": rank, "f": focus, "d": depth}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, Any]:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return {"v": int(payload["v"]), "o": int(payload["o"]), "r": payload["r"],
+                    "f": payload.get("f"), "d": int(payload["d"])}
+        except Exception:
+            raise ValueError("Malformed graph cursor.")
+
+    # -------------------------------------------------------------------------
+    # Pages
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _page_links(graph: CSRGraph, order: np.ndarray, offset: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Links from page nodes order[offset:end] to nodes at positions < end, each once."""
+        position = np.full(graph.node_count, -1, dtype=np.int64)
+        position[order[:end]] = np.arange(end)
+
+        page = order[offset:end]
+        starts = graph.offsets[page]
+        lengths = graph.offsets[page + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        # Flattened CSR row indices for every page node, plus each row's owner
+        idx = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        owners = np.repeat(page, lengths)
+        others = graph.targets[idx]
+        other_pos = position[others]
+        outgoing = graph.outgoing[idx]
+
+        # Edges inside the page appear in both endpoints' rows; keep the outgoing copy
+        keep = (other_pos >= 0) & ((other_pos < offset) | outgoing)
+        src = np.where(outgoing, owners, others)[keep]
+        dst = np.where(outgoing, others, owners)[keep]
+        return src, dst, graph.predicates[idx][keep]
+
+    @classmethod
+    async def page(
+        cls,
+        version: int,
+        limit: Optional[int] = None,
+        rank: str = "degree",
+        focus: Optional[str] = None,
+        depth: int = 2,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        One page of a graph view. Returns a dict with "version", "total_nodes",
+        "next_cursor" and the lazily materialized "nodes" / "links" iterators.
+        Raises ValueError (bad arguments), LookupError (unknown focus) or
+        GraphCursorExpired (cursor from an older graph version).
+        """
+        offset = 0
+        if cursor:
+            params = cls.decode_cursor(cursor)
+            if params["v"] != version:
+                raise GraphCursorExpired("The graph changed since this cursor was issued. Restart pagination.")
+            offset, rank, focus, depth = params["o"], params["r"], params["f"], params["d"]
+        if rank not in cls.RANKS:
+            raise ValueError(f"Unknown rank '{rank}'. Use one of: {', '.join(cls.RANKS)}.")
+        limit = min(max(limit or cls.DEFAULT_NODES, 1), cls.MAX_NODES)
+
+        state = await cls._load(version)
+        if focus:
+            focus_id = state["ids"].get(focus)
+            if focus_id is None:
+                resolved = await EntityResolver().resolve_best(focus)
+                focus_id = state["ids"].get(resolved) if resolved else None
+            if focus_id is None:
+                raise LookupError(f"Unknown focus entity: {focus}")
+            order = await asyncio.to_thread(cls._focus_order, state, focus_id, depth, rank)
+        else:
+            order = await asyncio.to_thread(cls._ranked_order, state, rank)
+            order = order[:cls.MAX_NODES]
+
+        end = min(offset + limit, len(order))
+        offset = min(offset, end)
+        src, dst, pred = await asyncio.to_thread(cls._page_links, state["graph"], order, offset, end)
+        scores = cls._scores(state, rank)
+        names, predicates = state["names"], state["predicates"]
+        page_ids = order[offset:end]
+
+        return {
+            "version": state["version"],
+            "rank": rank,
+            "focus": focus,
+            "total_nodes": len(order),
+            "next_cursor": cls.encode_cursor(state["version"], end, rank, focus, depth) if end < len(order) else None,
+            "nodes": (
+                {"id": names[i], "score": round(float(s), 6)}
+                for i, s in zip(page_ids.tolist(), scores[page_ids].tolist())
+            ),
+            "links": (
+                {"source": names[s], "target": names[t], "type": predicates[p]}
+                for s, t, p in zip(src.tolist(), dst.tolist(), pred.tolist())
+            ),
+        }
+
+    @staticmethod
+    def iter_ndjson(view: Dict[str, Any], batch_size: int = 500) -> Iterator[str]:
+        """NDJSON: one "meta" line, then one line per node, then one line per link."""
+        meta = {k: view[k] for k in ("version", "rank", "focus", "total_nodes", "next_cursor")}
+        yield json.dumps({"kind": "meta", **meta}) + "\n"
+        batch: List[str] = []
+        for kind, items in (("node", view["nodes"]), ("link", view["links"])):
+            for item in items:
+                batch.append(json.dumps({"kind": kind, **item}))
+                if len(batch) >= batch_size:
+                    yield "\n".join(batch) + "\n"
+                    batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    @classmethod
+    async def top_nodes(cls, version: int, n: int, rank: str = "degree") -> List[str]:
+        """Names of the n highest-ranked nodes."""
+        state = await cls._load(version)
+        order = await asyncio.to_thread(cls._ranked_order, state, rank)
+        return [state["names"][i] for i in order[:n].tolist()]
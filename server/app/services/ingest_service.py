@@ -0,0 +1,472 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services.pdf_engine import PDFEngine
+from app.services.chunker import TextChunker
+from app.db.document_registry import DocumentRegistry
+from app.services.corpus import DEFAULT_CORPUS, chunk_key, document_id
+
+
+# Max chunks per document sent to the LLM (0 = no cap, extract from every chunk)
+INGEST_MAX_CHUNKS = int(os.getenv("INGEST_MAX_CHUNKS", "10"))
+# Max chunks with a triplet extraction in flight at once
+INGEST_EXTRACTION_CONCURRENCY = int(os.getenv("INGEST_EXTRACTION_CONCURRENCY", "4"))
+
+# Pipeline stages, in execution order ("parse" streams pages straight into the chunker)
+STAGES = ("parse", "embed", "extract", "graph")
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingestion queue is at capacity (backpressure signal for the API)."""
+
+
+@dataclass
+class IngestJob:
+    """
+    One PDF ingestion run. Mutated in place by the worker as it moves through
+    STAGES; API handlers read `to_dict()` snapshots and wait on `wait_for_update()`.
+    """
+    filename: str
+    pdf_path: str  # Spooled upload; owned and removed by the job
+    file_hash: str  # sha256 of the upload bytes
+    corpus: str = DEFAULT_CORPUS
+    doc_id: str = ""  # Derived from corpus + filename
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued → running → succeeded | failed
+    stage: Optional[str] = None
+    stages: Dict[str, Dict[str, Any]] = field(
+        default_factory=lambda: {name: {"status": "pending"} for name in STAGES}
+    )
+    pages_parsed: int = 0
+    chunks_total: int = 0
+    chunks_to_extract: int = 0
+    chunks_extracted: int = 0
+    triplets_extracted: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    version: int = 0
+    _updated: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def __post_init__(self):
+        self.doc_id = self.doc_id or document_id(self.corpus, self.filename)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def touch(self):
+        """Bumps the version and wakes every waiter (SSE streams, pollers)."""
+        self.version += 1
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def wait_for_update(self, since_version: int, timeout: float) -> bool:
+        """Waits until the job changes past `since_version`. Returns False on timeout."""
+        if self.version > since_version:
+            return True
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def start_stage(self, name: str):
+        self.stage = name
+        self.stages[name] = {"status": "running", "started_at": time.time()}
+        self.touch()
+
+    def finish_stage(self, name: str, **details: Any):
+        info = self.stages[name]
+        info.update(details)
+        info["status"] = "done"
+        info["duration_ms"] = round((time.time() - info["started_at"]) * 1000)
+        self.touch()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "corpus": self.corpus,
+            "doc_id": self.doc_id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": self.stages,
+            "pages_parsed": self.pages_parsed,
+            "chunks_total": self.chunks_total,
+            "chunks_to_extract": self.chunks_to_extract,
+            "chunks_extracted": self.chunks_extracted,
+            "triplets_extracted": self.triplets_extracted,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestService:
+    """
+    The ingestion pipeline: PDF → Extract Text → Chunk → Vector Store (ChromaDB) → Graph (Neo4j).
+    Blocking stages run in worker threads so a large upload never stalls the event loop.
+    """
+
+    @staticmethod
+    async def run(job: IngestJob) -> Dict[str, Any]:
+        from app.services.vector_service import VectorService
+        from app.services.llm_engine import LLMEngine
+        from app.services.graph_service import GraphService
+
+        registry = DocumentRegistry()
+        corpus, doc_id = job.corpus, job.doc_id
+        # What an earlier version of this document contained (empty for a new document)
+        previous = set(await asyncio.to_thread(registry.get_document_chunks, doc_id))
+
+        # 0. Identical file bytes already ingested into this corpus → nothing to embed or extract
+        existing = await asyncio.to_thread(registry.find_document_by_hash, job.file_hash, corpus)
+        if existing:
+            chunk_keys = await asyncio.to_thread(registry.get_document_chunks, existing["doc_id"])
+            if existing["doc_id"] != doc_id:
+                # The content is stored once; its graph knowledge joins this document too
+                shared = [k for k in dict.fromkeys(chunk_keys) if k not in previous]
+                await GraphService().share_chunks(shared, corpus, doc_id)
+                stale = await asyncio.to_thread(
+                    registry.register_document, doc_id, job.filename, job.file_hash, chunk_keys, corpus
+                )
+                await IngestService.collect_garbage(stale)
+                await IngestService.reassign_chunks(previous - set(chunk_keys) - set(stale), doc_id)
+            for name in STAGES:
+                job.stages[name] = {"status": "skipped"}
+            job.chunks_total = len(chunk_keys)
+            job.touch()
+            return {
+                "status": "duplicate",
+                "filename": job.filename,
+                "corpus": corpus,
+                "doc_id": doc_id,
+                "duplicate_of": existing["doc_id"],
+                "chunks_processed": len(chunk_keys),
+                "chunks_new": 0,
+                "triplets_extracted": 0,
+                "message": f"Identical content already ingested as '{existing['doc_id']}'. Nothing to do."
+            }
+
+        # 1-2. Extract and clean text page by page, streaming it into the sentence-aware
+        #      chunker (token budget of the embedding model) — the full text is never materialized
+        job.start_stage("parse")
+
+        async def _counted_pages():
+            async for page in PDFEngine.stream_pages(job.pdf_path):
+                job.pages_parsed += 1
+                job.touch()
+                yield page
+
+        chunks = [chunk async for chunk in TextChunker().chunk_pages(_counted_pages())]
+        job.chunks_total = len(chunks)
+        job.finish_stage("parse", pages=job.pages_parsed, chunks=len(chunks))
+
+        if not chunks:
+            raise ValueError("No readable text found in PDF.")
+
+        # Content addressing: one record per distinct chunk hash, keyed per corpus
+        unique_chunks: List[Dict[str, Any]] = []
+        seen_hashes: set = set()
+        for chunk in chunks:
+            if chunk["hash"] not in seen_hashes:
+                seen_hashes.add(chunk["hash"])
+                unique_chunks.append(chunk)
+        key = lambda c: chunk_key(corpus, c["hash"])
+        chunk_keys = [key(c) for c in chunks]
+
+        # 3. Store chunks as semantic embeddings in ChromaDB (vector brain) — new content only
+        job.start_stage("embed")
+        embedded = await asyncio.to_thread(registry.known_chunks, chunk_keys, "embedded")
+        to_embed = [c for c in unique_chunks if key(c) not in embedded]
+        if to_embed:
+            vs = await asyncio.to_thread(VectorService)
+            await asyncio.to_thread(vs.upsert_chunks, to_embed, job.filename, corpus, doc_id)
+            await asyncio.to_thread(registry.mark_chunks, [key(c) for c in to_embed], "embedded")
+        job.finish_stage("embed", chunks=len(to_embed), reused=len(unique_chunks) - len(to_embed))
+
+        # 4. Extract Knowledge Graph triplets via LLM (new chunks, concurrently, bounded)
+        job.start_stage("extract")
+        extracted = await asyncio.to_thread(registry.known_chunks, chunk_keys, "extracted")
+        new_chunks = [c for c in unique_chunks if key(c) not in extracted]
+        extraction_chunks = new_chunks[:INGEST_MAX_CHUNKS] if INGEST_MAX_CHUNKS > 0 else new_chunks
+        job.chunks_to_extract = len(extraction_chunks)
+
+        def _on_chunk_done(triplets: List[Dict[str, str]]):
+            job.chunks_extracted += 1
+            job.triplets_extracted += len(triplets)
+            job.touch()
+
+        per_chunk = await LLMEngine.extract_triplets_many(
+            [c["text"] for c in extraction_chunks],
+            concurrency=INGEST_EXTRACTION_CONCURRENCY,
+            on_chunk_done=_on_chunk_done,
+        )
+        # Failed chunks (None) are not recorded as extracted: the next upload retries them
+        succeeded = [(chunk, triplets) for chunk, triplets in zip(extraction_chunks, per_chunk) if triplets is not None]
+        failed = len(extraction_chunks) - len(succeeded)
+        # Each triplet remembers its chunk (graph provenance, used to retract it later)
+        all_triplets = [
+            {**t, "chunk": key(chunk)}
+            for chunk, triplets in succeeded
+            for t in triplets
+        ]
+        job.finish_stage(
+            "extract",
+            chunks=len(extraction_chunks),
+            failed=failed,
+            reused=len(unique_chunks) - len(new_chunks),
+            triplets=len(all_triplets),
+        )
+
+        # 5. Populate Neo4j in one combined write (symbolic brain). Chunks extracted
+        #    for another document contribute their existing knowledge to this one
+        job.start_stage("graph")
+        gs = GraphService()
+        graph_stats = await gs.upsert_triplets(all_triplets, corpus=corpus, doc_id=doc_id)
+        shared = [k for k in dict.fromkeys(chunk_keys) if k in extracted and k not in previous]
+        graph_stats.update(await gs.share_chunks(shared, corpus, doc_id))
+        job.finish_stage("graph", **graph_stats)
+
+        # 6. Record what this document is made of (only after the graph write succeeded).
+        #    Re-uploading a document replaces it: chunks only the old version had are collected.
+        #    While chunks are left unextracted (failures, INGEST_MAX_CHUNKS) the file hash is
+        #    not recorded, so uploading the same bytes again resumes instead of short-circuiting
+        await asyncio.to_thread(registry.mark_chunks, [key(c) for c, _ in succeeded], "extracted")
+        complete = len(succeeded) == len(new_chunks)
+        stale = await asyncio.to_thread(
+            registry.register_document, doc_id, job.filename, job.file_hash if complete else "", chunk_keys, corpus
+        )
+        await IngestService.collect_garbage(stale)
+        await IngestService.reassign_chunks(previous - set(chunk_keys) - set(stale), doc_id)
+        if failed:
+            print(f"⚠️ Ingest {job.filename}: triplet extraction failed for {failed} chunks. Re-upload to retry them.")
+
+        return {
+            "status": "success" if not failed else "partial",
+            "filename": job.filename,
+            "corpus": corpus,
+            "doc_id": doc_id,
+            "chunks_processed": len(chunks),
+            "chunks_new": len(new_chunks),
+            "triplets_extracted": len(all_triplets),
+            "chunks_failed": failed,
+            "graph_writes": graph_stats,
+            "chunks_replaced": len(stale),
+            "mode": "Neuro-Symbolic Injection Complete 🧠",
+            "message": f"Knowledge graph enriched with {len(all_triplets)} verified facts."
+        }
+
+
+    @staticmethod
+    async def collect_garbage(chunk_keys: List[str], doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Removes chunks no document references any more from the vector store, the
+        keyword index and the graph (their relationship support; then orphans).
+        The registry's pending-cleanup entries are cleared only once every store
+        succeeded; on failure they stay for collect_pending().
+        """
+        from app.services.vector_service import VectorService
+        from app.services.graph_service import GraphService
+
+        if not chunk_keys and not doc_id:
+            return {"chunks_deleted": 0}
+        vs = await asyncio.to_thread(VectorService)
+        await asyncio.to_thread(vs.delete_chunks, chunk_keys)
+        graph_stats = await GraphService().retract_chunks(chunk_keys, doc_id)
+        registry = DocumentRegistry()
+        await asyncio.to_thread(registry.clear_pending_gc, "chunk", chunk_keys)
+        if doc_id:
+            await asyncio.to_thread(registry.clear_pending_gc, "document", [doc_id])
+        return {"chunks_deleted": len(chunk_keys), "graph": graph_stats}
+
+    @staticmethod
+    async def detach_corpus(corpus: str, doc_ids: List[str]) -> Dict[str, int]:
+        """Removes a deleted corpus' graph memberships, then clears its pending-cleanup entry."""
+        from app.services.graph_service import GraphService
+
+        stats = await GraphService().delete_corpus(corpus, doc_ids)
+        await asyncio.to_thread(DocumentRegistry().clear_pending_gc, "corpus", [corpus])
+        return stats
+
+    @staticmethod
+    async def collect_pending() -> Optional[Dict[str, int]]:
+        """
+        Retries store cleanup that failed after its registry delete was committed
+        (Chroma or Neo4j down): orphaned chunks, deleted documents, deleted corpora.
+        Called at startup and before every delete. Returns None while a store still fails.
+        """
+        try:
+            pending = await asyncio.to_thread(DocumentRegistry().pending_gc)
+            if not any(pending.values()):
+                return {"chunks": 0, "documents": 0, "corpora": 0}
+            print(
+                f"🧹 Retrying pending cleanup: {len(pending['chunks'])} chunks, "
+                f"{len(pending['documents'])} documents, {len(pending['corpora'])} corpora"
+            )
+            await IngestService.collect_garbage(pending["chunks"])
+            for doc_id in pending["documents"]:
+                await IngestService.collect_garbage([], doc_id)
+            for corpus, doc_ids in pending["corpora"]:
+                await IngestService.detach_corpus(corpus, doc_ids)
+            return {key: len(value) for key, value in pending.items()}
+        except Exception as e:
+            print(f"⚠️ Pending cleanup still failing: {e}")
+            return None
+
+    @staticmethod
+    async def reassign_chunks(chunk_keys: Iterable[str], doc_id: str):
+        """
+        Chunks `doc_id` no longer contains but other documents still do: their stored
+        attribution moves to one of those documents (citation metadata only).
+        """
+        from app.services.vector_service import VectorService
+
+        owners = await asyncio.to_thread(DocumentRegistry().chunk_owners, chunk_keys)
+        if not owners:
+            return
+        try:
+            vs = await asyncio.to_thread(VectorService)
+            await asyncio.to_thread(vs.relabel_chunks, owners, doc_id)
+        except Exception as e:
+            print(f"⚠️ Could not re-attribute {len(owners)} chunks shared with '{doc_id}': {e}")
+
+    @staticmethod
+    async def delete_document(doc_id: str) -> Optional[Dict[str, Any]]:
+        """Deletes an ingested document and its exclusive data. None if the document is unknown."""
+        registry = DocumentRegistry()
+        document = await asyncio.to_thread(registry.get_document, doc_id)
+        if document is None:
+            return None
+        await IngestService.collect_pending()
+        chunk_keys = await asyncio.to_thread(registry.get_document_chunks, doc_id)
+        # The registry delete also records the store cleanup it owes (gc_pending)
+        orphaned = await asyncio.to_thread(registry.delete_document, doc_id)
+        try:
+            stats = await IngestService.collect_garbage(orphaned, doc_id)
+        except Exception as e:
+            print(f"⚠️ Cleanup of '{doc_id}' failed ({e}). Retried later from the pending-cleanup ledger.")
+            stats = {"chunks_deleted": 0, "cleanup": "pending", "chunks_pending": len(orphaned)}
+        await IngestService.reassign_chunks(set(chunk_keys) - set(orphaned), doc_id)
+        return {
+            "status": "deleted",
+            "doc_id": doc_id,
+            "corpus": document["corpus"],
+            **stats,
+        }
+
+
+class IngestQueue:
+    """
+    Bounded in-process job queue with a fixed pool of asyncio workers.
+    submit() refuses new jobs once MAX_DEPTH are waiting, so a burst of uploads
+    turns into 503s instead of unbounded memory growth in the API process.
+    """
+
+    MAX_DEPTH = int(os.getenv("INGEST_QUEUE_MAX_DEPTH", "8"))
+    WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+    JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+    _queue: Optional[asyncio.Queue] = None
+    _workers: List[asyncio.Task] = []
+    _jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+    # doc_id -> [lock, jobs holding or waiting for it]
+    _doc_locks: Dict[str, List[Any]] = {}
+
+    @classmethod
+    async def start(cls):
+        if cls._queue is not None:
+            return
+        cls._queue = asyncio.Queue(maxsize=max(cls.MAX_DEPTH, 1))
+        cls._workers = [
+            asyncio.create_task(cls._worker(i), name=f"ingest-worker-{i}")
+            for i in range(max(cls.WORKERS, 1))
+        ]
+        print(f"📥 Ingest queue ready ({len(cls._workers)} workers, depth {cls._queue.maxsize})")
+
+    @classmethod
+    async def stop(cls):
+        for task in cls._workers:
+            task.cancel()
+        await asyncio.gather(*cls._workers, return_exceptions=True)
+        cls._workers = []
+        cls._queue = None
+
+    @classmethod
+    def submit(cls, job: IngestJob) -> IngestJob:
+        if cls._queue is None:
+            raise RuntimeError("Ingest queue is not running.")
+        try:
+            cls._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestQueueFull(f"Ingest queue is full ({cls._queue.maxsize} jobs waiting).")
+        cls._remember(job)
+        return job
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[IngestJob]:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def depth(cls) -> int:
+        return cls._queue.qsize() if cls._queue is not None else 0
+
+    @classmethod
+    def _remember(cls, job: IngestJob):
+        cls._jobs[job.job_id] = job
+        # Forget the oldest finished jobs once the history cap is exceeded
+        overflow = len(cls._jobs) - cls.JOB_HISTORY
+        for job_id in [jid for jid, j in cls._jobs.items() if j.done][:max(overflow, 0)]:
+            del cls._jobs[job_id]
+
+    @classmethod
+    @asynccontextmanager
+    async def _document_lock(cls, doc_id: str):
+        """
+        Serializes jobs for one document. Each run reads the previous chunk list, then
+        registers the new one and collects what it dropped, so two overlapping runs of
+        the same doc_id (a quick re-upload) could garbage-collect each other's chunks.
+        """
+        entry = cls._doc_locks.setdefault(doc_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del cls._doc_locks[doc_id]
+
+    @classmethod
+    async def _worker(cls, index: int):
+        queue = cls._queue
+        while True:
+            job = await queue.get()
+            try:
+                async with cls._document_lock(job.doc_id):
+                    job.status = "running"
+                    job.touch()
+                    job.result = await IngestService.run(job)
+                job.status = "succeeded"
+                print(f"✅ Ingest job {job.job_id} ({job.filename}) complete")
+            except Exception as e:
+                if job.stage:
+                    job.stages[job.stage]["status"] = "failed"
+                job.error = getattr(e, "detail", None) or str(e)
+                job.status = "failed"
+                print(f"❌ Ingest job {job.job_id} ({job.filename}) failed: {job.error}")
+            finally:
+                if os.path.exists(job.pdf_path):
+                    os.remove(job.pdf_path)
+                job.finished_at = time.time()
+                job.touch()
+                queue.task_done()
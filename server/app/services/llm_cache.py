@@ -0,0 +1,131 @@
+import os
+import time
+import json
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM completions.
+    Tier 1 is an in-process LRU; tier 2 is a SQLite file shared across restarts and
+    workers. Entries expire after TTL_SECONDS and the disk tier is trimmed to
+    DISK_MAX_ENTRIES (least recently used first). Safe because every call runs at temperature 0.
+    """
+    _instance = None
+
+    ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+    DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "50000"))
+    TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    # Run disk eviction once every N writes rather than on every put
+    EVICT_EVERY = 200
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(LLMCache, cls).__new__(cls)
+            instance._memory = OrderedDict()  # key -> (created_at, value)
+            instance._lock = threading.Lock()  # Memory tier + counters (held only briefly)
+            instance._disk_lock = threading.Lock()  # SQLite connection (worker threads only)
+            instance._writes = 0
+            instance.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+            data_dir = os.getenv("AURELIUS_DATA_DIR", "data")
+            os.makedirs(data_dir, exist_ok=True)
+            path = os.path.join(data_dir, "llm_cache.sqlite3")
+            instance._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            instance._conn.execute("PRAGMA journal_mode=WAL")
+            instance._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key          TEXT PRIMARY KEY,
+                    value        TEXT NOT NULL,
+                    created_at   REAL NOT NULL,
+                    accessed_at  REAL NOT NULL
+                )
+                """
+            )
+            instance._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed_at)")
+            cls._instance = instance
+        return cls._instance
+
+    @staticmethod
+    def make_key(model: str, system: str, prompt: str, json_mode: bool) -> str:
+        payload = json.dumps([model, system, prompt, json_mode], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.TTL_SECONDS:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+        row = await asyncio.to_thread(self._disk_get, key, now)
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, row[0], row[1])
+        return row[1]
+
+    async def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self.counters["writes"] += 1
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        await asyncio.to_thread(self._disk_put, key, value, now, evict)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "memory_entries": len(self._memory),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, created_at: float, value: str):
+        """Inserts into the memory LRU (caller holds the lock)."""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.MEMORY_MAX_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        with self._disk_lock:
+            row = self._conn.execute(
+                "SELECT created_at, value FROM llm_cache WHERE key = ? AND created_at > ?",
+                (key, now - self.TTL_SECONDS),
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row
+
+    def _disk_put(self, key: str, value: str, now: float, evict: bool):
+        with self._disk_lock:
+            self._conn.execute(
+                "INSERT INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (key, value, now, now),
+            )
+            if evict:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.TTL_SECONDS,))
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.DISK_MAX_ENTRIES,),
+                )
@@ -1,108 +1,282 @@
 import os
 import json
+import random
+import asyncio
 import httpx
-from typing import List, Dict, Any
-from groq import AsyncGroq
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Sequence, Tuple
+from groq import APIConnectionError
+from app.services.context_packer import ContextPacker, EVIDENCE_SEPARATOR
+from app.services.llm_cache import LLMCache
+from app.services.llm_router import LLMBackend, LLMRouter, status_code
+
+# Start of the answer text returned when synthesis fails (never cached as a result)
+SYNTHESIS_ERROR = "The Aurelius reasoning engine encountered an error during synthesis"
+
+# Extraction rules shared by the single-chunk and batched triplet prompts
+TRIPLET_RULES = """You are a precise Knowledge Graph extraction engine. Output valid JSON only. No preamble, no explanation.
+
+Extract exact facts from the text as semantic triplets.
+
+RULES:
+1. Each triplet is {"subject": "Entity1", "predicate": "RELATIONSHIP", "object": "Entity2"}.
+2. Predicates must be UPPERCASE verbs (e.g., OWNS, IMPROVES, DISCOVERED, CAUSED_BY).
+3. Do NOT hallucinate — only extract what is explicitly stated.
+4. Use the same name for the same entity throughout."""
+TRIPLET_EXAMPLE_TEXT = "Attention mechanisms improved translation quality in 2017."
+TRIPLET_EXAMPLE_OUTPUT = (
+    '[{"subject": "Attention Mechanisms", "predicate": "IMPROVED", "object": "Translation Quality"}, '
+    '{"subject": "Attention Mechanisms", "predicate": "INTRODUCED_IN", "object": "2017"}]'
+)
 
 
 class LLMEngine:
     """
     The 'Neuro' Engine.
-    Dual-path: Groq Cloud (ultra-fast LPU) → Local Ollama fallback.
+    Completions are routed over the configured backends (LLMRouter): Groq Cloud
+    (ultra-fast LPU), any number of Ollama hosts and OpenAI-compatible servers, with
+    failover, circuit breakers, hedging and load balancing.
     All methods are async to avoid blocking FastAPI's event loop.
     """
 
-    OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-    MODEL_LOCAL = os.getenv("LLM_MODEL", "llama3")
-    MODEL_GROQ = "llama3-8b-8192"  # Fast, generous free-tier on Groq
+    # Batched triplet extraction: several chunks per JSON-mode request
+    EXTRACTION_BATCH_ENABLED = os.getenv("EXTRACTION_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXTRACTION_BATCH_MAX_CHUNKS = int(os.getenv("EXTRACTION_BATCH_MAX_CHUNKS", "8"))
+    # Chunk text tokens per batched request (capped to leave room for the JSON answer)
+    EXTRACTION_BATCH_TOKENS = int(os.getenv("EXTRACTION_BATCH_TOKENS", "2048"))
+
+    # Retry policy for transient failures (429 / 5xx / connection errors)
+    MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
 
     # -------------------------------------------------------------------------
-    # PRIVATE: Low-Level LLM Callers
+    # PRIVATE: Routing, Retries and Caching
     # -------------------------------------------------------------------------
 
     @staticmethod
-    async def _call_groq(prompt: str, system: str, json_mode: bool = True) -> str:
-        """Async call to Groq Cloud LPU (ultra-fast Llama 3 inference)."""
-        client = AsyncGroq(api_key=LLMEngine.GROQ_API_KEY)
-        kwargs: Dict[str, Any] = {
-            "messages": [
-                {"role": "system", "content": system},
-                {"role": "user", "content": prompt},
-            ],
-            "model": LLMEngine.MODEL_GROQ,
-            "temperature": 0,
-        }
-        if json_mode:
-            kwargs["response_format"] = {"type": "json_object"}
-        else:
-            kwargs["max_tokens"] = 512  # type: ignore
+    def _status_code(exc: Exception) -> Optional[int]:
+        return status_code(exc)
+
+    @staticmethod
+    def _retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+        """
+        Returns how long to wait before retrying `exc`, or None if it is not retryable.
+        Retries on 429, 5xx and transport errors; honours a Retry-After header when present.
+        """
+        response = getattr(exc, "response", None)
+        status = LLMEngine._status_code(exc)
+
+        if status is None:
+            if not isinstance(exc, (httpx.TransportError, APIConnectionError, asyncio.TimeoutError)):
+                return None
+        elif status != 429 and status < 500:
+            return None
+
+        backoff = LLMEngine.RETRY_BASE_DELAY * (2 ** attempt) + random.uniform(0, 0.5)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            return max(float(headers.get("retry-after", 0)), backoff)
+        except (TypeError, ValueError):
+            return backoff
+
+    @staticmethod
+    def _is_cacheable(content: str, json_mode: bool) -> bool:
+        """Only well-formed responses are cached — never persist an empty or broken completion."""
+        if not content.strip():
+            return False
+        if not json_mode:
+            return True
+        try:
+            json.loads(content)
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    async def _cache_get(cache: LLMCache, key: str) -> Optional[str]:
+        """Cached completion, if any; a cache read failure counts as a miss."""
+        try:
+            return await cache.get(key)
+        except Exception as e:
+            print(f"⚠️ LLM cache read failed ({e}). Calling the LLM.")
+            return None
+
+    @staticmethod
+    async def _cache_put(cache: LLMCache, key: str, content: str):
+        """Caches a completion; a cache write failure never fails the completion itself."""
+        try:
+            await cache.put(key, content)
+        except Exception as e:
+            print(f"⚠️ LLM cache write failed ({e}). Continuing uncached.")
 
-        response = await client.chat.completions.create(**kwargs)
-        return response.choices[0].message.content or ""
+    @staticmethod
+    def _on_backend_failure(backend: LLMBackend, exc: Exception, failing_over: bool):
+        """Logs a backend failure; a 429 also holds back that backend for its Retry-After."""
+        if LLMEngine._status_code(exc) == 429:
+            backend.throttle.penalize(LLMEngine._retry_delay(exc, 0) or LLMEngine.RETRY_BASE_DELAY)
+        print(f"⚠️ LLM backend '{backend.name}' failed: {exc}" + (". Failing over." if failing_over else ""))
 
     @staticmethod
-    async def _call_ollama(prompt: str, system: str, json_mode: bool = True) -> str:
-        """Async call to local Ollama instance using httpx (non-blocking)."""
-        full_prompt = f"{system}\n\n{prompt}" if system else prompt
-        payload: Dict[str, Any] = {
-            "model": LLMEngine.MODEL_LOCAL,
-            "prompt": full_prompt,
-            "stream": False,
-        }
-        if json_mode:
-            payload["format"] = "json"
+    def _round_error(errors: List[Exception]) -> Exception:
+        """The error a failed routing round is retried (or raised) on: a transient one if any."""
+        return next((e for e in errors if LLMEngine._retry_delay(e, 0) is not None), errors[-1])
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(LLMEngine.OLLAMA_URL, json=payload)
-            response.raise_for_status()
-            return response.json().get("response", "")
+    @staticmethod
+    def _backoff(exc: Exception, attempt: int) -> float:
+        """Returns the retry delay for `exc`, or re-raises it when retries are exhausted."""
+        delay = LLMEngine._retry_delay(exc, attempt)
+        if delay is None or attempt >= LLMEngine.MAX_RETRIES:
+            raise exc
+        print(f"⏳ LLM: every backend failed ({exc}). Retry {attempt + 1}/{LLMEngine.MAX_RETRIES} in {delay:.1f}s")
+        return delay
 
     @staticmethod
-    async def _call_llm(prompt: str, system: str, json_mode: bool = True) -> str:
+    async def _route(prompt: str, system: str, json_mode: bool, policy: str) -> str:
         """
-        HYBRID ROUTER: Groq first (fast), Ollama fallback (local).
-        This dual-path is intentional — ensures the engine always has an inference backend.
+        One routing round: tries the policy's candidates in order until one answers.
+        The next candidate starts when the running one fails, or — for HEDGED — once it
+        has taken longer than its hedge delay; the first answer wins and the rest are
+        cancelled. Raises the round's error when every candidate failed.
         """
-        if LLMEngine.GROQ_API_KEY:
-            print("🌐 LLM: Using Groq Cloud (Llama 3 LPU)...")
-            return await LLMEngine._call_groq(prompt, system, json_mode)
-        else:
-            print("🖥️  LLM: Using Local Ollama (Llama 3)...")
-            return await LLMEngine._call_ollama(prompt, system, json_mode)
+        candidates = LLMRouter.candidates(policy)
+        running: Dict["asyncio.Task[str]", LLMBackend] = {}
+        errors: List[Exception] = []
+        launched = 0
+        timed_out = False
+        try:
+            while True:
+                if launched < len(candidates) and (not running or timed_out):
+                    backend = candidates[launched]
+                    running[backend.complete(prompt, system, json_mode)] = backend
+                    launched += 1
+                if not running:
+                    raise LLMEngine._round_error(errors)
+
+                hedge = policy == LLMRouter.HEDGED and launched < len(candidates)
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=LLMRouter.hedge_delay(candidates[launched - 1]) if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                timed_out = not done
+                if timed_out:
+                    print(f"🏁 LLM: hedging '{candidates[launched - 1].name}' with '{candidates[launched].name}'")
+                for task in done:
+                    backend = running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                    LLMEngine._on_backend_failure(backend, task.exception(), launched < len(candidates))
+        finally:
+            for task in running:
+                task.cancel()
+
+    @staticmethod
+    async def _call_llm(prompt: str, system: str, json_mode: bool = True, policy: str = LLMRouter.PRIORITY) -> str:
+        """
+        Routes a completion over the backends with `policy` (see LLMRouter and _route).
+        A round in which every backend failed is retried with backoff while the failure
+        is transient.
+        """
+        # Temperature is 0, so identical (models, system, prompt, mode) requests are reusable
+        cache = LLMCache() if LLMCache.ENABLED else None
+        cache_key = LLMCache.make_key(LLMRouter.cache_identity(), system, prompt, json_mode) if cache else ""
+        if cache:
+            cached = await LLMEngine._cache_get(cache, cache_key)
+            if cached is not None:
+                return cached
+
+        attempt = 0
+        while True:
+            try:
+                content = await LLMEngine._route(prompt, system, json_mode, policy)
+            except Exception as e:
+                await asyncio.sleep(LLMEngine._backoff(e, attempt))
+                attempt += 1
+                continue
+            if cache and LLMEngine._is_cacheable(content, json_mode):
+                await LLMEngine._cache_put(cache, cache_key, content)
+            return content
+
+    @staticmethod
+    async def _stream_llm(prompt: str, system: str) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of _call_llm (free-text mode, PRIORITY routing).
+        Backends fail over, and rounds are retried, only until the first token has been sent.
+        A cached completion is replayed as a single token; a finished stream is cached.
+        """
+        cache = LLMCache() if LLMCache.ENABLED else None
+        cache_key = LLMCache.make_key(LLMRouter.cache_identity(), system, prompt, False) if cache else ""
+        if cache:
+            cached = await LLMEngine._cache_get(cache, cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        attempt = 0
+        parts: List[str] = []
+        while True:
+            errors: List[Exception] = []
+            candidates = LLMRouter.candidates(LLMRouter.PRIORITY)
+            for i, backend in enumerate(candidates):
+                try:
+                    async for token in backend.stream(prompt, system):
+                        parts.append(token)
+                        yield token
+                    break
+                except Exception as e:
+                    if parts:
+                        raise
+                    errors.append(e)
+                    LLMEngine._on_backend_failure(backend, e, i + 1 < len(candidates))
+            else:
+                await asyncio.sleep(LLMEngine._backoff(LLMEngine._round_error(errors), attempt))
+                attempt += 1
+                continue
+            # A backend finished; an empty completion is not retried
+            break
+
+        content = "".join(parts)
+        if cache and LLMEngine._is_cacheable(content, False):
+            await LLMEngine._cache_put(cache, cache_key, content)
 
     # -------------------------------------------------------------------------
     # PUBLIC: High-Level Intelligence Methods
     # -------------------------------------------------------------------------
 
     @staticmethod
-    async def extract_triplets(text_chunk: str) -> List[Dict[str, str]]:
+    def _valid_triplets(value: Any) -> List[Dict[str, str]]:
+        """Keeps the well-formed {"subject", "predicate", "object"} items of a parsed JSON value."""
+        if not isinstance(value, list):
+            return []
+        return [t for t in value if isinstance(t, dict) and "subject" in t and "predicate" in t and "object" in t]
+
+    @staticmethod
+    async def extract_triplets(text_chunk: str) -> Optional[List[Dict[str, str]]]:
         """
         NEURO → SYMBOLIC: Converts raw text into structured Knowledge Graph triplets.
         Forces the LLM to produce (Subject, Predicate, Object) tuples.
-        Returns: [{"subject": "...", "predicate": "...", "object": "..."}]
+        Returns: [{"subject": "...", "predicate": "...", "object": "..."}], or None when
+        the extraction failed (as opposed to [] for a chunk without facts).
         """
-        system = "You are a precise Knowledge Graph extraction engine. Output valid JSON only. No preamble, no explanation."
-
-        prompt = f"""Extract exact facts from the text as semantic triplets.
-
-RULES:
-1. OUTPUT MUST BE A JSON ARRAY: [{{"subject": "Entity1", "predicate": "RELATIONSHIP", "object": "Entity2"}}]
-2. Predicates must be UPPERCASE verbs (e.g., OWNS, IMPROVES, DISCOVERED, CAUSED_BY).
-3. Do NOT hallucinate — only extract what is explicitly stated.
-4. If no clear facts are found, return an empty array: []
+        # Static rules live in the system message: every extraction call shares it as
+        # its prompt prefix, so backends with prefix caching only evaluate the chunk
+        system = f"""{TRIPLET_RULES}
+5. OUTPUT MUST BE A JSON ARRAY: [{{"subject": "Entity1", "predicate": "RELATIONSHIP", "object": "Entity2"}}]
+6. If no clear facts are found, return an empty array: []
 
 EXAMPLE:
-Input: "Attention mechanisms improved translation quality in 2017."
-Output: [{{"subject": "Attention Mechanisms", "predicate": "IMPROVED", "object": "Translation Quality"}}, {{"subject": "Attention Mechanisms", "predicate": "INTRODUCED_IN", "object": "2017"}}]
+Input: "{TRIPLET_EXAMPLE_TEXT}"
+Output: {TRIPLET_EXAMPLE_OUTPUT}"""
 
-TEXT TO ANALYZE:
-{text_chunk}
+        # Chunks are sized for the embedder, far below the window — this only guards odd inputs
+        text_budget = ContextPacker.input_budget() - ContextPacker.count_tokens(system) - 16
+        prompt = f"""TEXT TO ANALYZE:
+{ContextPacker.truncate(text_chunk, text_budget)}
 
 OUTPUT JSON:"""
 
         try:
-            content = await LLMEngine._call_llm(prompt, system, json_mode=True)
+            content = await LLMEngine._call_llm(prompt, system, json_mode=True, policy=LLMRouter.BALANCED)
             triplets = json.loads(content)
 
             # Handle edge case where LLM wraps array in a root object
@@ -112,36 +286,142 @@ OUTPUT JSON:"""
                         triplets = triplets[key]
                         break
 
-            if not isinstance(triplets, list):
-                return []
-
-            return [t for t in triplets if isinstance(t, dict) and "subject" in t and "predicate" in t and "object" in t]
+            return LLMEngine._valid_triplets(triplets)
 
         except Exception as e:
             print(f"❌ Triplet Extraction Failed: {e}")
-            return []
+            return None
+
+    @staticmethod
+    def _batch_system() -> str:
+        return f"""{TRIPLET_RULES}
+5. The input holds several chunks, each introduced by a line `### CHUNK <id>`. Extract from each chunk separately.
+6. OUTPUT MUST BE A JSON OBJECT with one key per chunk id, each mapping to that chunk's array of triplets: {{"c0": [{{"subject": "Entity1", "predicate": "RELATIONSHIP", "object": "Entity2"}}], "c1": []}}
+7. Include every chunk id. A chunk without clear facts maps to an empty array: []
+
+EXAMPLE:
+Input:
+### CHUNK c0
+{TRIPLET_EXAMPLE_TEXT}
+### CHUNK c1
+See the appendix.
+Output: {{"c0": {TRIPLET_EXAMPLE_OUTPUT}, "c1": []}}"""
+
+    @staticmethod
+    def _extraction_batches(chunks: Sequence[str]) -> List[List[int]]:
+        """
+        Groups chunk positions (in order) into batched extraction requests.
+        A batch is closed at EXTRACTION_BATCH_MAX_CHUNKS chunks or when its text would
+        exceed EXTRACTION_BATCH_TOKENS. That budget is capped so the prompt plus a JSON
+        answer of similar size still fits the model context.
+        """
+        overhead = ContextPacker.count_tokens(LLMEngine._batch_system()) + 16
+        budget = min(LLMEngine.EXTRACTION_BATCH_TOKENS, (ContextPacker.CONTEXT_TOKENS - overhead) // 2)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for i, chunk in enumerate(chunks):
+            # Chunk header line + text
+            cost = ContextPacker.count_tokens(chunk) + 8
+            if current and (used + cost > budget or len(current) >= LLMEngine.EXTRACTION_BATCH_MAX_CHUNKS):
+                batches.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    async def extract_triplets_batch(chunks: Sequence[str]) -> List[Optional[List[Dict[str, str]]]]:
+        """
+        Extracts triplets for several chunks in one JSON-mode request, keyed by chunk id
+        (`c0`, `c1`, … by position), so the instruction block is paid once per batch.
+        Returns one entry per chunk: its triplets, or None when the answer for that chunk
+        is missing or malformed (or the whole response failed) — retry those one by one.
+        """
+        if len(chunks) == 1:
+            return [await LLMEngine.extract_triplets(chunks[0])]
+
+        prompt = "\n".join(f"### CHUNK c{i}\n{chunk}" for i, chunk in enumerate(chunks)) + "\n\nOUTPUT JSON:"
+        try:
+            content = await LLMEngine._call_llm(prompt, LLMEngine._batch_system(), json_mode=True, policy=LLMRouter.BALANCED)
+            data = json.loads(content)
+        except Exception as e:
+            print(f"⚠️ Batched extraction of {len(chunks)} chunks failed ({e}). Falling back to single chunks.")
+            return [None] * len(chunks)
+        if not isinstance(data, dict):
+            return [None] * len(chunks)
+        # Arrays only: a missing key or non-array value is a malformed answer, not "no facts"
+        return [
+            LLMEngine._valid_triplets(data[f"c{i}"]) if isinstance(data.get(f"c{i}"), list) else None
+            for i in range(len(chunks))
+        ]
+
+    @staticmethod
+    async def extract_triplets_many(
+        chunks: Sequence[str],
+        concurrency: int = 4,
+        on_chunk_done: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+    ) -> List[Optional[List[Dict[str, str]]]]:
+        """
+        Fan-out extraction over all chunks with at most `concurrency` requests in flight.
+        With EXTRACTION_BATCH_ENABLED, consecutive chunks are packed into batched requests
+        sized to fit the context (see _extraction_batches). Chunks a batch answer does not
+        cover are retried with single-chunk calls. Results keep the input order; a chunk
+        whose extraction failed is None, so callers do not record it as processed.
+        Requests are spread over the backends by weighted least outstanding requests, and
+        backend throttles still apply underneath, so this never exceeds provider limits.
+        `on_chunk_done` is called with each chunk's triplets as it finishes (progress reporting).
+        """
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        results: List[Optional[List[Dict[str, str]]]] = [None for _ in chunks]
+
+        async def _extract(batch: List[int]):
+            async with semaphore:
+                answers = await LLMEngine.extract_triplets_batch([chunks[i] for i in batch])
+            # A single-chunk batch already was the single-chunk call
+            retry = len(batch) > 1
+            missing = [i for i, answer in zip(batch, answers) if answer is None]
+            if missing and retry:
+                print(f"🔁 Extraction: retrying {len(missing)}/{len(batch)} chunks one by one")
+            for i, answer in zip(batch, answers):
+                if answer is None and retry:
+                    async with semaphore:
+                        answer = await LLMEngine.extract_triplets(chunks[i])
+                results[i] = answer
+                if on_chunk_done:
+                    on_chunk_done(answer or [])
+
+        if LLMEngine.EXTRACTION_BATCH_ENABLED:
+            batches = LLMEngine._extraction_batches(chunks)
+        else:
+            batches = [[i] for i in range(len(chunks))]
+        await asyncio.gather(*(_extract(b) for b in batches))
+        return results
 
     @staticmethod
     async def extract_entities(query: str) -> List[str]:
         """
         Extracts 1-3 key named entities from a natural language query.
         These become the start/end nodes for graph pathfinding.
+        Every /reason request waits on this call, so it is hedged across backends.
         """
-        system = "You are an entity extraction engine. Extract key named entities for Knowledge Graph search. Output valid JSON only."
+        system = """You are an entity extraction engine. Extract key named entities for Knowledge Graph search. Output valid JSON only.
 
-        prompt = f"""Extract the 1-3 most important named entities from this query for Knowledge Graph lookup.
+Extract the 1-3 most important named entities from the query for Knowledge Graph lookup.
 
 RULES:
-1. OUTPUT MUST BE STRICT JSON: {{"entities": ["Entity1", "Entity2"]}}
+1. OUTPUT MUST BE STRICT JSON: {"entities": ["Entity1", "Entity2"]}
 2. Use Title Case (e.g., "Attention Mechanism", "Neural Network", "Transformer")
 3. Extract CONCEPTS and PROPER NOUNS, not common words (not: "the", "what", "how")
-4. If no clear entities, infer the main topic as an entity
+4. If no clear entities, infer the main topic as an entity"""
 
-QUERY: "{query}"
+        prompt = f"""QUERY: "{query}"
 OUTPUT JSON:"""
 
         try:
-            content = await LLMEngine._call_llm(prompt, system, json_mode=True)
+            content = await LLMEngine._call_llm(prompt, system, json_mode=True, policy=LLMRouter.HEDGED)
             data = json.loads(content)
             entities = data.get("entities", [])
             # Validate: filter empty strings, ensure list
@@ -151,42 +431,95 @@ OUTPUT JSON:"""
             return []
 
     @staticmethod
-    async def synthesize_answer(query: str, path_nodes: List[str], vector_context: List[str]) -> str:
+    def _build_synthesis_prompt(
+        query: str,
+        path_nodes: List[str],
+        vector_context: List[str],
+        path_relations: Optional[List[str]] = None,
+    ) -> Tuple[str, str]:
         """
-        SYMBOLIC → NEURAL: Synthesizes a grounded, cited answer using:
-        - The verified Knowledge Graph path (certain facts)
-        - Supporting vector chunks from source documents (context)
-        This is the 'right hemisphere' of the neuro-symbolic loop.
+        Returns the (system, prompt) pair shared by synthesize_answer and stream_answer.
+        The persona and instructions are static (a reusable prompt prefix); the question,
+        the labelled graph path and the evidence passages are packed into the rest of
+        the prompt budget (ContextPacker), best evidence first.
         """
-        system = (
-            "You are Aurelius, a Neuro-Symbolic Reasoning Engine. "
-            "Your answers are grounded ONLY in verified Knowledge Graph paths and source document evidence. "
-            "You never hallucinate. You always cite the reasoning path explicitly."
-        )
-
-        path_str = " → ".join(path_nodes) if path_nodes else "No direct graph path found."
-        context_str = "\n\n---\n\n".join(vector_context[:3]) if vector_context else "No supporting context available."
-
-        prompt = f"""USER QUESTION:
-{query}
+        system = """You are Aurelius, a Neuro-Symbolic Reasoning Engine. Your answers are grounded ONLY in verified Knowledge Graph paths and source document evidence. You never hallucinate. You always cite the reasoning path explicitly.
 
-VERIFIED KNOWLEDGE GRAPH PATH (Deterministic Logic Chain):
-{path_str}
-
-SUPPORTING EVIDENCE (From Source Documents):
-{context_str}
+You receive a USER QUESTION, a VERIFIED KNOWLEDGE GRAPH PATH (a deterministic logic chain, written as `A -[RELATION]- B`) and SUPPORTING EVIDENCE passages from source documents.
 
 INSTRUCTIONS:
-- Ground your entire answer in the provided evidence above
+- Ground your entire answer in the provided path and evidence
 - Explicitly reference the reasoning path (e.g., "The graph shows: X → Y → Z")
 - Be precise and concise (2-4 sentences)
 - If the evidence is insufficient to answer, state that clearly and honestly
-- Do NOT add information not present in the path or context
+- Do NOT add information not present in the path or context"""
+
+        template = """USER QUESTION:
+{query}
+
+VERIFIED KNOWLEDGE GRAPH PATH:
+{path}
+
+SUPPORTING EVIDENCE (From Source Documents):
+{context}
 
 GROUNDED ANSWER:"""
 
+        budget = ContextPacker.input_budget()
+        share = int(budget * ContextPacker.PATH_SHARE)
+        query = ContextPacker.truncate(query, share)
+        path_str = (
+            ContextPacker.fit_path(path_nodes, path_relations, share)
+            if path_nodes else "No direct graph path found."
+        )
+        fixed = ContextPacker.count_tokens(system) + ContextPacker.count_tokens(
+            template.format(query=query, path=path_str, context="")
+        )
+        evidence = ContextPacker.pack_evidence(vector_context, f"{query} {path_str}", budget - fixed)
+        context_str = EVIDENCE_SEPARATOR.join(evidence) if evidence else "No supporting context available."
+        if len(evidence) < len(vector_context):
+            print(f"✂️ Prompt budget: {len(evidence)}/{len(vector_context)} evidence passages packed")
+
+        return system, template.format(query=query, path=path_str, context=context_str)
+
+    @staticmethod
+    async def synthesize_answer(
+        query: str,
+        path_nodes: List[str],
+        vector_context: List[str],
+        path_relations: Optional[List[str]] = None,
+    ) -> str:
+        """
+        SYMBOLIC → NEURAL: Synthesizes a grounded, cited answer using:
+        - The verified Knowledge Graph path (certain facts)
+        - Supporting vector chunks from source documents (context)
+        This is the 'right hemisphere' of the neuro-symbolic loop.
+        """
+        system, prompt = LLMEngine._build_synthesis_prompt(query, path_nodes, vector_context, path_relations)
         try:
             return await LLMEngine._call_llm(prompt, system, json_mode=False)
         except Exception as e:
             print(f"❌ Answer Synthesis Failed: {e}")
-            return f"The Aurelius reasoning engine encountered an error during synthesis: {str(e)}"
+            return f"{SYNTHESIS_ERROR}: {str(e)}"
+
+    @staticmethod
+    async def stream_answer(
+        query: str,
+        path_nodes: List[str],
+        vector_context: List[str],
+        path_relations: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Token-streaming variant of synthesize_answer: yields answer text as it is generated,
+        so the first words reach the user without waiting for the full completion.
+        """
+        system, prompt = LLMEngine._build_synthesis_prompt(query, path_nodes, vector_context, path_relations)
+        emitted = False
+        try:
+            async for token in LLMEngine._stream_llm(prompt, system):
+                emitted = True
+                yield token
+        except Exception as e:
+            print(f"❌ Answer Synthesis Failed: {e}")
+            prefix = "\n\n" if emitted else ""
+            yield f"{prefix}{SYNTHESIS_ERROR}: {str(e)}"
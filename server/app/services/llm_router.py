@@ -0,0 +1,542 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+from app.db.http_clients import LLMClients
+from app.services.context_packer import ContextPacker
+
+
+def status_code(exc: Exception) -> Optional[int]:
+    """HTTP status of a Groq (APIStatusError) or httpx (HTTPStatusError) failure, if any."""
+    response = getattr(exc, "response", None)
+    return getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+
+
+class BackendThrottle:
+    """
+    Per-backend rate-limit guard.
+    Caps in-flight requests and spaces request starts to stay under the provider's
+    requests-per-minute budget. A 429 pushes the next allowed start for the whole backend.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, rpm: int = 0):
+        self.name = name
+        self.min_interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+        self._penalized_until = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            async with self._lock:
+                wait = self._next_start - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_start = max(self._next_start, time.monotonic()) + self.min_interval
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+    def penalize(self, delay: float):
+        """Blocks new request starts on this backend for `delay` seconds (e.g. after a 429)."""
+        self._next_start = max(self._next_start, time.monotonic() + delay)
+        self._penalized_until = max(self._penalized_until, time.monotonic() + delay)
+
+    @property
+    def penalized(self) -> bool:
+        """True while a rate-limit penalty holds back new requests."""
+        return time.monotonic() < self._penalized_until
+
+
+class CircuitBreaker:
+    """
+    Stops routing to a failing backend.
+    Closed → open after FAILURES consecutive failures (rate limits do not count, the
+    throttle handles those). After COOLDOWN seconds the breaker is half-open: one probe
+    request is let through, and its outcome closes or re-opens the circuit.
+    """
+
+    FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+    COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", "30"))
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self._opened_at < self.COOLDOWN else "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def on_start(self):
+        if self.state == "half_open":
+            self._probing = True
+
+    def on_success(self):
+        if self._opened_at is not None:
+            print(f"✅ LLM backend '{self.name}' recovered: circuit closed")
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def on_failure(self):
+        self.failures += 1
+        half_open = self._probing
+        self._probing = False
+        if half_open or (self._opened_at is None and self.failures >= self.FAILURES):
+            self._opened_at = time.monotonic()
+            print(f"🔌 LLM backend '{self.name}' circuit opened for {self.COOLDOWN:.0f}s after {self.failures} failures")
+
+    def on_cancel(self):
+        self._probing = False
+
+
+class MockBackendError(Exception):
+    """Injected failure of the mock backend (retryable, like a 503)."""
+    status_code = 503
+
+
+class LLMBackend:
+    """
+    One inference endpoint: a Groq account, an Ollama host, an OpenAI-compatible
+    server (vLLM, llama.cpp, LM Studio, …) or the offline mock. Each backend has its
+    own throttle and circuit breaker, and tracks in-flight requests, a latency moving
+    average and an error-rate moving average for the router.
+    """
+
+    KINDS = ("groq", "ollama", "openai", "mock")
+    DEFAULT_MODELS = {"groq": "llama3-8b-8192", "ollama": "llama3", "openai": "default", "mock": "mock"}
+    # How long Ollama keeps the model (and its cached prompt prefix) loaded between calls
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Weight of the newest sample in the latency / error-rate moving averages
+    EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        model: str,
+        url: str = "",
+        api_key: Optional[str] = None,
+        weight: float = 1.0,
+        max_concurrency: int = 2,
+        rpm: int = 0,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown LLM backend kind '{kind}' (expected one of {', '.join(self.KINDS)})")
+        if kind == "ollama" and not url.rstrip("/").endswith("/api/generate"):
+            url = url.rstrip("/") + "/api/generate"
+        if kind == "openai" and not url:
+            raise ValueError(f"LLM backend '{name}': an OpenAI-compatible backend needs a url")
+        self.name = name
+        self.kind = kind
+        self.model = model
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        # 0 = fallback only: BALANCED routing fails over to it but never spreads load onto it
+        self.weight = max(float(weight), 0.0)
+        self.options = options or {}
+        self.throttle = BackendThrottle(name, max_concurrency, rpm)
+        self.breaker = CircuitBreaker(name)
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency: Optional[float] = None
+        self.latency_deviation = 0.0
+        self.error_rate = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], index: int) -> "LLMBackend":
+        """Builds a backend from one LLM_BACKENDS entry."""
+        kind = config.get("kind", "ollama")
+        api_key = config.get("api_key") or (os.getenv(config["api_key_env"]) if config.get("api_key_env") else None)
+        return cls(
+            name=config.get("name") or f"{kind}-{index}",
+            kind=kind,
+            model=config.get("model") or cls.DEFAULT_MODELS.get(kind, ""),
+            url=config.get("url", "http://localhost:11434" if kind == "ollama" else ""),
+            api_key=api_key,
+            weight=config.get("weight", 1.0),
+            max_concurrency=config.get("max_concurrency", 2),
+            rpm=config.get("rpm", 0),
+            options={k: v for k, v in config.items() if k in ("latency_ms", "error_rate")},
+        )
+
+    def available(self) -> bool:
+        return self.breaker.allow()
+
+    def tail_latency(self) -> Optional[float]:
+        """Rough p95 latency in seconds (mean + 2 deviations), None before the first sample."""
+        if self.latency is None:
+            return None
+        return self.latency + 2 * self.latency_deviation
+
+    def _record_success(self, elapsed: float):
+        self.breaker.on_success()
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency_deviation += self.EWMA_ALPHA * (abs(elapsed - self.latency) - self.latency_deviation)
+            self.latency += self.EWMA_ALPHA * (elapsed - self.latency)
+        self.error_rate *= 1 - self.EWMA_ALPHA
+
+    def _record_failure(self, exc: Exception):
+        self.errors += 1
+        self.error_rate += self.EWMA_ALPHA * (1 - self.error_rate)
+        if status_code(exc) == 429:
+            self.breaker.on_cancel()
+        else:
+            self.breaker.on_failure()
+
+    def complete(self, prompt: str, system: str, json_mode: bool = True) -> "asyncio.Task[str]":
+        """
+        One completion under this backend's throttle, recorded for routing. The request
+        counts as outstanding from this call on (not from the first await), so requests
+        dispatched together already see each other when the router balances load. The
+        count is released by a done callback, which also runs for a task cancelled before
+        its first step (a coroutine's own finally would never be entered then).
+        """
+        self.breaker.on_start()
+        self.outstanding += 1
+        self.requests += 1
+        task = asyncio.ensure_future(self._tracked(prompt, system, json_mode))
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: "asyncio.Task[str]"):
+        self.outstanding -= 1
+        if task.cancelled():
+            # Lost a hedge race or the caller gave up: says nothing about backend health
+            self.breaker.on_cancel()
+
+    async def _tracked(self, prompt: str, system: str, json_mode: bool) -> str:
+        try:
+            async with self.throttle:
+                started = time.monotonic()
+                content = await self._complete(prompt, system, json_mode)
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success(time.monotonic() - started)
+        return content
+
+    async def stream(self, prompt: str, system: str) -> AsyncIterator[str]:
+        """Streams a free-text completion under this backend's throttle, recorded for routing."""
+        self.breaker.on_start()
+        self.outstanding += 1
+        self.requests += 1
+        finished = False
+        try:
+            async with self.throttle:
+                started = time.monotonic()
+                async for token in self._stream(prompt, system):
+                    yield token
+            finished = True
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        finally:
+            self.outstanding -= 1
+            if finished:
+                self._record_success(time.monotonic() - started)
+            else:
+                self.breaker.on_cancel()
+
+    # -------------------------------------------------------------------------
+    # Backend protocols
+    # -------------------------------------------------------------------------
+
+    def _messages(self, prompt: str, system: str) -> List[Dict[str, str]]:
+        return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+    def _ollama_payload(self, prompt: str, system: str, json_mode: bool, stream: bool) -> Dict[str, Any]:
+        """
+        Ollama /api/generate body. The static system text goes in `system` (rendered
+        first by the model template), so consecutive calls share a prompt prefix that a
+        model kept loaded by `keep_alive` does not re-evaluate. `num_ctx` makes Ollama
+        use the full context window the prompt budget assumes.
+        """
+        options: Dict[str, Any] = {"num_ctx": ContextPacker.CONTEXT_TOKENS}
+        if not json_mode:
+            options["num_predict"] = ContextPacker.MAX_OUTPUT_TOKENS
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "system": system,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.OLLAMA_KEEP_ALIVE,
+            "options": options,
+        }
+        if json_mode:
+            payload["format"] = "json"
+        return payload
+
+    def _openai_payload(self, prompt: str, system: str, json_mode: bool, stream: bool) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "messages": self._messages(prompt, system),
+            "model": self.model,
+            "temperature": 0,
+        }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        else:
+            payload["max_tokens"] = ContextPacker.MAX_OUTPUT_TOKENS
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _openai_headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    async def _complete(self, prompt: str, system: str, json_mode: bool) -> str:
+        if self.kind == "groq":
+            # Groq Cloud LPU via the SDK client for this backend's API key (OpenAI-style chat completions)
+            response = await LLMClients.groq(self.api_key).chat.completions.create(
+                **self._openai_payload(prompt, system, json_mode, stream=False)
+            )
+            return response.choices[0].message.content or ""
+
+        if self.kind == "ollama":
+            response = await LLMClients.ollama().post(
+                self.url, json=self._ollama_payload(prompt, system, json_mode, stream=False)
+            )
+            response.raise_for_status()
+            return response.json().get("response", "")
+
+        if self.kind == "openai":
+            response = await LLMClients.openai().post(
+                f"{self.url}/chat/completions",
+                json=self._openai_payload(prompt, system, json_mode, stream=False),
+                headers=self._openai_headers(),
+            )
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"] or ""
+
+        return await self._mock_complete(prompt, json_mode)
+
+    async def _stream(self, prompt: str, system: str) -> AsyncIterator[str]:
+        if self.kind == "groq":
+            stream = await LLMClients.groq(self.api_key).chat.completions.create(
+                **self._openai_payload(prompt, system, json_mode=False, stream=True)
+            )
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    yield token
+
+        elif self.kind == "ollama":
+            # `stream: true` answers with NDJSON lines
+            payload = self._ollama_payload(prompt, system, json_mode=False, stream=True)
+            async with LLMClients.ollama().stream("POST", self.url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
+
+        elif self.kind == "openai":
+            # Server-Sent Events: `data: {chunk}` lines, terminated by `data: [DONE]`
+            payload = self._openai_payload(prompt, system, json_mode=False, stream=True)
+            async with LLMClients.openai().stream(
+                "POST", f"{self.url}/chat/completions", json=payload, headers=self._openai_headers()
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    token = (choices[0].get("delta") or {}).get("content")
+                    if token:
+                        yield token
+
+        else:
+            content = await self._mock_complete(prompt, json_mode=False)
+            for word in re.findall(r'\S+\s*', content):
+                yield word
+
+    async def _mock_complete(self, prompt: str, json_mode: bool) -> str:
+        """
+        Offline stand-in with the response shapes the engine expects: chunk-keyed empty
+        triplet lists, title-cased query words as entities, and an answer quoting the
+        graph path. `latency_ms` and `error_rate` options simulate slow or flaky hosts.
+        """
+        latency = float(self.options.get("latency_ms", 0)) / 1000
+        if latency:
+            await asyncio.sleep(latency * random.uniform(0.5, 1.5))
+        if random.random() < float(self.options.get("error_rate", 0)):
+            raise MockBackendError(f"mock backend '{self.name}' injected failure")
+
+        if not json_mode:
+            path = re.search(r'VERIFIED KNOWLEDGE GRAPH PATH:\n(.+)', prompt)
+            return f"[{self.name}] The graph shows: {path.group(1) if path else 'no path'}."
+        chunk_ids = re.findall(r'^### CHUNK (\S+)$', prompt, re.M)
+        if chunk_ids:
+            return json.dumps({chunk_id: [] for chunk_id in chunk_ids})
+        query = re.search(r'QUERY: "(.*)"', prompt, re.S)
+        if query:
+            words = [w.strip('?.,!;:"\'') for w in query.group(1).split()]
+            return json.dumps({"entities": [w.title() for w in words if len(w) > 4][:3]})
+        return "[]"
+
+    async def probe(self) -> str:
+        """Liveness for /health: Ollama hosts are pinged, hosted APIs report their circuit state."""
+        if self.kind == "ollama":
+            try:
+                response = await LLMClients.ollama().get(
+                    self.url[:-len("/api/generate")] + "/api/tags", timeout=2.0
+                )
+                return "online" if response.status_code == 200 else "not-responding"
+            except Exception:
+                return "offline"
+        return "configured" if self.breaker.state != "open" else "offline: circuit open"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "model": self.model,
+            "weight": self.weight,
+            "circuit": self.breaker.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 3),
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "rate_limited": self.throttle.penalized,
+        }
+
+
+class LLMRouter:
+    """
+    Routing layer over the configured LLM backends (LLM_BACKENDS, a JSON list; by
+    default Groq when GROQ_API_KEY is set, then the local Ollama).
+
+    Policies:
+    - PRIORITY: configured order, failing over to the next backend on error
+      (answer synthesis: the fastest backend is listed first).
+    - BALANCED: weighted least outstanding requests, for bulk triplet extraction
+      spread over several hosts. Backends with weight 0 only take over on failure,
+      in configured order.
+    - HEDGED: like PRIORITY, but a second backend is raced once the first has been
+      slower than its usual tail latency (latency-sensitive entity extraction).
+    Backends with an open circuit are skipped (all are tried if every circuit is
+    open); rate-limited ones go last.
+    """
+
+    PRIORITY = "priority"
+    BALANCED = "balanced"
+    HEDGED = "hedged"
+
+    # Never hedge sooner than this, even for a backend that is usually very fast
+    HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "300")) / 1000
+    # Hedge delay for a backend without latency samples yet
+    HEDGE_DEFAULT_DELAY = 2.0
+
+    _backends: Optional[List[LLMBackend]] = None
+
+    @classmethod
+    def backends(cls) -> List[LLMBackend]:
+        if cls._backends is None:
+            cls._backends = cls._configure()
+        return cls._backends
+
+    @staticmethod
+    def _default_configs() -> List[Dict[str, Any]]:
+        """
+        The pre-router setup: Groq first when a key is set, local Ollama as fallback.
+        With Groq configured, Ollama has weight 0, so bulk extraction stays on Groq
+        and only fails over to the (possibly absent, usually slower) local model.
+        """
+        configs: List[Dict[str, Any]] = []
+        groq = bool(os.getenv("GROQ_API_KEY"))
+        if groq:
+            configs.append({
+                "name": "groq",
+                "kind": "groq",
+                "max_concurrency": int(os.getenv("GROQ_MAX_CONCURRENCY", "4")),
+                "rpm": int(os.getenv("GROQ_RPM", "30")),
+            })
+        configs.append({
+            "name": "ollama",
+            "kind": "ollama",
+            "url": os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate"),
+            "model": os.getenv("LLM_MODEL", "llama3"),
+            "max_concurrency": int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2")),
+            "weight": 0 if groq else 1,
+        })
+        return configs
+
+    @classmethod
+    def _configure(cls) -> List[LLMBackend]:
+        raw = os.getenv("LLM_BACKENDS", "").strip()
+        if raw:
+            try:
+                configs = json.loads(raw)
+                if not isinstance(configs, list) or not configs:
+                    raise ValueError("expected a non-empty JSON list")
+                return [LLMBackend.from_config(c, i) for i, c in enumerate(configs)]
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"❌ Invalid LLM_BACKENDS ({e}). Using the default Groq / Ollama backends.")
+        return [LLMBackend.from_config(c, i) for i, c in enumerate(cls._default_configs())]
+
+    @classmethod
+    def candidates(cls, policy: str = PRIORITY) -> List[LLMBackend]:
+        """Backends to try for one request, in order."""
+        backends = cls.backends()
+        candidates = [b for b in backends if b.available()] or list(backends)
+        if policy == cls.BALANCED:
+            balanced = sorted(
+                (b for b in candidates if b.weight > 0),
+                key=lambda b: ((b.outstanding + 1) / b.weight, b.latency or 0.0),
+            )
+            candidates = balanced + [b for b in candidates if b.weight <= 0]
+        # Stable sort: a rate-limited backend is only used when the others fail
+        return sorted(candidates, key=lambda b: b.throttle.penalized)
+
+    @classmethod
+    def hedge_delay(cls, backend: LLMBackend) -> float:
+        tail = backend.tail_latency()
+        return max(tail if tail is not None else cls.HEDGE_DEFAULT_DELAY, cls.HEDGE_MIN_DELAY)
+
+    @classmethod
+    def cache_identity(cls) -> str:
+        """Models that may answer a request (part of the LLM cache key)."""
+        return "|".join(sorted({f"{b.kind}:{b.model}" for b in cls.backends()}))
+
+    @classmethod
+    def describe(cls) -> str:
+        return ", ".join(f"{b.name} ({b.kind}:{b.model})" for b in cls.backends())
+
+    @classmethod
+    async def probe(cls) -> Dict[str, str]:
+        backends = cls.backends()
+        states = await asyncio.gather(*(b.probe() for b in backends))
+        return {b.name: state for b, state in zip(backends, states)}
+
+    @classmethod
+    def stats(cls) -> List[Dict[str, Any]]:
+        return [b.stats() for b in cls.backends()]
@@ -0,0 +1,89 @@
+import heapq
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# (neighbor name, relationship type, confidence)
+Neighbor = Tuple[str, str, float]
+NeighborFn = Callable[[str], Iterable[Neighbor]]
+
+# Floor for edge confidence so -log() stays finite
+MIN_CONFIDENCE = 1e-6
+
+
+def edge_cost(confidence: Optional[float]) -> float:
+    """-log(confidence): summing costs along a path == multiplying confidences."""
+    c = 1.0 if confidence is None else min(max(float(confidence), MIN_CONFIDENCE), 1.0)
+    return -math.log(c)
+
+
+def best_paths(
+    start: str,
+    end: str,
+    neighbors: NeighborFn,
+    k: int = 1,
+    max_depth: int = 8,
+    max_expansions: int = 50000,
+    min_confidence: float = 0.0,
+) -> List[Dict]:
+    """
+    Bounded best-first search for the k most confident simple paths start → end.
+
+    Edge weights are -log(confidence), so the cheapest path is the one with the
+    highest confidence product; ties go to the path with fewer hops (the same order
+    as `ORDER BY path_confidence DESC, path_length ASC`). A node is skipped once it
+    has been settled k times with no more hops than the current label — a cheaper
+    label that is also no longer can always be extended at least as far under the
+    depth limit. Paths never revisit a node, and the search stops after
+    `max_expansions` pops, returning the best paths found so far. Partial paths
+    whose confidence product already fell below `min_confidence` are never queued.
+
+    Returns [{"nodes", "relations", "confidence", "path_length"}], best first.
+    """
+    if start == end or k < 1:
+        return []
+
+    # Heap entries: (cost, hops, tiebreak, node, path nodes, path relations)
+    heap: List[Tuple[float, int, int, str, Tuple[str, ...], Tuple[str, ...]]] = [
+        (0.0, 0, 0, start, (start,), ())
+    ]
+    settled: Dict[str, List[int]] = {}  # node -> hop counts it was settled at
+
+    def dominated(node: str, hops: int) -> bool:
+        return sum(1 for h in settled.get(node, ()) if h <= hops) >= k
+
+    max_cost = edge_cost(min_confidence) if min_confidence > 0 else math.inf
+    counter = 1
+    expansions = 0
+    found: List[Dict] = []
+
+    while heap and len(found) < k and expansions < max_expansions:
+        cost, hops, _, node, path, relations = heapq.heappop(heap)
+        if dominated(node, hops):
+            continue
+        settled.setdefault(node, []).append(hops)
+        expansions += 1
+
+        if node == end:
+            found.append({
+                "nodes": list(path),
+                "relations": list(relations),
+                "confidence": math.exp(-cost),
+                "path_length": hops,
+            })
+            continue
+        if hops >= max_depth:
+            continue
+
+        for neighbor, rel, confidence in neighbors(node):
+            if neighbor in path or dominated(neighbor, hops + 1):
+                continue
+            next_cost = cost + edge_cost(confidence)
+            if next_cost > max_cost:
+                continue
+            heapq.heappush(heap, (
+                next_cost, hops + 1, counter,
+                neighbor, path + (neighbor,), relations + (rel,),
+            ))
+            counter += 1
+
+    return found
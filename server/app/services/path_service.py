@@ -1,93 +1,179 @@
 from app.db.neo4j_client import Neo4jClient
+from app.services.corpus import GLOBAL_SCOPE, Scope
+from app.services.entity_resolver import EntityResolver
+from app.services.graph_snapshot import GraphSnapshot
+from app.services.path_search import Neighbor, best_paths
 from typing import Optional, Dict, List
+import os
 
 
 class PathFindingService:
+    # Longest reasoning chain considered (hops)
+    MAX_DEPTH = int(os.getenv("PATH_MAX_DEPTH", "8"))
+    # Number of paths returned by find_reasoning_paths
+    TOP_K = int(os.getenv("PATH_TOP_K", "3"))
+    # Max edges loaded from Neo4j into the search snapshot per query
+    EXPANSION_BUDGET = int(os.getenv("PATH_EXPANSION_BUDGET", "20000"))
+    # Max edges followed per node (strongest first) — keeps hubs from flooding the snapshot
+    MAX_FANOUT = int(os.getenv("PATH_MAX_FANOUT", "500"))
+    # Max labels popped by the in-process best-first search
+    SEARCH_BUDGET = int(os.getenv("PATH_SEARCH_BUDGET", "50000"))
+    # Branches whose confidence product drops below this are pruned (edges below it are never loaded)
+    MIN_CONFIDENCE = float(os.getenv("PATH_MIN_CONFIDENCE", "0.05"))
+
     def __init__(self):
-        self.driver = Neo4jClient().get_driver()
+        self.client = Neo4jClient()
 
-    def find_reasoning_path(self, start_entity: str, end_entity: str) -> Optional[Dict]:
+    @staticmethod
+    async def _fetch_neighbors(
+        tx, names: List[str], fanout: int, limit: int, scope: Scope, min_confidence: float = 0.0
+    ) -> List[Dict]:
+        """
+        Transaction function: undirected edges of a frontier (within scope), strongest
+        first per node. Edges weaker than min_confidence cannot be on any accepted path.
         """
-        STEP 6: True weighted pathfinding.
-        Finds the path with highest cumulative confidence between two entities.
-        This is Confidence-Maximizing Path Selection — equivalent to running Dijkstra
-        on (1 - confidence) edge weights to find the most reliable reasoning chain.
+        result = await tx.run(
+            """
+            UNWIND $names AS name
+            MATCH (n:Entity {name: name})
+            CALL {
+                WITH n
+                MATCH (n)-[r]-(m:Entity)
+                WHERE """ + Scope.cypher_filter("r") + """
+                  AND coalesce(r.confidence, 1.0) >= $min_confidence
+                RETURN m.name AS dst, type(r) AS rel, coalesce(r.confidence, 1.0) AS confidence
+                ORDER BY confidence DESC
+                LIMIT $fanout
+            }
+            RETURN n.name AS src, dst, rel, confidence
+            LIMIT $limit
+            """,
+            names=names, fanout=fanout, limit=limit, min_confidence=min_confidence, **scope.cypher_params(),
+        )
+        return await result.data()
 
-        Uses fuzzy case-insensitive CONTAINS matching to find entities even if the
-        extracted name doesn't exactly match what's stored in the graph.
+    async def _load_neighborhood(
+        self, start: str, end: str, max_depth: int, scope: Scope = GLOBAL_SCOPE
+    ) -> Dict[str, List[Neighbor]]:
         """
-        with self.driver.session() as session:
-            # Step 1: Find matching start node (fuzzy)
-            start_result = session.run(
-                """
-                MATCH (n:Entity)
-                WHERE toLower(n.name) CONTAINS toLower($name)
-                   OR toLower($name) CONTAINS toLower(n.name)
-                RETURN n.name AS name LIMIT 1
-                """,
-                name=start_entity
-            ).single()
-
-            # Step 2: Find matching end node (fuzzy)
-            end_result = session.run(
-                """
-                MATCH (n:Entity)
-                WHERE toLower(n.name) CONTAINS toLower($name)
-                   OR toLower($name) CONTAINS toLower(n.name)
-                RETURN n.name AS name LIMIT 1
-                """,
-                name=end_entity
-            ).single()
-
-            if not start_result or not end_result:
-                print(f"⚠️ Pathfinding: One or both nodes not found — '{start_entity}', '{end_entity}'")
-                return None
-
-            start_name = start_result["name"]
-            end_name = end_result["name"]
-
-            if start_name == end_name:
-                return None
-
-            # Step 3: Find all paths up to depth 8, ranked by max confidence product
-            # This selects the most trustworthy reasoning chain (Dijkstra equivalent)
-            result = session.run(
-                """
-                MATCH (start:Entity {name: $start}), (end:Entity {name: $end})
-                MATCH p = (start)-[*1..8]-(end)
-                WITH p,
-                     [r IN relationships(p) | coalesce(r.confidence, 1.0)] AS confidences
-                WITH p,
-                     length(p) AS path_length,
-                     reduce(acc = 1.0, c IN confidences | acc * c) AS path_confidence
-                WHERE path_length > 0
-                ORDER BY path_confidence DESC, path_length ASC
-                LIMIT 1
-                RETURN [n IN nodes(p) | n.name] AS node_names,
-                       path_confidence,
-                       path_length
-                """,
-                start=start_name,
-                end=end_name
-            ).single()
-
-            if not result:
-                print(f"⚠️ No path found between '{start_name}' and '{end_name}'")
-                return None
-
-            node_names: List[str] = result["node_names"]
-            raw_confidence: float = result["path_confidence"]
-            path_length: int = result["path_length"]
+        Bidirectional, layered adjacency snapshot around start and end.
+        Every edge of a path of length <= max_depth touches a node within
+        ceil(max_depth / 2) - 1 hops of one of the endpoints, so expanding each side
+        that many layers (always the smaller frontier first) covers all candidate
+        paths. Loading stops early once EXPANSION_BUDGET edges have been fetched.
+        """
+        adjacency: Dict[str, List[Neighbor]] = {}
+        edges: set = set()
+        expanded: set = set()
+        frontiers = {start: [start], end: [end]}
+        layers = {start: 0, end: 0}
+        max_layers = (max_depth + 1) // 2
+        budget = self.EXPANSION_BUDGET
 
-            # Apply decay for longer paths (penalizes indirect reasoning)
-            decay_factor = max(0.95 - (path_length * 0.05), 0.3)
-            final_confidence = round(raw_confidence * decay_factor, 2)
+        async with self.client.session(read=True) as session:
+            while budget > 0:
+                open_sides = [s for s in frontiers if frontiers[s] and layers[s] < max_layers]
+                if not open_sides:
+                    break
+                side = min(open_sides, key=lambda s: len(frontiers[s]))
+                names = [n for n in frontiers[side] if n not in expanded]
+                expanded.update(names)
+                rows = await session.execute_read(
+                    self._fetch_neighbors, names, self.MAX_FANOUT, budget, scope, self.MIN_CONFIDENCE
+                ) if names else []
+                budget -= len(rows)
+
+                next_frontier = []
+                for row in rows:
+                    src, dst, rel = row["src"], row["dst"], row["rel"]
+                    if not dst or (src, dst, rel) in edges:
+                        continue
+                    # Undirected: record both directions so either side's edges join up
+                    edges.update(((src, dst, rel), (dst, src, rel)))
+                    adjacency.setdefault(src, []).append((dst, rel, row["confidence"]))
+                    adjacency.setdefault(dst, []).append((src, rel, row["confidence"]))
+                    if dst not in expanded:
+                        next_frontier.append(dst)
+                frontiers[side] = list(dict.fromkeys(next_frontier))
+                layers[side] += 1
+
+        if budget <= 0:
+            print(f"⚠️ Pathfinding: expansion budget ({self.EXPANSION_BUDGET} edges) exhausted")
+        return adjacency
+
+    async def find_reasoning_paths(
+        self, start_entity: str, end_entity: str, k: Optional[int] = None, scope: Scope = GLOBAL_SCOPE
+    ) -> List[Dict]:
+        """
+        STEP 6: True weighted pathfinding — the k most confident reasoning chains.
+        Runs a bounded best-first (Dijkstra) search over -log(confidence) edge weights,
+        so the first path found has the highest cumulative confidence; equal-confidence
+        paths are ordered by length. The search runs in-process over an adjacency
+        snapshot of the neighbourhood around both entities, so hub-heavy graphs cost
+        a few layered index lookups instead of enumerating every path in Cypher.
+
+        Entities are resolved through EntityResolver (indexed exact + fuzzy full-text
+        matching), so names are found even if the extracted text doesn't exactly match
+        what's stored in the graph. All queries run as managed read transactions (replica-routable).
+        A scope restricts both resolution and traversal to one corpus / document.
+        """
+        # Step 1-2: Resolve start and end nodes to their best-scoring graph entities
+        resolver = EntityResolver()
+        start_name = await resolver.resolve_best(start_entity, scope)
+        end_name = await resolver.resolve_best(end_entity, scope)
+
+        if not start_name or not end_name:
+            print(f"⚠️ Pathfinding: One or both nodes not found — '{start_entity}', '{end_entity}'")
+            return []
+
+        if start_name == end_name:
+            return []
 
-            print(f"✅ Path Found: {' → '.join(node_names)} (confidence: {final_confidence})")
+        # Step 3: Search the in-process graph snapshot when it is loaded; otherwise load
+        #         the bounded neighbourhood from Neo4j first (the snapshot is unscoped)
+        if GraphSnapshot.ready() and scope.is_global:
+            neighbors = lambda name: GraphSnapshot.neighbors(name, self.MAX_FANOUT)
+        else:
+            adjacency = await self._load_neighborhood(start_name, end_name, self.MAX_DEPTH, scope)
+            neighbors = lambda name: adjacency.get(name, ())
+        found = best_paths(
+            start_name, end_name,
+            neighbors=neighbors,
+            k=max(k or self.TOP_K, 1),
+            max_depth=self.MAX_DEPTH,
+            max_expansions=self.SEARCH_BUDGET,
+            min_confidence=self.MIN_CONFIDENCE,
+        )
 
-            return {
-                "nodes": node_names,
+        if not found:
+            print(f"⚠️ No path found between '{start_name}' and '{end_name}'")
+            return []
+
+        paths = []
+        for path in found:
+            path_length = path["path_length"]
+            # Apply decay for longer paths (penalizes indirect reasoning)
+            decay_factor = max(0.95 - (path_length * 0.05), 0.3)
+            final_confidence = round(path["confidence"] * decay_factor, 2)
+            paths.append({
+                "nodes": path["nodes"],
+                "relations": path["relations"],
                 "confidence": final_confidence,
                 "path_length": path_length,
                 "type": "Golden Beam" if final_confidence >= 0.7 else "Weak Signal"
-            }
+            })
+
+        print(f"✅ Path Found: {' → '.join(paths[0]['nodes'])} (confidence: {paths[0]['confidence']})")
+        return paths
+
+    async def find_reasoning_path(
+        self, start_entity: str, end_entity: str, scope: Scope = GLOBAL_SCOPE
+    ) -> Optional[Dict]:
+        """
+        The single most confident path between two entities, with the runners-up
+        (top-k, PATH_TOP_K) attached as `alternatives`.
+        """
+        paths = await self.find_reasoning_paths(start_entity, end_entity, scope=scope)
+        if not paths:
+            return None
+        return {**paths[0], "alternatives": paths[1:]}
@@ -1,66 +1,151 @@
 import pypdf
 import re
+import asyncio
 import os
+import hashlib
 import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 from fastapi import UploadFile, HTTPException
 
 
+# Header/footer artifacts, compiled once instead of on every page
+PAGE_OF_PATTERN = re.compile(r'Page \d+ of \d+')
+PAGE_NUMBER_PATTERN = re.compile(r'^\s*\d+\s*$', flags=re.MULTILINE)
+
+
+def _clean_page_text(text: str) -> str:
+    # 1. Remove "Page N of M" patterns and trailing page numbers
+    text = PAGE_OF_PATTERN.sub('', text)
+    text = PAGE_NUMBER_PATTERN.sub('', text)
+
+    # 2. Strip short lines (likely headers/footers/artifacts)
+    return "\n".join(line for line in text.split('\n') if len(line.strip()) > 5)
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Process-pool worker: parses and cleans pages [start, stop) of the PDF at `path`."""
+    reader = pypdf.PdfReader(path)
+    return [_clean_page_text(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
 class PDFEngine:
+    # Spool uploads to disk in blocks of this size (never hold the whole file in memory)
+    UPLOAD_BLOCK_SIZE = 1024 * 1024
+    # Documents with at least this many pages are parsed on the process pool
+    PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "50"))
+    PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", str(min(os.cpu_count() or 1, 4))))
+    # Pages handed to one worker task
+    PAGES_PER_TASK = 16
+
+    _pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(max_workers=max(cls.PARALLEL_WORKERS, 1))
+        return cls._pool
+
+    @classmethod
+    def shutdown_pool(cls):
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
+
     @staticmethod
-    async def extract_text(file: UploadFile) -> str:
+    async def spool_upload(file: UploadFile, max_bytes: Optional[int] = None) -> Tuple[str, str]:
         """
-        Extracts and cleans text from an uploaded PDF.
-        Uses a proper NamedTemporaryFile to prevent race conditions on concurrent uploads.
+        Streams an upload into a NamedTemporaryFile block by block.
+        Returns (path, sha256 of the file bytes). The caller owns the file and must
+        remove it. Raises 413 past `max_bytes`.
         """
-        tmp = None
+        # STEP 2 FIX: Use tempfile.NamedTemporaryFile instead of raw open()
+        # This guarantees unique filenames under concurrent uploads and OS-managed cleanup.
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+        size = 0
+        digest = hashlib.sha256()
         try:
-            content = await file.read()
+            with tmp:
+                while block := await file.read(PDFEngine.UPLOAD_BLOCK_SIZE):
+                    size += len(block)
+                    if max_bytes is not None and size > max_bytes:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"PDF exceeds the {max_bytes // (1024 * 1024)} MB upload limit."
+                        )
+                    digest.update(block)
+                    await asyncio.to_thread(tmp.write, block)
+            if size == 0:
+                raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+            return tmp.name, digest.hexdigest()
+        except BaseException:
+            os.remove(tmp.name)
+            raise
 
-            # STEP 2 FIX: Use tempfile.NamedTemporaryFile instead of raw open()
-            # This guarantees unique filenames under concurrent uploads and OS-managed cleanup.
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(content)
-                tmp_path = tmp.name
+    @staticmethod
+    def iter_pages(path: str) -> Iterator[str]:
+        """
+        Yields the cleaned text of each page in order (blocking — call off the event loop).
+        Large documents are parsed on the process pool with a bounded window of
+        in-flight page ranges, so memory stays flat regardless of page count.
+        """
+        try:
+            reader = pypdf.PdfReader(path)
+            page_count = len(reader.pages)
 
-            reader = pypdf.PdfReader(tmp_path)
-            full_text = ""
+            if page_count < PDFEngine.PARALLEL_PAGE_THRESHOLD:
+                for page in reader.pages:
+                    yield _clean_page_text(page.extract_text() or "")
+                return
 
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    # 1. Remove "Page N of M" patterns and trailing page numbers
-                    text = re.sub(r'Page \d+ of \d+', '', text)
-                    text = re.sub(r'^\s*\d+\s*$', '', text, flags=re.MULTILINE)
+            del reader  # Each worker opens its own reader
+            pool = PDFEngine._get_pool()
+            ranges = iter(range(0, page_count, PDFEngine.PAGES_PER_TASK))
+            window: deque = deque()
 
-                    # 2. Strip short lines (likely headers/footers/artifacts)
-                    lines = text.split('\n')
-                    cleaned_lines = [line for line in lines if len(line.strip()) > 5]
-                    full_text += "\n".join(cleaned_lines) + "\n"
+            def _submit_next() -> bool:
+                start = next(ranges, None)
+                if start is None:
+                    return False
+                stop = min(start + PDFEngine.PAGES_PER_TASK, page_count)
+                window.append(pool.submit(_extract_page_range, path, start, stop))
+                return True
 
-            return full_text.strip()
+            for _ in range(max(PDFEngine.PARALLEL_WORKERS, 1) * 2):
+                if not _submit_next():
+                    break
+            while window:
+                pages = window.popleft().result()
+                _submit_next()
+                yield from pages
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"PDF Extraction Failed: {str(e)}")
-        finally:
-            # Always clean up the temp file, even if an exception occurred
-            if tmp and os.path.exists(tmp.name):
-                os.remove(tmp.name)
 
     @staticmethod
-    def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+    async def stream_pages(path: str) -> AsyncIterator[str]:
+        """Async page stream: each page is parsed in a worker thread, never on the event loop."""
+        pages = PDFEngine.iter_pages(path)
+        while (page := await asyncio.to_thread(next, pages, None)) is not None:
+            yield page
+
+    @staticmethod
+    async def extract_text(file: UploadFile) -> str:
         """
-        Splits text into sliding window chunks for better RAG context.
-        chunk_size=1000 chars, overlap=200 chars ensures no context loss at boundaries.
+        Extracts and cleans text from an uploaded PDF.
+        Parsing runs in worker threads/processes so the event loop stays responsive.
         """
-        chunks = []
-        start = 0
-        text_len = len(text)
-
-        while start < text_len:
-            end = start + chunk_size
-            chunk = text[start:end]
-            if chunk.strip():  # Skip empty chunks
-                chunks.append(chunk)
-            start += chunk_size - overlap  # Sliding window
-
-        return chunks
+        path, _ = await PDFEngine.spool_upload(file)
+        try:
+            return await asyncio.to_thread(PDFEngine.extract_text_from_file, path)
+        finally:
+            # Always clean up the temp file, even if an exception occurred
+            os.remove(path)
+
+    @staticmethod
+    def extract_text_from_file(path: str) -> str:
+        """Whole-document text (blocking). Joined once rather than built with repeated +=."""
+        return "\n".join(page for page in PDFEngine.iter_pages(path) if page).strip()
@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from app.services.embedding_service import EmbeddingService
+
+# Trailing punctuation and whitespace never change the answer
+TRAILING_PUNCTUATION = re.compile(r'[\s?!.]+$')
+
+
+class QueryCache:
+    """
+    In-process result cache in front of the /reason pipeline.
+
+    A query hits when its normalized text matches a cached one exactly, or when its
+    embedding is at least SIMILARITY (cosine) to a cached query with the same scope.
+    Entries are bound to the data version they were computed at (graph version +
+    vector-store version); the first lookup after any ingest or deletion sees a new
+    version and drops the whole cache. Eviction is LRU under a MAX_MB memory cap.
+    """
+    _instance = None
+
+    ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+    MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "64"))
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super(QueryCache, cls).__new__(cls)
+            # (scope key, normalized query) -> {"response", "vector", "bytes"}
+            instance._entries = OrderedDict()
+            instance._bytes = 0
+            instance._version = None
+            # Stacked unit vectors for similarity lookups, rebuilt lazily after changes
+            instance._matrix = None
+            instance._matrix_keys = []
+            instance.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+            cls._instance = instance
+        return cls._instance
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return TRAILING_PUNCTUATION.sub("", " ".join(query.lower().split()))
+
+    @staticmethod
+    async def data_version() -> str:
+        """Current graph + vector data version; any ingest or deletion changes it."""
+        from app.services.graph_service import GraphService
+        from app.services.vector_service import VectorService
+        graph_version, vector_version = await asyncio.gather(
+            GraphService().get_data_version(),
+            asyncio.to_thread(VectorService.data_version),
+        )
+        return f"g{graph_version}:v{vector_version}"
+
+    def _sync(self, version: str):
+        if version != self._version:
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self._matrix_keys = []
+            self._version = version
+
+    @staticmethod
+    async def _embed(query: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await EmbeddingService.embed_query(query), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ Query cache: embedding unavailable ({e}). Exact matches only.")
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _nearest(self, scope_key: str, vector: np.ndarray) -> Tuple[Optional[Tuple[str, str]], float]:
+        if self._matrix is None:
+            self._matrix_keys = [k for k, e in self._entries.items() if e["vector"] is not None]
+            self._matrix = (
+                np.stack([self._entries[k]["vector"] for k in self._matrix_keys])
+                if self._matrix_keys else np.zeros((0, len(vector)), dtype=np.float32)
+            )
+        if not len(self._matrix_keys):
+            return None, 0.0
+        similarities = self._matrix @ vector
+        best_key, best = None, -1.0
+        for i in np.argsort(-similarities):
+            key = self._matrix_keys[i]
+            if key[0] == scope_key:
+                best_key, best = key, float(similarities[i])
+                break
+        return best_key, best
+
+    async def lookup(
+        self, query: str, scope_key: str, version: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Returns (response or None, query vector). The response carries a `cache`
+        block describing the match; the vector is handed back to put() on a miss.
+        """
+        self._sync(version)
+        key = (scope_key, self.normalize(query))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.counters["exact_hits"] += 1
+            return {**entry["response"], "cache": {"hit": "exact"}}, entry["vector"]
+
+        vector = await self._embed(query)
+        # The cache may have been invalidated or refilled while embedding
+        if vector is not None and self._version == version and self._entries:
+            best_key, similarity = self._nearest(scope_key, vector)
+            if best_key is not None and similarity >= self.SIMILARITY:
+                self._entries.move_to_end(best_key)
+                self.counters["semantic_hits"] += 1
+                return {
+                    **self._entries[best_key]["response"],
+                    "cache": {"hit": "semantic", "similarity": round(similarity, 4)},
+                }, vector
+        self.counters["misses"] += 1
+        return None, vector
+
+    def put(self, query: str, scope_key: str, version: str, response: Dict[str, Any], vector: Optional[np.ndarray]):
+        """Caches a response computed at `version` (dropped if the data moved on meanwhile)."""
+        if version != self._version:
+            return
+        key = (scope_key, self.normalize(query))
+        size = len(json.dumps(response, default=str)) + (vector.nbytes if vector is not None else 0) + 256
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous["bytes"]
+        self._entries[key] = {"response": response, "vector": vector, "bytes": size}
+        self._bytes += size
+        while self._bytes > self.MAX_MB * 1024 * 1024 and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted["bytes"]
+        self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sum(self.counters[k] for k in ("exact_hits", "semantic_hits", "misses"))
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "memory_mb": round(self._bytes / 1024 / 1024, 2),
+            "version": self._version,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,73 @@
+import os
+import asyncio
+import threading
+from typing import Any, Dict, List
+
+
+class Reranker:
+    """
+    Optional CPU cross-encoder reranker for retrieval candidates (RERANK_MODEL,
+    e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty disables it).
+    Scoring runs in a worker thread under a latency budget: if it does not finish
+    within RERANK_BUDGET_MS the candidates keep their fused order.
+    """
+
+    MODEL_NAME = os.getenv("RERANK_MODEL", "")
+    BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    # Only the top candidates are scored; the rest keep their order behind them
+    CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "10"))
+
+    _model = None
+    _model_lock = threading.Lock()
+    counters = {"reranked": 0, "timeouts": 0, "errors": 0}
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return bool(cls.MODEL_NAME)
+
+    @classmethod
+    def model(cls):
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    from sentence_transformers import CrossEncoder
+                    cls._model = CrossEncoder(cls.MODEL_NAME)
+                    print(f"🎯 Reranker loaded: {cls.MODEL_NAME}")
+        return cls._model
+
+    @classmethod
+    async def startup(cls):
+        if not cls.enabled():
+            return
+        try:
+            await asyncio.to_thread(cls.model)
+        except Exception as e:
+            print(f"⚠️ Reranker unavailable ({e}). Using fused retrieval order.")
+            cls.MODEL_NAME = ""
+
+    @classmethod
+    def _score(cls, query: str, texts: List[str]) -> List[float]:
+        return [float(s) for s in cls.model().predict([(query, t) for t in texts])]
+
+    @classmethod
+    async def rerank(cls, query: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Reorders the top CANDIDATES records by cross-encoder score (within budget)."""
+        # Never pay a model load inside a request; startup() loads it
+        if not cls.enabled() or cls._model is None or len(records) < 2:
+            return records
+        head, tail = records[:cls.CANDIDATES], records[cls.CANDIDATES:]
+        try:
+            scores = await asyncio.wait_for(
+                asyncio.to_thread(cls._score, query, [r["text"] for r in head]),
+                timeout=cls.BUDGET_MS / 1000,
+            )
+        except asyncio.TimeoutError:
+            cls.counters["timeouts"] += 1
+            return records
+        except Exception as e:
+            cls.counters["errors"] += 1
+            print(f"⚠️ Rerank failed: {e}")
+            return records
+        cls.counters["reranked"] += 1
+        ranked = sorted(zip(scores, range(len(head))), key=lambda p: p[0], reverse=True)
+        return [{**head[i], "rerank_score": round(s, 4)} for s, i in ranked] + tail
@@ -1,43 +1,349 @@
+import os
+import asyncio
+import threading
+import numpy as np
 from app.db.chroma_client import ChromaClient
-from chromadb.utils import embedding_functions
-import uuid
+from app.db.document_registry import DocumentRegistry
+from app.db.keyword_index import KeywordIndex
+from app.services.corpus import DEFAULT_CORPUS, Scope, chunk_key
+from app.services.embedding_service import EmbeddingService
+from app.services.reranker import Reranker
+from typing import Any, Dict, List, Optional, Tuple
+
+# Reciprocal rank fusion constant (Cormack et al. use 60)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(*rankings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fuses ranked record lists by id: score = sum of 1 / (RRF_K + rank)."""
+    scores: Dict[str, float] = {}
+    records: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, record in enumerate(ranking, start=1):
+            scores[record["id"]] = scores.get(record["id"], 0.0) + 1.0 / (RRF_K + rank)
+            records.setdefault(record["id"], record)
+    fused = sorted(records.values(), key=lambda r: scores[r["id"]], reverse=True)
+    return [{**r, "fusion_score": round(scores[r["id"]], 6)} for r in fused]
+
+
+def collapse_neighbors(records: List[Dict[str, Any]], window: int = 1) -> List[Dict[str, Any]]:
+    """
+    Drops chunks within `window` positions of a better-ranked chunk from the same
+    document. Consecutive chunks share overlap sentences, so they mostly repeat each other.
+    Documents are told apart by doc_id (the same filename can live in several corpora);
+    chunks stored before corpora existed only carry their source.
+    """
+    kept: List[Dict[str, Any]] = []
+    taken: Dict[Any, List[int]] = {}
+    for record in records:
+        index = record.get("chunk_index")
+        source = record.get("doc_id") or record.get("source")
+        if index is not None and any(abs(index - i) <= window for i in taken.get(source, ())):
+            continue
+        kept.append(record)
+        if index is not None:
+            taken.setdefault(source, []).append(index)
+    return kept
+
 
 class VectorService:
+    COLLECTION_NAME = "aurelius_knowledge"
+    # Dense + keyword fusion (set false for dense-only retrieval)
+    HYBRID_ENABLED = os.getenv("RETRIEVAL_HYBRID_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Candidates fetched from each retriever before fusion
+    CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+    # Registry meta counter bumped by every chunk write / delete
+    VERSION_KEY = "vector_version"
+
+    # Process-wide collection handle (one get_or_create round trip per process)
+    _collection = None
+    _collection_lock = threading.Lock()
+
     def __init__(self):
         self.client = ChromaClient().get_client()
-        # Use a high-quality local embedding model
-        self.ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-        self.collection = self.client.get_or_create_collection(
-            name="aurelius_knowledge", 
-            embedding_function=self.ef
-        )
+        # Shared local embedding model (all-MiniLM-L6-v2), loaded once per process
+        self.ef = EmbeddingService.embedding_function()
+        self.collection = self._get_collection(self.client, self.ef)
+
+    @classmethod
+    def _get_collection(cls, client, ef):
+        if cls._collection is None:
+            with cls._collection_lock:
+                if cls._collection is None:
+                    cls._collection = client.get_or_create_collection(
+                        name=cls.COLLECTION_NAME,
+                        embedding_function=ef
+                    )
+        return cls._collection
 
-    def upsert_chunks(self, chunks: list[str], source_file: str):
+    def upsert_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        source_file: str,
+        corpus: str = DEFAULT_CORPUS,
+        doc_id: Optional[str] = None,
+    ):
         """
-        Embeds and stores text chunks.
+        Embeds and stores chunk records from TextChunker.
+        Ids are the chunk content hashes (namespaced per corpus), so re-upserting the
+        same text never duplicates it. Page span and character offsets are kept as
+        metadata for citations; corpus and doc_id as metadata for scoped retrieval.
+        Raises when a store rejects the write, so the caller does not record the chunks
+        as embedded.
         """
         if not chunks:
             return
 
-        ids = [f"{source_file}_{i}_{uuid.uuid4().hex[:8]}" for i in range(len(chunks))]
-        metadatas = [{"source": source_file, "chunk_index": i} for i in range(len(chunks))]
-        
+        ids = [chunk_key(corpus, c["hash"]) for c in chunks]
+        metadatas = [
+            {
+                "source": source_file,
+                "corpus": corpus,
+                "doc_id": doc_id or source_file,
+                "chunk_index": c["index"],
+                "page_start": c["page_start"],
+                "page_end": c["page_end"],
+                "char_start": c["char_start"],
+                "char_end": c["char_end"],
+            }
+            for c in chunks
+        ]
+
         try:
             self.collection.upsert(
-                documents=chunks,
+                documents=[c["text"] for c in chunks],
                 ids=ids,
                 metadatas=metadatas
             )
             print(f"🧠 Vector Memory: Stored {len(chunks)} chunks from {source_file}")
         except Exception as e:
             print(f"❌ Vector Upsert Failed: {e}")
+            raise
 
-    def query_similar(self, query_text: str, n_results: int = 5):
+        try:
+            # Same records into the local BM25 index (keyed by the same hash ids)
+            KeywordIndex().add([
+                {"hash": h, "text": c["text"], **m} for h, c, m in zip(ids, chunks, metadatas)
+            ])
+        except Exception as e:
+            print(f"❌ Keyword Index Update Failed: {e}")
+            raise
+        finally:
+            # Retrieval results may have changed (result caches compare this counter)
+            DocumentRegistry().increment_meta(self.VERSION_KEY)
+
+    def delete_chunks(self, keys: List[str], batch_size: int = 500):
+        """Removes chunks by storage key from Chroma and the keyword index."""
+        for i in range(0, len(keys), batch_size):
+            self.collection.delete(ids=keys[i:i + batch_size])
+        KeywordIndex().delete(keys)
+        if keys:
+            DocumentRegistry().increment_meta(self.VERSION_KEY)
+
+    def relabel_chunks(self, owners: Dict[str, Dict[str, str]], previous_doc_id: str, batch_size: int = 500):
         """
-        Retrieves the most relevant text chunks for a question.
+        Attributes shared chunks still labelled with `previous_doc_id` (deleted, or no
+        longer containing them) to another document that contains them ({"doc_id",
+        "source"} per key), so citations never name a document that is gone.
+        """
+        keys = list(owners)
+        for i in range(0, len(keys), batch_size):
+            page = self.collection.get(ids=keys[i:i + batch_size], include=["metadatas"])
+            stale = [(k, m) for k, m in zip(page["ids"], page["metadatas"]) if (m or {}).get("doc_id") == previous_doc_id]
+            if stale:
+                self.collection.update(ids=[k for k, _ in stale], metadatas=[{**m, **owners[k]} for k, m in stale])
+        KeywordIndex().relabel(owners, previous_doc_id)
+        if keys:
+            DocumentRegistry().increment_meta(self.VERSION_KEY)
+
+    @classmethod
+    def data_version(cls) -> int:
+        """Counter bumped by every chunk write or delete (no Chroma client needed)."""
+        return int(DocumentRegistry().get_meta(cls.VERSION_KEY) or 0)
+
+    @staticmethod
+    def _document_chunks(scope: Scope) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        The registry entry and chunk keys of the scoped document. Document scopes are
+        resolved through the registry, not chunk metadata: text shared by several
+        documents is stored once, and its metadata names only one of them.
+        """
+        registry = DocumentRegistry()
+        document = registry.get_document(scope.doc_id)
+        if document is None or (scope.corpus is not None and document["corpus"] != scope.corpus):
+            return None, []
+        return document, list(dict.fromkeys(registry.get_document_chunks(scope.doc_id)))
+
+    @staticmethod
+    def _attribute(records: List[Dict[str, Any]], document: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cites the scoped document, whichever document first stored a shared chunk."""
+        return [{**r, "doc_id": document["doc_id"], "source": document["source"]} for r in records]
+
+    def _search_document(self, embedding: List[float], n_results: int, scope: Scope) -> List[Dict[str, Any]]:
+        """Exact dense search over the chunks of one document (blocking)."""
+        document, keys = self._document_chunks(scope)
+        if not keys:
+            return []
+        page = self.collection.get(ids=keys, include=["embeddings", "documents", "metadatas"])
+        if not len(page["ids"]):
+            return []
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = vectors @ query / np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-9)
+        records = [
+            {"id": page["ids"][i], "text": page["documents"][i], **(page["metadatas"][i] or {})}
+            for i in np.argsort(-scores)[:n_results]
+        ]
+        return self._attribute(records, document)
+
+    def _search_keywords(self, query_text: str, n_results: int, scope: Optional[Scope]) -> List[Dict[str, Any]]:
+        """BM25 search (blocking); a document scope is resolved to its chunk keys like _search_document."""
+        if scope is None or scope.doc_id is None:
+            return KeywordIndex().search(query_text, n_results, scope)
+        document, keys = self._document_chunks(scope)
+        if not keys:
+            return []
+        return self._attribute(KeywordIndex().search(query_text, n_results, Scope(corpus=scope.corpus), keys), document)
+
+    def count_chunks(self, scope: Scope) -> int:
+        """Number of stored chunks within `scope` (ids only, nothing embedded)."""
+        if scope.doc_id is not None:
+            return len(self._document_chunks(scope)[1])
+        where = scope.chroma_where()
+        if where is None:
+            return self.collection.count()
+        return len(self.collection.get(where=where, include=[])["ids"])
+
+    def migrate_corpus_metadata(self, page_size: int = 1000):
         """
+        One-off: tags chunks stored before corpora existed with the default corpus
+        (and their source as doc_id), so corpus filters see them. Blocking.
+        """
+        registry = DocumentRegistry()
+        if registry.get_meta("chroma_corpus_metadata") == "1":
+            return
+        offset = 0
+        updated = 0
+        while True:
+            page = self.collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            stale = [(i, m or {}) for i, m in zip(page["ids"], page["metadatas"]) if not (m or {}).get("corpus")]
+            if stale:
+                self.collection.update(
+                    ids=[i for i, _ in stale],
+                    metadatas=[
+                        {**m, "corpus": DEFAULT_CORPUS, "doc_id": m.get("doc_id") or m.get("source", "unknown")}
+                        for _, m in stale
+                    ],
+                )
+                updated += len(stale)
+            offset += len(page["ids"])
+        registry.set_meta("chroma_corpus_metadata", "1")
+        if updated:
+            print(f"🏷️ Tagged {updated} pre-corpus chunks with corpus '{DEFAULT_CORPUS}'")
+
+    def backfill_keyword_index(self, page_size: int = 1000):
+        """Indexes chunks stored in Chroma before the keyword index existed (one-off, blocking)."""
+        index = KeywordIndex()
+        if index.count() or not self.collection.count():
+            return
+        offset = 0
+        while True:
+            page = self.collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            index.add([
+                {"hash": i, "text": doc, **(meta or {})}
+                for i, doc, meta in zip(page["ids"], page["documents"], page["metadatas"])
+            ])
+            offset += len(page["ids"])
+        print(f"🔎 Keyword index backfilled with {index.count()} chunks")
+
+    def query_similar_records(
+        self, query_text: str, n_results: int = 5, scope: Optional[Scope] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves the most relevant chunks with their source attribution
+        ({"text", "source", "page_start", "page_end", ...}), optionally within a corpus / document.
+        """
+        if scope is not None and scope.doc_id is not None:
+            return self._search_document(self.ef([query_text])[0], n_results, scope)
         results = self.collection.query(
             query_texts=[query_text],
-            n_results=n_results
+            n_results=n_results,
+            where=scope.chroma_where() if scope else None,
+            include=["documents", "metadatas"],
+        )
+        return self._to_records(results)
+
+    async def query_similar_records_async(
+        self, query_text: str, n_results: int = 5, scope: Optional[Scope] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Same as query_similar_records, for the event loop: the query vector comes from
+        the shared micro-batched, cached embedder and the Chroma call runs in a worker thread.
+        """
+        embedding = await EmbeddingService.embed_query(query_text)
+        if scope is not None and scope.doc_id is not None:
+            return await asyncio.to_thread(self._search_document, embedding, n_results, scope)
+        results = await asyncio.to_thread(
+            self.collection.query,
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=scope.chroma_where() if scope else None,
+            include=["documents", "metadatas"],
         )
-        return results['documents'][0] if results['documents'] else []
+        return self._to_records(results)
+
+    async def hybrid_search(
+        self, query_text: str, n_results: int = 3, scope: Optional[Scope] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Hybrid retrieval: dense Chroma search and local BM25 run concurrently, their
+        rankings are fused with reciprocal rank fusion, overlapping neighbour chunks are
+        collapsed, and the survivors are optionally reranked by a cross-encoder
+        (within its latency budget). Returns the top n_results records.
+        A scope filter is pushed down into both retrievers (a document scope as the
+        document's chunk keys from the registry).
+        """
+        if not self.HYBRID_ENABLED:
+            return await self.query_similar_records_async(query_text, n_results, scope)
+
+        dense, keyword = await asyncio.gather(
+            self.query_similar_records_async(query_text, self.CANDIDATES, scope),
+            asyncio.to_thread(self._search_keywords, query_text, self.CANDIDATES, scope),
+            return_exceptions=True,
+        )
+        rankings = []
+        for name, ranking in (("Dense", dense), ("Keyword", keyword)):
+            if isinstance(ranking, Exception):
+                print(f"⚠️ {name} retrieval failed: {ranking}")
+            else:
+                rankings.append(ranking)
+        if not rankings:
+            raise dense if isinstance(dense, Exception) else keyword
+
+        candidates = collapse_neighbors(reciprocal_rank_fusion(*rankings))
+        return (await Reranker.rerank(query_text, candidates))[:n_results]
+
+    @staticmethod
+    def _to_records(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not results['documents']:
+            return []
+        ids = (results.get('ids') or [[]])[0] or []
+        metadatas = (results.get('metadatas') or [[]])[0] or []
+        return [
+            {
+                "id": ids[i] if i < len(ids) else None,
+                "text": doc,
+                **(metadatas[i] if i < len(metadatas) and metadatas[i] else {}),
+            }
+            for i, doc in enumerate(results['documents'][0])
+        ]
+
+    def query_similar(self, query_text: str, n_results: int = 5):
+        """
+        Retrieves the most relevant text chunks for a question.
+        """
+        return [r["text"] for r in self.query_similar_records(query_text, n_results)]
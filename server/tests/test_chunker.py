@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.services.chunker import TextChunker
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One token per word, so the tests do not need the embedding model's tokenizer."""
+    monkeypatch.setattr(TextChunker, "_token_counter", staticmethod(lambda text: len(text.split())))
+
+
+def chunk(pages, **kwargs):
+    async def stream():
+        for page in pages:
+            yield page
+
+    async def collect():
+        return [c async for c in TextChunker(**kwargs).chunk_pages(stream())]
+
+    return asyncio.run(collect())
+
+
+def test_chunks_hold_whole_sentences_under_the_budget():
+    sentences = [f"Sentence number {i} has six words." for i in range(10)]
+    chunks = chunk([" ".join(sentences)], max_tokens=16, overlap_sentences=0)
+
+    assert [c["tokens"] for c in chunks] == [12] * 5
+    assert all(c["text"].endswith("words.") for c in chunks)
+    assert [c["index"] for c in chunks] == list(range(5))
+
+
+def test_budget_leaves_room_for_the_embedders_special_tokens():
+    sentences = [f"Sentence {i} has exactly eight words in it." for i in range(4)]
+    chunks = chunk([" ".join(sentences)], max_tokens=16, overlap_sentences=0)
+
+    # Two sentences are 16 tokens of text, which [CLS] and [SEP] would push past the limit
+    assert [c["tokens"] for c in chunks] == [8] * 4
+
+
+def test_overlap_repeats_the_last_sentence():
+    sentences = [f"Sentence number {i} has six words." for i in range(4)]
+    chunks = chunk([" ".join(sentences)], max_tokens=16, overlap_sentences=1)
+
+    assert chunks[1]["text"].startswith("Sentence number 1")
+
+
+def test_page_spans_offsets_and_content_hashes():
+    chunks = chunk(["First page sentence here.", "", "Second page sentence here."], max_tokens=16)
+
+    assert len(chunks) == 1
+    assert (chunks[0]["page_start"], chunks[0]["page_end"]) == (1, 3)
+    assert chunks[0]["char_start"] == 0
+    assert chunk(["First page sentence here."])[0]["hash"] != chunks[0]["hash"]
+    assert chunk(["Same text."])[0]["hash"] == chunk(["Same text."])[0]["hash"]
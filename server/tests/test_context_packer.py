@@ -0,0 +1,40 @@
+from app.services.context_packer import EVIDENCE_SEPARATOR, ContextPacker
+
+
+def test_format_path_labels_edges_and_falls_back_to_arrows():
+    assert ContextPacker.format_path(["A", "B", "C"], ["IMPROVED", "MEASURED_BY"]) == "A -[IMPROVED]- B -[MEASURED_BY]- C"
+    assert ContextPacker.format_path(["A", "B"]) == "A → B"
+
+
+def test_fit_path_drops_trailing_nodes():
+    nodes = [f"Entity Number {i}" for i in range(20)]
+    text = ContextPacker.fit_path(nodes, ["RELATED_TO"] * 19, 30)
+    assert ContextPacker.count_tokens(text) <= 30
+    assert text.startswith("Entity Number 0") and text.endswith("more)")
+
+
+def test_truncate_respects_the_budget():
+    text = "word " * 500
+    assert ContextPacker.truncate("short", 10) == "short"
+    cut = ContextPacker.truncate(text, 50)
+    assert ContextPacker.count_tokens(cut) <= 50 and cut.endswith("…")
+
+
+def test_fair_shares_cap_only_the_largest_passages():
+    assert ContextPacker._fair_shares([10, 20, 300], 130) == [10, 20, 100]
+    assert ContextPacker._fair_shares([10, 20], 100) == [10, 20]
+
+
+def test_pack_evidence_keeps_on_topic_sentences_within_budget():
+    long_passage = " ".join(f"Filler sentence number {i} about nothing." for i in range(80))
+    long_passage += " The transformer uses attention to improve translation."
+    short_passage = "Attention heads specialise in syntax and coreference across long documents."
+    budget = 200
+
+    packed = ContextPacker.pack_evidence([long_passage, short_passage], "transformer attention", budget)
+
+    separators = ContextPacker.count_tokens(EVIDENCE_SEPARATOR) * len(packed)
+    assert sum(ContextPacker.count_tokens(p) for p in packed) + separators <= budget
+    assert "The transformer uses attention to improve translation." in packed[0]
+    # The short passage ranked below is not crowded out by the long one
+    assert packed[1] == short_passage
@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from app.db.document_registry import DocumentRegistry
+from app.services import graph_service, vector_service
+from app.services.chunker import TextChunker
+from app.services.corpus import chunk_key
+from app.services.ingest_service import IngestJob, IngestService
+from app.services.llm_engine import LLMEngine
+from app.services.pdf_engine import PDFEngine
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A fresh registry singleton backed by a temp AURELIUS_DATA_DIR."""
+    monkeypatch.setenv("AURELIUS_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(DocumentRegistry, "_instance", None)
+    instance = DocumentRegistry()
+    yield instance
+    instance._conn.close()
+
+
+def test_reregistering_returns_and_marks_the_chunks_it_dropped(registry):
+    registry.register_document("a.pdf", "a.pdf", "h1", ["k1", "k2"])
+    registry.mark_chunks(["k1", "k2"], "embedded")
+
+    stale = registry.register_document("a.pdf", "a.pdf", "h2", ["k2", "k3"])
+
+    assert stale == ["k1"]
+    assert registry.pending_gc()["chunks"] == ["k1"]
+    assert registry.get_document_chunks("a.pdf") == ["k2", "k3"]
+    # A dropped chunk forgets its processing state, so re-ingesting its text embeds it again
+    assert registry.known_chunks(["k1", "k2"], "embedded") == {"k2"}
+
+
+def test_file_hash_lookup_is_per_corpus(registry):
+    registry.register_document("a.pdf", "a.pdf", "h1", ["k1"])
+    registry.register_document("papers/b.pdf", "b.pdf", "", ["papers:k2"], corpus="papers")
+
+    assert registry.find_document_by_hash("h1")["doc_id"] == "a.pdf"
+    assert registry.find_document_by_hash("h1", "papers") is None
+
+
+# ─────────────────────────────────────────────────────────
+# IngestService.run against in-memory stand-ins for the stores and the LLM
+# ─────────────────────────────────────────────────────────
+
+SENTENCES = ["Alpha binds beta in the first test sentence.", "Gamma inhibits delta in the second test sentence."]
+
+
+class FakeVectorService:
+    fail = False
+
+    def upsert_chunks(self, chunks, filename, corpus, doc_id):
+        if self.fail:
+            raise RuntimeError("chroma unavailable")
+
+    def delete_chunks(self, chunk_keys):
+        if self.fail:
+            raise RuntimeError("chroma unavailable")
+
+    def relabel_chunks(self, owners, previous_doc_id):
+        pass
+
+
+class FakeGraphService:
+    async def upsert_triplets(self, triplets, corpus, doc_id):
+        return {"triplets": len(triplets)}
+
+    async def share_chunks(self, chunk_keys, corpus, doc_id):
+        return {}
+
+    async def retract_chunks(self, chunk_keys, doc_id=None):
+        return {}
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    """Installs the store stand-ins; set FakeVectorService.fail to make Chroma fail."""
+    monkeypatch.setattr(vector_service, "VectorService", FakeVectorService)
+    monkeypatch.setattr(graph_service, "GraphService", FakeGraphService)
+    monkeypatch.setattr(FakeVectorService, "fail", False)
+
+
+@pytest.fixture
+def pipeline(registry, stores, monkeypatch):
+    """Two one-sentence chunks per upload; `answers` holds the next extraction results (None = failed)."""
+    async def pages(path):
+        yield " ".join(SENTENCES)
+
+    answers = []
+    requested = []
+
+    async def extract_many(texts, concurrency, on_chunk_done):
+        requested.append(list(texts))
+        results = [answers.pop(0) for _ in texts]
+        for result in results:
+            on_chunk_done(result or [])
+        return results
+
+    monkeypatch.setattr(PDFEngine, "stream_pages", staticmethod(pages))
+    monkeypatch.setattr(TextChunker, "_token_counter", staticmethod(lambda text: len(text.split())))
+    monkeypatch.setattr(TextChunker, "MAX_TOKENS", 12)
+    monkeypatch.setattr(TextChunker, "OVERLAP_SENTENCES", 0)
+    monkeypatch.setattr(LLMEngine, "extract_triplets_many", staticmethod(extract_many))
+
+    def run(answers_next):
+        answers[:] = answers_next
+        job = IngestJob(filename="paper.pdf", pdf_path="unused", file_hash="h1")
+        return asyncio.run(IngestService.run(job))
+
+    run.requested = requested
+    return run
+
+
+def sentence_keys():
+    return [chunk_key("default", hashlib.sha256(s.encode("utf-8")).hexdigest()) for s in SENTENCES]
+
+
+def test_chunks_are_only_marked_extracted_once_extraction_succeeded(registry, pipeline):
+    result = pipeline([[], None])
+
+    assert result["status"] == "partial" and result["chunks_failed"] == 1
+    all_keys = sentence_keys()
+    assert registry.get_document_chunks("paper.pdf") == all_keys
+    assert registry.known_chunks(all_keys, "embedded") == set(all_keys)
+    assert registry.known_chunks(all_keys, "extracted") == {all_keys[0]}
+    # The file hash is withheld, so the same bytes resume instead of short-circuiting
+    assert registry.find_document_by_hash("h1") is None
+
+    result = pipeline([[]])
+    assert result["status"] == "success"
+    assert pipeline.requested[-1] == [SENTENCES[1]]
+    assert registry.known_chunks(all_keys, "extracted") == set(all_keys)
+
+    assert pipeline([])["status"] == "duplicate"
+
+
+def test_chunks_are_not_marked_embedded_when_the_vector_write_fails(registry, pipeline, monkeypatch):
+    monkeypatch.setattr(FakeVectorService, "fail", True)
+
+    with pytest.raises(RuntimeError):
+        pipeline([[], []])
+    assert registry.known_chunks(sentence_keys(), "embedded") == set()
+    assert registry.get_document("paper.pdf") is None
+
+
+# ─────────────────────────────────────────────────────────
+# Deletion and the pending-cleanup ledger (gc_pending)
+# ─────────────────────────────────────────────────────────
+
+def test_a_chunk_shared_by_two_documents_survives_deleting_one(registry):
+    registry.register_document("a.pdf", "a.pdf", "h1", ["k1", "shared"])
+    registry.register_document("b.pdf", "b.pdf", "h2", ["shared", "k3"])
+    registry.mark_chunks(["k1", "shared", "k3"], "embedded")
+
+    assert registry.delete_document("a.pdf") == ["k1"]
+    assert registry.get_document("a.pdf") is None
+    assert registry.get_document_chunks("b.pdf") == ["shared", "k3"]
+    assert registry.known_chunks(["k1", "shared"], "embedded") == {"shared"}
+    assert registry.chunk_owners(["shared"]) == {"shared": {"doc_id": "b.pdf", "source": "b.pdf"}}
+    pending = registry.pending_gc()
+    assert pending["chunks"] == ["k1"] and pending["documents"] == ["a.pdf"]
+
+
+def test_pending_cleanup_is_cleared_only_once_the_stores_confirm(registry, stores, monkeypatch):
+    registry.register_document("a.pdf", "a.pdf", "h1", ["k1"])
+    monkeypatch.setattr(FakeVectorService, "fail", True)
+
+    result = asyncio.run(IngestService.delete_document("a.pdf"))
+    assert result["cleanup"] == "pending"
+    assert registry.pending_gc() == {"chunks": ["k1"], "documents": ["a.pdf"], "corpora": []}
+    # Still failing: nothing is confirmed, so nothing is cleared
+    assert asyncio.run(IngestService.collect_pending()) is None
+    assert registry.pending_gc()["chunks"] == ["k1"]
+
+    monkeypatch.setattr(FakeVectorService, "fail", False)
+    assert asyncio.run(IngestService.collect_pending()) == {"chunks": 1, "documents": 1, "corpora": 0}
+    assert registry.pending_gc() == {"chunks": [], "documents": [], "corpora": []}
+
+
+def test_corpus_deletion_records_its_documents(registry):
+    registry.register_document("papers/a.pdf", "a.pdf", "h1", ["papers:k1"], corpus="papers")
+
+    assert registry.delete_corpus("papers") == ["papers:k1"]
+    assert registry.pending_gc()["corpora"] == [("papers", ["papers/a.pdf"])]
+    registry.clear_pending_gc("corpus", ["papers"])
+    assert registry.pending_gc()["corpora"] == []
+
+
+def test_reregistration_unmarks_reused_chunks(registry):
+    registry.register_document("a.pdf", "a.pdf", "h1", ["k1", "k2"])
+    registry.delete_document("a.pdf")
+
+    registry.register_document("c.pdf", "c.pdf", "h3", ["k1"])
+    assert registry.pending_gc() == {"chunks": ["k2"], "documents": ["a.pdf"], "corpora": []}
+    registry.register_document("a.pdf", "a.pdf", "h1", ["k2"])
+    assert registry.pending_gc() == {"chunks": [], "documents": [], "corpora": []}
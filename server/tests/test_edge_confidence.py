@@ -0,0 +1,27 @@
+from app.services.edge_confidence import BASE_CONFIDENCE, DAY_MS, corroboration, recency_weight, score_pair
+
+NOW = 1_000 * DAY_MS
+
+
+def test_corroboration_grows_with_support_and_documents():
+    assert corroboration(1, 1) == BASE_CONFIDENCE
+    assert corroboration(1, 1) < corroboration(3, 1) < corroboration(3, 2) < 1.0
+
+
+def test_recency_weight_halves_over_time():
+    assert recency_weight(NOW, NOW) == 1.0
+    assert recency_weight(None, NOW) == 1.0
+    assert recency_weight(NOW - 10 * DAY_MS, NOW) < 1.0
+
+
+def test_competing_predicate_loses_confidence_to_better_supported_one():
+    strong, weak = score_pair(
+        [
+            {"support": 5, "documents": 2, "last_seen": NOW},
+            {"support": 1, "documents": 1, "last_seen": NOW},
+        ],
+        NOW,
+    )
+    alone = score_pair([{"support": 1, "documents": 1, "last_seen": NOW}], NOW)[0]
+    assert strong > weak
+    assert weak < alone
@@ -0,0 +1,32 @@
+from app.services.entity_matcher import EntityMatcher, EntityTrie, match_tokens
+
+
+def test_match_tokens_lowercase_and_drop_plurals():
+    assert match_tokens("Attention Mechanisms, glass") == ["attention", "mechanism", "glass"]
+
+
+def test_trie_finds_every_name_spelled_in_the_query():
+    trie = EntityTrie()
+    trie.add(["Attention", "Attention Mechanism", "Machine Translation"])
+    tokens = match_tokens("how do attention mechanisms help machine translation")
+
+    spans = {(start, end): names for start, end, names in trie.matches(tokens)}
+    assert spans == {
+        (2, 3): {"Attention"},
+        (2, 4): {"Attention Mechanism"},
+        (5, 7): {"Machine Translation"},
+    }
+    assert len(trie) == 3
+
+
+def test_trie_remove():
+    trie = EntityTrie()
+    trie.add(["Attention Mechanism"])
+    trie.remove(["Attention Mechanism", "Unknown"])
+    assert len(trie) == 0
+    assert trie.matches(match_tokens("attention mechanism")) == []
+
+
+def test_select_prefers_longest_non_overlapping_matches():
+    matches = [(2, 3, {"Attention"}), (2, 4, {"Attention Mechanism"}), (5, 7, {"Machine Translation"})]
+    assert EntityMatcher._select(matches) == [(2, 4, {"Attention Mechanism"}), (5, 7, {"Machine Translation"})]
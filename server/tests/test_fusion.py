@@ -0,0 +1,30 @@
+from app.services.vector_service import RRF_K, collapse_neighbors, reciprocal_rank_fusion
+
+
+def test_rrf_rewards_records_ranked_by_both_retrievers():
+    dense = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    keyword = [{"id": "b"}, {"id": "c"}]
+
+    fused = reciprocal_rank_fusion(dense, keyword)
+
+    assert [r["id"] for r in fused] == ["b", "c", "a"]
+    assert fused[0]["fusion_score"] == round(1 / (RRF_K + 2) + 1 / (RRF_K + 1), 6)
+
+
+def test_collapse_neighbors_drops_adjacent_chunks_of_the_same_source():
+    records = [
+        {"id": "a", "source": "x.pdf", "chunk_index": 4},
+        {"id": "b", "source": "x.pdf", "chunk_index": 5},
+        {"id": "c", "source": "y.pdf", "chunk_index": 5},
+        {"id": "d", "source": "x.pdf", "chunk_index": 7},
+    ]
+    assert [r["id"] for r in collapse_neighbors(records)] == ["a", "c", "d"]
+
+
+def test_collapse_neighbors_keeps_same_named_files_of_different_documents_apart():
+    records = [
+        {"id": "a", "source": "x.pdf", "doc_id": "x.pdf", "chunk_index": 4},
+        {"id": "b", "source": "x.pdf", "doc_id": "papers/x.pdf", "chunk_index": 5},
+        {"id": "c", "source": "x.pdf", "doc_id": "x.pdf", "chunk_index": 5},
+    ]
+    assert [r["id"] for r in collapse_neighbors(records)] == ["a", "b"]
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_cache
+from app.services.llm_cache import LLMCache
+from app.services.llm_engine import LLMEngine
+from app.services.llm_router import LLMBackend, LLMRouter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual clock for the cache's timestamps."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch, clock):
+    """A fresh cache singleton backed by a temp AURELIUS_DATA_DIR."""
+    monkeypatch.setenv("AURELIUS_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(LLMCache, "_instance", None)
+    instance = LLMCache()
+    yield instance
+    instance._conn.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_memory_hit_then_disk_hit_after_the_memory_tier_is_cleared(cache):
+    key = LLMCache.make_key("mock:mock", "system", "prompt", True)
+    assert run(cache.get(key)) is None
+
+    run(cache.put(key, '{"entities": []}'))
+    assert run(cache.get(key)) == '{"entities": []}'
+    assert cache.counters["memory_hits"] == 1
+
+    cache._memory.clear()
+    assert run(cache.get(key)) == '{"entities": []}'
+    assert cache.counters["disk_hits"] == 1 and cache.counters["misses"] == 1
+    # The disk hit is promoted back into memory
+    assert key in cache._memory
+
+
+def test_entries_expire_after_the_ttl(cache, clock, monkeypatch):
+    monkeypatch.setattr(LLMCache, "TTL_SECONDS", 60)
+    run(cache.put("k", "v"))
+
+    clock[0] += 59
+    assert run(cache.get("k")) == "v"
+    clock[0] += 2
+    assert run(cache.get("k")) is None
+    cache._memory.clear()
+    assert run(cache.get("k")) is None
+
+
+def test_disk_tier_is_trimmed_to_the_least_recently_used(cache, clock, monkeypatch):
+    monkeypatch.setattr(LLMCache, "DISK_MAX_ENTRIES", 2)
+    monkeypatch.setattr(LLMCache, "EVICT_EVERY", 1)
+    for key in ("a", "b"):
+        run(cache.put(key, key))
+        clock[0] += 1
+    cache._memory.clear()
+    # Reading "a" makes "b" the least recently used entry
+    run(cache.get("a"))
+    clock[0] += 1
+    run(cache.put("c", "c"))
+
+    rows = {row[0] for row in cache._conn.execute("SELECT key FROM llm_cache")}
+    assert rows == {"a", "c"}
+
+
+def test_cache_errors_do_not_fail_the_llm_call(cache, monkeypatch):
+    async def broken(*args):
+        raise OSError("disk I/O error")
+
+    monkeypatch.setattr(LLMCache, "ENABLED", True)
+    monkeypatch.setattr(LLMRouter, "_backends", [LLMBackend("solo", "mock", "mock")])
+    monkeypatch.setattr(cache, "get", broken)
+    monkeypatch.setattr(cache, "put", broken)
+
+    answer = run(LLMEngine._call_llm("VERIFIED KNOWLEDGE GRAPH PATH:\nA -[REL]- B\n", "system", json_mode=False))
+    assert answer.startswith("[solo]")
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_engine import LLMEngine
+from app.services.llm_router import CircuitBreaker, LLMBackend, LLMRouter, MockBackendError
+
+SYSTEM = "You are a test."
+PROMPT = "VERIFIED KNOWLEDGE GRAPH PATH:\nA -[REL]- B\n"
+
+
+def mock(name, **options):
+    return LLMBackend(name, "mock", "mock", options=options)
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Installs the given backends as the router's configuration."""
+    def install(*configured):
+        monkeypatch.setattr(LLMRouter, "_backends", list(configured))
+        return configured
+    return install
+
+
+def route(policy):
+    return asyncio.run(LLMEngine._route(PROMPT, SYSTEM, False, policy))
+
+
+def test_priority_fails_over_to_the_next_backend(backends):
+    flaky, healthy = backends(mock("flaky", error_rate=1.0), mock("healthy"))
+
+    assert route(LLMRouter.PRIORITY).startswith("[healthy]")
+    assert flaky.errors == 1 and flaky.breaker.failures == 1
+    assert healthy.requests == 1 and healthy.outstanding == 0
+
+
+def test_round_error_is_raised_when_every_backend_fails(backends):
+    backends(mock("a", error_rate=1.0), mock("b", error_rate=1.0))
+
+    with pytest.raises(MockBackendError):
+        route(LLMRouter.PRIORITY)
+
+
+def test_open_circuit_is_skipped(backends, monkeypatch):
+    monkeypatch.setattr(CircuitBreaker, "FAILURES", 1)
+    flaky, healthy = backends(mock("flaky", error_rate=1.0), mock("healthy"))
+
+    route(LLMRouter.PRIORITY)
+    assert flaky.breaker.state == "open"
+    assert LLMRouter.candidates(LLMRouter.PRIORITY) == [healthy]
+    route(LLMRouter.PRIORITY)
+    assert flaky.requests == 1
+
+
+def test_hedged_races_a_second_backend_when_the_first_is_slow(backends, monkeypatch):
+    monkeypatch.setattr(LLMRouter, "HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(LLMRouter, "HEDGE_DEFAULT_DELAY", 0.05)
+    slow, fast = backends(mock("slow", latency_ms=1000), mock("fast"))
+
+    assert route(LLMRouter.HEDGED).startswith("[fast]")
+    # The losing request is cancelled, which says nothing about the slow backend's health
+    assert slow.requests == 1 and slow.errors == 0 and slow.outstanding == 0
+    assert slow.breaker.state == "closed"
+
+
+def test_request_cancelled_before_it_starts_is_released(monkeypatch):
+    monkeypatch.setattr(CircuitBreaker, "FAILURES", 1)
+    backend = mock("probe")
+    backend.breaker.on_failure()
+    monkeypatch.setattr(CircuitBreaker, "COOLDOWN", 0)
+
+    async def cancel_immediately():
+        task = backend.complete(PROMPT, SYSTEM, False)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_immediately())
+    assert backend.outstanding == 0 and backend.errors == 0
+    # The half-open probe slot is handed back rather than held forever
+    assert backend.breaker.allow()
+
+
+def test_priority_waits_for_a_slow_backend(backends, monkeypatch):
+    monkeypatch.setattr(LLMRouter, "HEDGE_DEFAULT_DELAY", 0.01)
+    slow, fast = backends(mock("slow", latency_ms=100), mock("fast"))
+
+    assert route(LLMRouter.PRIORITY).startswith("[slow]")
+    assert fast.requests == 0
+
+
+def test_balanced_prefers_the_least_loaded_weighted_backend(backends):
+    busy, idle, fallback = backends(mock("busy"), mock("idle"), LLMBackend("fallback", "mock", "mock", weight=0))
+    busy.outstanding = 3
+
+    assert LLMRouter.candidates(LLMRouter.BALANCED) == [idle, busy, fallback]
+    idle.outstanding = 10
+    # Weight 0 is failover only, however busy the weighted backends are
+    assert LLMRouter.candidates(LLMRouter.BALANCED) == [busy, idle, fallback]
+
+
+def test_breaker_open_half_open_closed_cycle(monkeypatch):
+    monkeypatch.setattr(CircuitBreaker, "FAILURES", 2)
+    breaker = CircuitBreaker("test")
+
+    breaker.on_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.on_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    monkeypatch.setattr(CircuitBreaker, "COOLDOWN", 0)
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.on_start()
+    # A single probe at a time
+    assert not breaker.allow()
+    breaker.on_success()
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.allow()
+
+
+def test_failed_half_open_probe_reopens_the_circuit(monkeypatch):
+    monkeypatch.setattr(CircuitBreaker, "FAILURES", 1)
+    breaker = CircuitBreaker("test")
+    breaker.on_failure()
+
+    monkeypatch.setattr(CircuitBreaker, "COOLDOWN", 0)
+    breaker.on_start()
+    monkeypatch.setattr(CircuitBreaker, "COOLDOWN", 60)
+    breaker.on_failure()
+    assert breaker.state == "open"
@@ -0,0 +1,38 @@
+import math
+
+from app.services.path_search import best_paths, edge_cost
+
+GRAPH = {
+    "A": [("B", "R1", 0.9), ("C", "R2", 0.5)],
+    "B": [("D", "R3", 0.9)],
+    "C": [("D", "R4", 0.99)],
+    "D": [],
+}
+
+
+def neighbors(node):
+    return GRAPH.get(node, [])
+
+
+def test_edge_cost_is_negative_log_confidence():
+    assert edge_cost(1.0) == 0.0
+    assert edge_cost(None) == 0.0
+    assert math.isclose(edge_cost(0.5), math.log(2))
+
+
+def test_best_path_maximises_confidence_product():
+    [path] = best_paths("A", "D", neighbors)
+    assert path["nodes"] == ["A", "B", "D"]
+    assert path["relations"] == ["R1", "R3"]
+    assert math.isclose(path["confidence"], 0.81)
+
+
+def test_k_best_paths_are_ordered():
+    paths = best_paths("A", "D", neighbors, k=2)
+    assert [p["nodes"] for p in paths] == [["A", "B", "D"], ["A", "C", "D"]]
+
+
+def test_limits_prune_paths():
+    assert best_paths("A", "D", neighbors, max_depth=1) == []
+    assert best_paths("A", "D", neighbors, k=2, min_confidence=0.6) == best_paths("A", "D", neighbors)
+    assert best_paths("A", "A", neighbors) == []
@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.embedding_service import EmbeddingService
+from app.services.query_cache import QueryCache
+
+RESPONSE = {"answer": "Alpha binds beta.", "steps": []}
+
+# Hand-picked query embeddings: "near" is ~0.99 similar to the cached query, "far" ~0.8
+VECTORS = {
+    "what binds alpha?": [1.0, 0.0, 0.0],
+    "which protein binds alpha": [0.99, 0.14, 0.0],
+    "what inhibits alpha": [0.8, 0.6, 0.0],
+}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    async def embed_query(query):
+        return VECTORS[query.lower()]
+
+    monkeypatch.setattr(EmbeddingService, "embed_query", staticmethod(embed_query))
+    monkeypatch.setattr(QueryCache, "_instance", None)
+    monkeypatch.setattr(QueryCache, "SIMILARITY", 0.95)
+    return QueryCache()
+
+
+def lookup(cache, query, version="g1:v1", scope=""):
+    return asyncio.run(cache.lookup(query, scope, version))
+
+
+def seed(cache, version="g1:v1"):
+    _, vector = lookup(cache, "What binds alpha?", version)
+    cache.put("What binds alpha?", "", version, RESPONSE, vector)
+
+
+def test_exact_hit_ignores_case_spacing_and_trailing_punctuation(cache):
+    seed(cache)
+
+    hit, _ = lookup(cache, "  what BINDS alpha ")
+    assert hit["answer"] == RESPONSE["answer"] and hit["cache"] == {"hit": "exact"}
+
+
+def test_semantic_hit_above_the_threshold(cache):
+    seed(cache)
+
+    hit, _ = lookup(cache, "Which protein binds alpha")
+    assert hit["cache"]["hit"] == "semantic" and hit["cache"]["similarity"] >= 0.95
+
+
+def test_miss_below_the_threshold(cache):
+    seed(cache)
+
+    hit, vector = lookup(cache, "What inhibits alpha")
+    assert hit is None
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert cache.counters["misses"] == 2
+
+
+def test_other_scopes_do_not_match(cache):
+    seed(cache)
+
+    assert lookup(cache, "Which protein binds alpha", scope="papers|")[0] is None
+
+
+def test_a_new_data_version_drops_the_cache(cache):
+    seed(cache)
+
+    assert lookup(cache, "What binds alpha?", version="g2:v1")[0] is None
+    assert cache.counters["invalidations"] == 1 and cache.stats()["entries"] == 0
+    # A response computed at the old version is not cached under the new one
+    cache.put("What binds alpha?", "", "g1:v1", RESPONSE, None)
+    assert lookup(cache, "What binds alpha?", version="g2:v1")[0] is None
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from app.services.context_packer import ContextPacker
+from app.services.llm_cache import LLMCache
+from app.services.llm_engine import LLMEngine
+from app.services.llm_router import LLMBackend, LLMRouter
+
+TRIPLET = {"subject": "Alpha", "predicate": "BINDS", "object": "Beta"}
+
+
+class ScriptedBackend(LLMBackend):
+    """Mock backend answering batched prompts with `batch_answer` and recording every prompt."""
+
+    def __init__(self, batch_answer):
+        super().__init__("scripted", "mock", "mock")
+        self.batch_answer = batch_answer
+        self.prompts = []
+
+    async def _mock_complete(self, prompt, json_mode):
+        self.prompts.append(prompt)
+        if "### CHUNK" in prompt:
+            return self.batch_answer
+        # Single-chunk call: one triplet naming the chunk
+        text = re.search(r"TEXT TO ANALYZE:\n(.+)", prompt).group(1)
+        return json.dumps([{"subject": text, "predicate": "RETRIED", "object": "Single"}])
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    def install(batch_answer):
+        scripted = ScriptedBackend(batch_answer)
+        monkeypatch.setattr(LLMRouter, "_backends", [scripted])
+        return scripted
+
+    monkeypatch.setattr(LLMCache, "ENABLED", False)
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_ENABLED", True)
+    return install
+
+
+@pytest.fixture
+def word_tokens(monkeypatch):
+    """One token per word, so the budget arithmetic does not depend on a tokenizer."""
+    monkeypatch.setattr(ContextPacker, "_token_counter", staticmethod(lambda text: len(text.split())))
+
+
+def test_missing_and_garbled_keys_are_retried_one_by_one(backend):
+    scripted = backend(json.dumps({"c0": [TRIPLET], "c1": "no facts here"}))
+    done = []
+
+    results = asyncio.run(LLMEngine.extract_triplets_many(["first", "second", "third"], on_chunk_done=done.append))
+
+    assert results[0] == [TRIPLET]
+    assert results[1][0]["subject"] == "second" and results[2][0]["subject"] == "third"
+    # One batched request, then one single-chunk call per chunk the answer did not cover
+    assert len(scripted.prompts) == 3 and "### CHUNK c2" in scripted.prompts[0]
+    assert len(done) == 3
+
+
+def test_an_unparseable_batch_answer_falls_back_to_single_chunks(backend):
+    scripted = backend("not json")
+
+    results = asyncio.run(LLMEngine.extract_triplets_many(["first", "second"]))
+
+    assert [r[0]["subject"] for r in results] == ["first", "second"]
+    assert len(scripted.prompts) == 3
+
+
+def test_empty_arrays_mean_no_facts_and_are_not_retried(backend):
+    scripted = backend(json.dumps({"c0": [], "c1": [TRIPLET, {"subject": "incomplete"}]}))
+
+    results = asyncio.run(LLMEngine.extract_triplets_many(["first", "second"]))
+
+    assert results == [[], [TRIPLET]]
+    assert len(scripted.prompts) == 1
+
+
+def test_batches_close_at_the_token_budget(word_tokens, monkeypatch):
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_MAX_CHUNKS", 8)
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_TOKENS", 30)
+    # Five words + an 8-token chunk header each: two chunks (26) fit, three (39) do not
+    chunks = ["one two three four five"] * 5
+
+    assert LLMEngine._extraction_batches(chunks) == [[0, 1], [2, 3], [4]]
+
+
+def test_batches_close_at_the_chunk_cap(word_tokens, monkeypatch):
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_MAX_CHUNKS", 2)
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_TOKENS", 10_000)
+
+    assert LLMEngine._extraction_batches(["word"] * 5) == [[0, 1], [2, 3], [4]]
+
+
+def test_budget_leaves_room_for_the_answer_in_the_context(word_tokens, monkeypatch):
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_MAX_CHUNKS", 8)
+    monkeypatch.setattr(LLMEngine, "EXTRACTION_BATCH_TOKENS", 10_000)
+    overhead = ContextPacker.count_tokens(LLMEngine._batch_system()) + 16
+    # Half of what the instructions leave free goes to chunk text: 26 tokens
+    monkeypatch.setattr(ContextPacker, "CONTEXT_TOKENS", overhead + 52)
+
+    assert LLMEngine._extraction_batches(["one two three four five"] * 5) == [[0, 1], [2, 3], [4]]